@@ -1,11 +1,16 @@
+from src.utils.startup import mark # First: startup is timed from here
 import pygame
 from src.settings import *
-from src.models.player_profile import PlayerProfile
-from src.scenes.garage import run_garage
-from src.scenes.race import run_race
+from src.scenes.scene_manager import SceneManager
+from src.utils.save_game import ProfileStore
+from src.utils.race_history import RaceHistory
+from src.utils.assets import AssetLoader
 
 def main():
-    pygame.init()
+    # Only what the game uses: pygame.init() would also open the audio
+    # device and scan for joysticks
+    pygame.display.init()
+    pygame.font.init()
     # Fullscreen support
     # screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
     # For development/windowed mode use settings
@@ -14,24 +19,19 @@ def main():
     pygame.display.set_caption(f"DragOn v{VERSION} - Career Mode")
     clock = pygame.time.Clock()
     
-    profile = PlayerProfile()
-    current_scene = "GARAGE"
+    # Fonts and HUD surfaces are built while the garage is shown
+    if PREWARM_ASSETS:
+        AssetLoader().start()
     
-    while True:
-        if current_scene == "GARAGE":
-            result = run_garage(screen, clock, profile)
-            if result == "RACE":
-                current_scene = "RACE"
-            elif result == "QUIT":
-                break
-        elif current_scene == "RACE":
-            result = run_race(screen, clock, profile)
-            if result == "GARAGE":
-                current_scene = "GARAGE"
-            elif result == "QUIT":
-                break
-                
+    # Career slot 0: picks up where the last session left off
+    store = ProfileStore(0)
+    profile = store.load_or_new()
+    history = RaceHistory(store.slot)
+    SceneManager(screen, clock, profile, store, history).run()
+    
+    store.close()
     pygame.quit()
+    history.close() # Raises if race results could not be written
 
 if __name__ == "__main__":
     main()
@@ -1,24 +1,28 @@
-import pygame
 import random
 from src.settings import *
-from src.models.particle import ParticleSystem
-
-# Global particle system reference (hacky but works for now)
-particles = ParticleSystem()
+from src.models.effects import EFFECT_SCRAPE, EFFECT_SMOKE
+from src.utils.rect import Rect
 
 class Car:
-    def __init__(self, x, y, color, stats, race_length, is_player=False, profile=None):
+    def __init__(self, x, y, color, stats, race_length, is_player=False, profile=None, rng=None):
+        # Randomness comes from the race the car is in
+        self.rng = rng if rng is not None else random
+        self.effects = None # Cosmetic events go here while the race is being drawn
         self.x = x
         self.y = y  # world position (0 = start, race_length = finish)
+        # Position at the start of the last update (swept collision)
+        self.prev_x = x
+        self.prev_y = y
         self.width = 20
         self.height = 35
+        self.rect = Rect(0, 0, self.width, self.height) # Reused by get_rect()
         
         # Random color for AI if not specified
         if not is_player and color == COLOR_PLAYER: # Should not happen but safety
-             self.color = (random.randint(50, 200), random.randint(50, 200), random.randint(50, 200))
+             self.color = (self.rng.randint(50, 200), self.rng.randint(50, 200), self.rng.randint(50, 200))
         elif not is_player:
              # Randomize AI colors
-             self.color = (random.randint(50, 200), random.randint(50, 200), random.randint(50, 200))
+             self.color = (self.rng.randint(50, 200), self.rng.randint(50, 200), self.rng.randint(50, 200))
         else:
              self.color = color
 
@@ -66,6 +70,7 @@ class Car:
         self.is_drafting = False
         self.is_side_drafting = False
         self.next_checkpoint_idx = 0
+        self.splits = [] # Race time at each checkpoint crossed
         
     def get_target_speed(self):
         base = self.stats.max_speed * (self.throttle / 100.0)
@@ -173,7 +178,7 @@ class Car:
         force = direction * 0.6 * speed_factor
         self.lateral_speed += force
         
-    def update(self):
+    def update_speed(self):
         target = self.get_target_speed()
         if self.fuel <= 0 or self.dead:
             target = 0
@@ -186,6 +191,23 @@ class Car:
         elif self.speed > target:
             self.speed -= 0.05
             
+    def update(self, dt=1, control=None):
+        """Advance dt ticks as one step.
+
+        control() is called before every tick after the first, so held
+        inputs (AIDriver.drive) keep being applied between sensor updates.
+        """
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.update_tick()
+        for _ in range(dt - 1):
+            if control is not None:
+                control()
+            self.update_tick()
+            
+    def update_tick(self):
+        self.update_speed()
+            
         # Apply Lateral Friction (Drag)
         # Prevents infinite sliding ("hovering")
         self.lateral_speed *= 0.92
@@ -198,30 +220,24 @@ class Car:
             self.x = TRACK_X + self.width/2
             self.lateral_speed = -self.lateral_speed * 0.5
             self.apply_damage(2.0, "FL")
-            particles.add_explosion(self.x, self.y, 5, (200, 200, 200))
+            if self.effects is not None:
+                self.effects.append((EFFECT_SCRAPE, self.x, self.y, 5))
             
         # Right Wall
         elif self.x > TRACK_X + TRACK_WIDTH - self.width/2:
             self.x = TRACK_X + TRACK_WIDTH - self.width/2
             self.lateral_speed = -self.lateral_speed * 0.5
             self.apply_damage(2.0, "FR")
-            particles.add_explosion(self.x, self.y, 5, (200, 200, 200))
+            if self.effects is not None:
+                self.effects.append((EFFECT_SCRAPE, self.x, self.y, 5))
         
         self.y += self.speed
         self.update_resources()
         
         # Smoke
-        if self.health < self.stats.durability * 0.5:
-            if random.random() < 0.3:
-                particles.add(self.x + random.randint(-10, 10), self.y + 10, 
-                              random.uniform(-1, 1), random.uniform(1, 3), 
-                              random.randint(30, 60), (100, 100, 100), random.randint(5, 10))
-        
-        if self.health < self.stats.durability * 0.2:
-             if random.random() < 0.5:
-                particles.add(self.x + random.randint(-10, 10), self.y + 10, 
-                              random.uniform(-1, 1), random.uniform(1, 3), 
-                              random.randint(30, 60), (50, 50, 50), random.randint(8, 15))
+        if self.effects is not None and self.health < self.stats.durability * 0.5:
+            level = 2 if self.health < self.stats.durability * 0.2 else 1
+            self.effects.append((EFFECT_SMOKE, self.x, self.y + 10, level))
         
         if self.health <= 0:
             self.speed *= 0.9
@@ -235,6 +251,25 @@ class Car:
         if self.nitro_active > 0:
             self.nitro_active -= 1
 
+    def update_reduced(self):
+        """Longitudinal-only update for cars in the far tier of a mass field."""
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.update_speed()
+        self.y += self.speed
+        self.update_resources()
+        
+        if self.health <= 0:
+            self.speed *= 0.9
+            if self.speed < 0.1:
+                self.speed = 0
+        
+        if self.speed < 0:
+            self.speed = 0
+            
+        if self.nitro_active > 0:
+            self.nitro_active -= 1
+
     def get_status_text(self):
         if self.finished:
             return "FINISHED"
@@ -246,6 +281,19 @@ class Car:
             return "NO FUEL"
         return "RACING"
 
+    def leg_times(self):
+        """Time spent on each completed leg, finish included."""
+        marks = list(self.splits)
+        # A checkpoint on the finish line already recorded the finish
+        if self.finished and (not marks or marks[-1] != self.finish_time):
+            marks.append(self.finish_time)
+        legs = []
+        prev = 0
+        for t in marks:
+            legs.append(t - prev)
+            prev = t
+        return legs
+
     def check_finish(self, current_time):
         if not self.finished and self.y >= self.race_length:
             self.finished = True
@@ -264,92 +312,60 @@ class Car:
     
     def adjust_throttle(self, delta):
         self.throttle = max(0, min(100, self.throttle + delta))
+
+    def ramp_throttle(self, target):
+        # The AI's pedal: up 5 or down 10 a tick toward the target
+        if self.throttle < target:
+            self.adjust_throttle(5)
+        elif self.throttle > target:
+            self.adjust_throttle(-10)
         
     def get_rect(self):
-        return pygame.Rect(self.x - self.width // 2, self.y - self.height // 2, self.width, self.height)
-    
-    def draw(self, surface, camera_y):
-        screen_y = SCREEN_HEIGHT - (self.y - camera_y) - self.height // 2
-        screen_x = self.x - self.width // 2
-        
-        if -self.height < screen_y < SCREEN_HEIGHT + self.height:
-            color = self.color
-            if self.is_player and self.heat > HEAT_WARNING:
-                heat_factor = (self.heat - HEAT_WARNING) / (self.stats.heat_capacity - HEAT_WARNING)
-                color = (
-                    int(self.color[0] + (COLOR_PLAYER_HOT[0] - self.color[0]) * heat_factor),
-                    int(self.color[1] + (COLOR_PLAYER_HOT[1] - self.color[1]) * heat_factor),
-                    int(self.color[2] + (COLOR_PLAYER_HOT[2] - self.color[2]) * heat_factor),
-                )
-            
-            pygame.draw.rect(surface, color, (screen_x, screen_y, self.width, self.height))
-            
-            if self.nitro_active > 0:
-                pygame.draw.rect(surface, (255, 200, 0), (screen_x - 2, screen_y + self.height - 5, self.width + 4, 5))
-            
-            if self.is_drafting:
-                pygame.draw.circle(surface, (100, 255, 255), (screen_x + self.width//2, screen_y - 5), 3)
+        # Updated in place: physics asks for it O(n^2) times a tick.
+        # Only valid until the next call for this car.
+        rect = self.rect
+        rect.x = int(self.x - self.width // 2) # int() truncates like the Rect constructor
+        rect.y = int(self.y - self.height // 2)
+        return rect
 
 class AIDriver:
-    def __init__(self, car):
+    def __init__(self, car, policy=None, checkpoints=None, rng=None):
         self.car = car
-        self.target_speed_offset = random.uniform(-AI_SPEED_VARIANCE, AI_SPEED_VARIANCE)
-        self.lane_preference = random.choice([-1, 0, 1]) # -1 Left, 0 Center, 1 Right
+        self.rng = rng if rng is not None else car.rng
+        # Solved throttle table (ThrottlePolicy). Falls back to the heat hysteresis without one.
+        self.policy = policy
+        self.checkpoints = checkpoints if checkpoints is not None else []
+        self.target_speed_offset = self.rng.uniform(-AI_SPEED_VARIANCE, AI_SPEED_VARIANCE)
+        self.lane_preference = self.rng.choice([-1, 0, 1]) # -1 Left, 0 Center, 1 Right
         self.reaction_timer = 0
         self.target_x = None
+        self.is_urgent = False
         self.cooling_mode = False # State for hysteresis
+        self.full_fidelity = True # False while simulated in a mass field's far tier
         
-    def update(self, track_center, obstacles, other_cars):
+    def update(self, track_center, obstacles, other_cars, is_urgent=None):
         if self.car.dead or self.car.finished:
             return
             
         # Determine Rank/Urgency
-        cars_ahead = 0
-        for c in other_cars:
-            if c.finished or (not c.dead and c.y > self.car.y):
-                cars_ahead += 1
-        
-        # Urgency: Behind anyone OR close to finish
-        is_urgent = (cars_ahead > 0) or (self.car.y > self.car.race_length * 0.85)
-        
-        # Throttle Logic (Heat Management with Hysteresis)
-        heat_pct = self.car.heat / self.car.stats.heat_capacity
-        
-        # Thresholds
-        if is_urgent:
-            limit_heat = 0.92  # Push harder
-            resume_heat = 0.75 # Resume sooner
-            cruise_throttle = 95
-        else:
-            limit_heat = 0.85
-            resume_heat = 0.60 # Cool down more thoroughly
-            cruise_throttle = 85
+        # Callers that already know the running order (mass field) pass it in
+        if is_urgent is None:
+            cars_ahead = 0
+            for c in other_cars:
+                if c.finished or (not c.dead and c.y > self.car.y):
+                    cars_ahead += 1
             
-        # State Machine
-        if self.cooling_mode:
-            if heat_pct < resume_heat:
-                self.cooling_mode = False
-                target_throttle = cruise_throttle + random.randint(-5, 5)
-            else:
-                target_throttle = 50 # Continue cooling
-        else:
-            if heat_pct > limit_heat:
-                self.cooling_mode = True
-                target_throttle = 40 # Cut throttle
-            else:
-                target_throttle = cruise_throttle + random.randint(-5, 5)
-            
-        if self.car.throttle < target_throttle:
-            self.car.adjust_throttle(5) 
-        elif self.car.throttle > target_throttle:
-            self.car.adjust_throttle(-10) 
+            # Urgency: Behind anyone OR close to finish
+            is_urgent = (cars_ahead > 0) or (self.car.y > self.car.race_length * 0.85)
+        
+        self.is_urgent = is_urgent
+        self.update_throttle(is_urgent)
             
         # Steering Logic
         # We want to determine a target_x and steer towards it
         
         # 1. Identify Hazards and Opportunities
-        look_ahead = 400
-        my_rect = self.car.get_rect()
+        look_ahead = AI_LOOK_AHEAD
         
         hazard_ahead = None
         hazard_dist = float('inf')
@@ -495,19 +511,50 @@ class AIDriver:
             else:
                 # Draft! Align with them
                 # But add a tiny bit of noise so they don't stack perfectly like robots
-                self.target_x = draft_target.x + random.uniform(-2, 2)
+                self.target_x = draft_target.x + self.rng.uniform(-2, 2)
                 
         # Priority 4: Cruise (Lane Preference)
         else:
-            # Slowly drift back to preference if nothing else is happening
-            preferred_x = track_center + (self.lane_preference * 60)
-            # Only change if we are far off
-            if abs(self.car.x - preferred_x) > 20:
-                self.target_x = preferred_x
+            self.cruise(track_center)
                 
         # Final Clamp to Track Boundaries
         self.target_x = max(track_min_x, min(track_max_x, self.target_x))
 
+        self.steer_to_target()
+
+    def update_isolated(self, track_center, is_urgent):
+        """update() for a car with nothing in sensor range: throttle and cruise steering only."""
+        if self.car.dead or self.car.finished:
+            return
+            
+        self.is_urgent = is_urgent
+        self.update_throttle(is_urgent)
+        
+        if self.target_x is None:
+            self.target_x = track_center + (self.lane_preference * 60)
+        self.cruise(track_center)
+        
+        track_min_x = TRACK_X + self.car.width
+        track_max_x = TRACK_X + TRACK_WIDTH - self.car.width
+        self.target_x = max(track_min_x, min(track_max_x, self.target_x))
+        
+        self.steer_to_target()
+
+    def drive(self):
+        """Per-tick pedal and steering inputs between sensor updates (Car.update control)."""
+        if self.car.dead or self.car.finished or self.target_x is None:
+            return
+        self.update_throttle(self.is_urgent)
+        self.steer_to_target()
+
+    def cruise(self, track_center):
+        # Slowly drift back to preference if nothing else is happening
+        preferred_x = track_center + (self.lane_preference * 60)
+        # Only change if we are far off
+        if abs(self.car.x - preferred_x) > 20:
+            self.target_x = preferred_x
+
+    def steer_to_target(self):
         # 3. Apply Steering
         # Smooth steering using Proportional Control based on lateral speed
         # This prevents the "bouncy" behavior of overcorrecting
@@ -532,3 +579,37 @@ class AIDriver:
             
         if steer_dir != 0:
             self.car.steer(steer_dir)
+
+    def update_throttle(self, is_urgent):
+        if self.policy is not None:
+            # Solved strategy: one table lookup (plus jitter so the pack doesn't lock-step)
+            target_throttle = self.policy.target_throttle(self.car, self.checkpoints) + self.rng.randint(-5, 5)
+        else:
+            target_throttle = self.hysteresis_throttle(is_urgent)
+        self.car.ramp_throttle(target_throttle)
+
+    def hysteresis_throttle(self, is_urgent):
+        # Throttle Logic (Heat Management with Hysteresis)
+        heat_pct = self.car.heat / self.car.stats.heat_capacity
+        
+        # Thresholds
+        if is_urgent:
+            limit_heat = 0.92  # Push harder
+            resume_heat = 0.75 # Resume sooner
+            cruise_throttle = 95
+        else:
+            limit_heat = 0.85
+            resume_heat = 0.60 # Cool down more thoroughly
+            cruise_throttle = 85
+            
+        # State Machine
+        if self.cooling_mode:
+            if heat_pct < resume_heat:
+                self.cooling_mode = False
+                return cruise_throttle + self.rng.randint(-5, 5)
+            return 50 # Continue cooling
+        
+        if heat_pct > limit_heat:
+            self.cooling_mode = True
+            return 40 # Cut throttle
+        return cruise_throttle + self.rng.randint(-5, 5)
@@ -0,0 +1,14 @@
+# Cosmetic effect events.
+#
+# The simulation only reports what happened; turning that into particles is
+# up to whoever draws the race. Events are (kind, x, y, intensity) tuples
+# appended to world.effects, which is None unless a presentation layer asked
+# for them (RaceWorld.emit_effects), so headless races skip them entirely.
+# Nothing here may draw on the race's random generator: a race has to play
+# out the same whether or not anyone is watching.
+
+EFFECT_WRECK = 0  # Head-on into an obstacle; intensity = sparks
+EFFECT_SCRAPE = 1 # Glancing hit on an obstacle or a wall
+EFFECT_SIDE = 2   # Door-to-door contact between cars
+EFFECT_BUMP = 3   # Nose-to-tail contact between cars
+EFFECT_SMOKE = 4  # Damaged car; intensity 1 = damaged, 2 = badly damaged
@@ -1,5 +1,5 @@
-import pygame
 from src.settings import *
+from src.utils.rect import Rect
 
 class Obstacle:
     def __init__(self, x, y, type="rock"):
@@ -16,12 +16,9 @@ class Obstacle:
             self.height = 20
             self.color = (200, 200, 200)
             self.damage = 40.0
+
+        # Obstacles never move, so one rect serves every collision test
+        self.rect = Rect(self.x, self.y, self.width, self.height)
             
     def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.width, self.height)
-        
-    def draw(self, surface, camera_y):
-        screen_y = SCREEN_HEIGHT - (self.y - camera_y)
-        if -50 < screen_y < SCREEN_HEIGHT + 50:
-            pygame.draw.rect(surface, self.color, (self.x, screen_y, self.width, self.height))
-            pygame.draw.rect(surface, (0,0,0), (self.x, screen_y, self.width, self.height), 1)
+        return self.rect
@@ -1,9 +1,20 @@
 import random
-import pygame
 from src.settings import *
+from src.models.effects import EFFECT_WRECK, EFFECT_SCRAPE, EFFECT_SIDE, EFFECT_BUMP, EFFECT_SMOKE
+
+# Spark colour per collision effect
+EFFECT_COLORS = {
+    EFFECT_WRECK: (255, 50, 0),
+    EFFECT_SCRAPE: (200, 200, 200),
+    EFFECT_SIDE: (255, 200, 0),
+    EFFECT_BUMP: (255, 100, 0),
+}
 
 class Particle:
     def __init__(self, x, y, vx, vy, life, color, size, decay=0.95):
+        self.reset(x, y, vx, vy, life, color, size, decay)
+
+    def reset(self, x, y, vx, vy, life, color, size, decay=0.95):
         self.x = x
         self.y = y
         self.vx = vx
@@ -21,36 +32,65 @@ class Particle:
         self.vy *= self.decay
         self.life -= 1
 
-    def draw(self, screen, camera_y):
-        if self.life > 0:
-            s = max(1, int(self.size * (self.life / self.max_life)))
-            # Fix coordinate system: y increases upwards in world
-            screen_y = SCREEN_HEIGHT - (self.y - camera_y)
-            
-            # Only draw if on screen
-            if -50 < screen_y < SCREEN_HEIGHT + 50:
-                pygame.draw.circle(screen, self.color, (int(self.x), int(screen_y)), s)
-
 class ParticleSystem:
-    def __init__(self):
+    """Live particles plus a free list of dead ones.
+
+    Explosions fire on every collision, so particles are recycled rather
+    than allocated: add() reuses a dead Particle when there is one, and
+    update() compacts the live list in place. Particles are purely visual
+    and use their own random generator, never the race's.
+    """
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random
         self.particles = []
+        self.free = []
 
     def add(self, x, y, vx, vy, life, color, size):
-        self.particles.append(Particle(x, y, vx, vy, life, color, size))
+        if self.free:
+            p = self.free.pop()
+            p.reset(x, y, vx, vy, life, color, size)
+        else:
+            p = Particle(x, y, vx, vy, life, color, size)
+        self.particles.append(p)
         
     def add_explosion(self, x, y, count=10, color=(255, 100, 0)):
+        rng = self.rng
         for _ in range(count):
-            vx = random.uniform(-3, 3)
-            vy = random.uniform(-3, 3)
-            life = random.randint(20, 40)
-            size = random.randint(2, 5)
+            vx = rng.uniform(-3, 3)
+            vy = rng.uniform(-3, 3)
+            life = rng.randint(20, 40)
+            size = rng.randint(2, 5)
             self.add(x, y, vx, vy, life, color, size)
 
+    def spawn(self, effects):
+        """Turn the simulation's effect events into particles."""
+        rng = self.rng
+        for kind, x, y, intensity in effects:
+            if kind == EFFECT_SMOKE:
+                if rng.random() < 0.3:
+                    self.add(x + rng.randint(-10, 10), y,
+                             rng.uniform(-1, 1), rng.uniform(1, 3),
+                             rng.randint(30, 60), (100, 100, 100), rng.randint(5, 10))
+                if intensity > 1 and rng.random() < 0.5:
+                    self.add(x + rng.randint(-10, 10), y,
+                             rng.uniform(-1, 1), rng.uniform(1, 3),
+                             rng.randint(30, 60), (50, 50, 50), rng.randint(8, 15))
+            else:
+                self.add_explosion(x, y, intensity, EFFECT_COLORS[kind])
+
     def update(self):
-        self.particles = [p for p in self.particles if p.life > 0]
-        for p in self.particles:
-            p.update()
+        particles = self.particles
+        live = 0
+        for p in particles:
+            if p.life > 0:
+                p.update()
+                particles[live] = p
+                live += 1
+            else:
+                self.free.append(p)
+        del particles[live:]
 
-    def draw(self, screen, camera_y):
-        for p in self.particles:
-            p.draw(screen, camera_y)
+    def clear(self):
+        """Drop every live particle back into the pool."""
+        self.free.extend(self.particles)
+        self.particles.clear()
@@ -22,6 +22,9 @@ TIER_1_STARTER = CarStats(
     durability=80.0
 )
 
+# Every tier, in a fixed order (save files store the index)
+TIERS = [TIER_1_STARTER]
+
 class PlayerProfile:
     def __init__(self):
         self.money = 1000
@@ -43,6 +46,12 @@ class PlayerProfile:
         self.nitro_charges = 0
         self.max_nitro_charges = 3
         
+    def car_state(self):
+        """Everything the race car is built from (see RaceWorld.refit_player)."""
+        return (self.current_tier, self.engine_level, self.health,
+                self.comp_front, self.comp_rear, self.comp_fl, self.comp_fr, self.comp_rl, self.comp_rr,
+                self.nitro_installed, self.nitro_charges)
+
     def get_modified_stats(self):
         new_stats = copy.copy(self.current_tier)
         new_stats.max_speed += self.engine_level * 0.5
@@ -57,6 +66,8 @@ class PlayerProfile:
         if self.money >= cost:
             self.money -= cost
             self.engine_level += 1
+            return True
+        return False
             
     def buy_nitro_system(self):
         cost = 2000
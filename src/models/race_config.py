@@ -0,0 +1,54 @@
+from src.settings import *
+
+class RaceConfig:
+    def __init__(self, length, num_ai, prize_money, checkpoints=None, num_obstacles=40, field_mode=False, seed=None, name=None):
+        self.length = length # None = endless (num_obstacles is then per leg)
+        self.num_ai = num_ai
+        self.prize_money = prize_money
+        # Default: a checkpoint at the end of every leg
+        if checkpoints is None:
+            checkpoints = [LEG_DISTANCE * (i+1) for i in range(length // LEG_DISTANCE)] if length else []
+        self.checkpoints = checkpoints
+        self.num_obstacles = num_obstacles
+        self.field_mode = field_mode
+        self.seed = seed # Track seed; None = a new layout every race
+        self.track_file = None # Saved layout (TrackFile) to race on instead of generating one
+        self.name = name # Race type in the results history
+
+# Beginner Race: 2 Legs (15000m), 6 Racers
+RACE_BEGINNER = RaceConfig(
+    length=LEG_DISTANCE * 2,
+    num_ai=5,
+    prize_money=500,
+    name="BEGINNER"
+)
+
+# Pro: 50000m endurance, a stop every 5000m. A refill is 40 fuel, so a
+# leg can't be much longer than what a car burns on 40.
+RACE_PRO = RaceConfig(
+    length=50000,
+    num_ai=7,
+    prize_money=5000,
+    checkpoints=[5000 * (i+1) for i in range(9)],
+    num_obstacles=130,
+    name="PRO"
+)
+
+# Spectacle: 4 Legs, 1000 Racers (two-tier mass field simulation)
+RACE_SPECTACLE = RaceConfig(
+    length=LEG_DISTANCE * 4,
+    num_ai=999,
+    prize_money=5000,
+    num_obstacles=80,
+    field_mode=True,
+    name="SPECTACLE"
+)
+
+# Time Trial: alone on a fixed layout, against the ghost of your best run
+RACE_TIME_TRIAL = RaceConfig(
+    length=LEG_DISTANCE * 2,
+    num_ai=0,
+    prize_money=0,
+    seed=20251205,
+    name="TIME_TRIAL"
+)
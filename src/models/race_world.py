@@ -0,0 +1,358 @@
+import random
+from src.settings import *
+from src.models.car import Car, AIDriver
+from src.models.player_profile import TIER_1_STARTER
+from src.models.track import Track
+from src.utils.track_file import TrackFile
+from src.utils.physics import handle_physics
+from src.utils.checkpoints import CheckpointTracker
+from src.utils.standings import Standings
+from src.utils.field import FieldSimulator
+from src.utils.fast_forward import FastForward
+from src.utils.throttle_policy import ThrottlePolicy, race_legs
+from src.utils.race_state import pack_state, unpack_state
+
+COUNTDOWN_TICKS = 300 # 5 seconds at 60fps
+
+def grid_shape(config):
+    """(cars per row, row spacing, column spacing) of the starting grid."""
+    if config.field_mode:
+        # Mass field: pack the grid across the full track width
+        cars_per_row = 10
+        return cars_per_row, 60, TRACK_WIDTH // cars_per_row
+    return 2, 80, 80
+
+def obstacle_start(config):
+    """First y obstacles may appear at, clear of the (possibly very deep) grid."""
+    cars_per_row, grid_spacing_y, _ = grid_shape(config)
+    grid_depth = (config.num_ai // cars_per_row + 1) * grid_spacing_y
+    return max(2000, 200 + grid_depth + 1000)
+
+class RaceWorld:
+    """Simulation state for one race: grid, cars, AI, obstacles and the race clock.
+
+    Everything a race touches hangs off its world, including its random
+    generator, so any number of races can run side by side in one process.
+    Cosmetic effects are only reported once a presentation layer asks for
+    them with emit_effects().
+
+    guests are profiles for extra human-driven cars (network races). They
+    line up after the AI on the grid; self.players is the player followed
+    by the guests.
+    """
+    def __init__(self, config, profile, rng=None, guests=()):
+        self.config = config
+        self.rng = rng if rng is not None else random.Random()
+        self.effects = None # Effect events (see effects.py); None while nobody draws the race
+        self.telemetry = None # TelemetryRecorder sampled after every racing tick
+        self.track_center = TRACK_X + TRACK_WIDTH // 2
+        self.race_length = config.length if config.length is not None else float('inf')
+        self.prize_money = config.prize_money
+        num_ai = config.num_ai
+
+        # Grid Start Logic
+        self.total_cars = num_ai + 1 + len(guests)
+        cars_per_row, grid_spacing_y, grid_spacing_x = grid_shape(config)
+
+        grid_positions = []
+        for i in range(self.total_cars):
+            row = i // cars_per_row
+            col = i % cars_per_row
+            x_offset = (col - (cars_per_row - 1) / 2) * grid_spacing_x
+            gx = self.track_center + x_offset
+            gy = 200 + row * grid_spacing_y
+            grid_positions.append((gx, gy))
+
+        grid_positions.reverse()
+
+        # Player
+        p_start = grid_positions[-1]
+        player_stats = profile.get_modified_stats()
+        self.player = Car(p_start[0], p_start[1], COLOR_PLAYER, player_stats, self.race_length, is_player=True, profile=profile, rng=self.rng)
+
+        # Track: obstacles stream in chunks around the live cars
+        seed = config.seed if config.seed is not None else self.rng.getrandbits(32)
+        layout = TrackFile(config.track_file) if config.track_file else None
+        self.track = Track(config, seed, obstacle_start(config), layout)
+        self.obstacles = self.track.obstacles     # Live obstacles only, updated in place
+        self.checkpoints = self.track.checkpoints
+
+        # AI
+        # Solved throttle strategy, shared by every car on the same tier
+        ai_policy = None
+        if AI_THROTTLE_POLICY:
+            ai_policy = ThrottlePolicy.for_stats(TIER_1_STARTER, race_legs(self.checkpoints, self.race_length))
+        self.ai_cars = []
+        for i in range(num_ai):
+            pos = grid_positions[i]
+            # AI uses base tier
+            car = Car(pos[0], pos[1], (0,0,0), TIER_1_STARTER, self.race_length, rng=self.rng) # Color randomized in Car init
+            self.ai_cars.append(AIDriver(car, ai_policy, self.checkpoints, self.rng))
+
+        # Guests: after the AI, so a race without them is laid out as before
+        self.guests = []
+        for i, guest in enumerate(guests):
+            pos = grid_positions[num_ai + i]
+            color = COLOR_GUESTS[i % len(COLOR_GUESTS)]
+            self.guests.append(Car(pos[0], pos[1], color, guest.get_modified_stats(), self.race_length,
+                                   is_player=True, profile=guest, rng=self.rng))
+        self.players = [self.player] + self.guests
+
+        self.all_cars = self.players + [ai.car for ai in self.ai_cars]
+        self.checkpoint_tracker = CheckpointTracker(self.all_cars, self.checkpoints)
+        self.standings = Standings(self.all_cars)
+        self.update_track()
+
+        # Mass field: distant AI run a reduced model
+        self.field = FieldSimulator(self.ai_cars, self.track, self.track_center, self.rng) if config.field_mode else None
+        self.fast_forward = None # Set while resolving headless
+        self.focus_y = self.player.y
+
+        self.race_time = 0
+        self.countdown_timer = COUNTDOWN_TICKS
+        self.racing = False
+        self.player_out = False # Player finished, wrecked or stalled
+        self.events = []        # (name, car) pairs for the presentation layer
+        self.scratch_ys = []    # Reused by safe_step
+
+    def refit_player(self, profile):
+        """Rebuild the player's car from profile (repairs, upgrades, nitro).
+
+        Only for a world that hasn't started yet. The car keeps its place on
+        the grid and the same object, so the rest of the world is untouched;
+        building it takes nothing from self.rng, so the race is the same as
+        one built with the new profile from the start.
+        """
+        player = self.player
+        car = Car(player.x, player.y, COLOR_PLAYER, profile.get_modified_stats(), self.race_length,
+                  is_player=True, profile=profile, rng=self.rng)
+        car.effects = player.effects
+        player.__dict__.update(car.__dict__)
+
+    def emit_effects(self, enabled=True):
+        """Start or stop reporting cosmetic effect events into self.effects.
+
+        The caller drains the list (and clears it) once per frame.
+        """
+        self.effects = [] if enabled else None
+        for car in self.all_cars:
+            car.effects = self.effects
+        if self.field:
+            self.field.effects = self.effects
+
+    def pop_events(self):
+        events = self.events
+        self.events = []
+        return events
+
+    def tick(self, dt=1):
+        """Advance the race by dt simulation ticks (one step)."""
+        player = self.player
+        players = self.players
+        self.focus_y = self.focus_car().y
+
+        if not self.racing:
+            self.countdown_timer -= dt
+
+            # Launch Logic
+            if self.countdown_timer <= 0:
+                self.racing = True
+                for car in players:
+                    # Check throttle for optimal launch
+                    if 80 <= car.throttle <= 90:
+                        self.events.append(("PERFECT_LAUNCH", car))
+                        car.speed = car.stats.max_speed * 0.5 # Boost
+                    elif car.throttle > 95:
+                        self.events.append(("WHEELSPIN", car))
+                        car.speed = 0 # Stall/Spin
+                        car.heat += 10
+                    else:
+                        car.speed = 0
+
+            # Keep players stationary but allow engine revving
+            for car in players:
+                for _ in range(dt):
+                    car.update_resources()
+                car.speed = 0
+            return
+
+        self.race_time += dt
+        self.update_track()
+        for car in players:
+            car.update(dt)
+
+        if self.fast_forward:
+            self.fast_forward.step(dt)
+        elif self.field:
+            self.field.step(players, self.focus_y, dt)
+        else:
+            for ai in self.ai_cars:
+                ai.update(self.track_center, self.obstacles, self.all_cars)
+                ai.car.update(dt, ai.drive)
+
+            handle_physics(self.all_cars, self.obstacles, self.effects)
+
+        # Checkpoints: refills and splits for every car
+        for car in self.checkpoint_tracker.update(self.race_time):
+            if car.is_player:
+                self.events.append(("CHECKPOINT", car))
+
+        for car in self.all_cars:
+            if car.check_finish(self.race_time):
+                self.standings.on_finish(car)
+        self.standings.update()
+
+        if not self.player_out:
+            stalled = player.fuel <= 0 and player.speed < 0.1
+            if player.finished or player.dead or stalled:
+                self.player_out = True
+                if stalled:
+                    player.dead = True
+        for car in self.guests:
+            if not (car.finished or car.dead) and car.fuel <= 0 and car.speed < 0.1:
+                car.dead = True # Stalled, like the player
+
+        if self.telemetry is not None:
+            self.telemetry.sample(self)
+
+    def close(self):
+        """Release the track file mapping. Call once the world is dropped."""
+        self.track.close()
+
+    def snapshot(self):
+        """Complete race state as one flat buffer (see race_state)."""
+        return pack_state(self)
+
+    def restore(self, state):
+        """Return the race to a snapshot() taken from this world."""
+        unpack_state(self, state)
+
+    def update_track(self):
+        """Stream track chunks to cover every car still racing."""
+        back_y = None
+        front_y = None
+        for car in self.all_cars:
+            if car.finished or car.dead:
+                continue
+            if back_y is None or car.y < back_y:
+                back_y = car.y
+            if front_y is None or car.y > front_y:
+                front_y = car.y
+        if back_y is not None:
+            self.track.update(back_y, front_y)
+
+    def is_settled(self):
+        """True once no car can change the classification any more."""
+        for car in self.all_cars:
+            if not _is_out(car):
+                return False
+        return True
+
+    def safe_step(self, limit=SIM_MAX_STEP):
+        """Largest step (up to limit ticks) that can't change how cars interact.
+
+        AI only reacts to other cars inside AI_LOOK_AHEAD, so long steps are
+        taken only while every racing car is clear of the rest by that much
+        plus what they could close during the step. Obstacles are safe at any
+        step thanks to the swept collision in handle_physics. A headless mass
+        field only runs the reduced model, which takes any step.
+        """
+        if limit <= 1 or not self.racing:
+            return 1
+        if self.field:
+            return limit if self.field.headless else 1
+        ys = self.scratch_ys
+        ys.clear()
+        top_speed = 0.0
+        for car in self.all_cars:
+            if car.finished or car.dead:
+                continue
+            ys.append(car.y)
+            if car.speed > top_speed:
+                top_speed = car.speed
+        ys.sort()
+        clearance = AI_LOOK_AHEAD + 2 * (top_speed + 1.0) * limit
+        for i in range(1, len(ys)):
+            if ys[i] - ys[i - 1] < clearance:
+                return 1
+        return limit
+
+    def advance(self, ticks, max_step=SIM_MAX_STEP):
+        """Run `ticks` ticks, in long steps wherever safe_step allows."""
+        # Counted here rather than from race_time, which stands still in the countdown
+        while ticks > 0:
+            step = min(self.safe_step(max_step), ticks)
+            self.tick(step)
+            ticks -= step
+
+    def resolve(self, max_ticks=RESOLVE_MAX_TICKS, fast_forward=True, max_step=SIM_MAX_STEP):
+        """Run the rest of the race headless in a tight loop."""
+        self.begin_resolve(max_ticks, fast_forward)
+        while not self.resolve_step(max_step):
+            pass
+        self.end_resolve()
+
+    def begin_resolve(self, max_ticks=RESOLVE_MAX_TICKS, fast_forward=True):
+        """Start a headless resolve that the caller drives with resolve_step().
+
+        Isolated cars are fast-forwarded between events; a mass field drops
+        its full-fidelity window and runs every car on the reduced model.
+        """
+        # Nobody sees a headless resolve
+        self.resolve_watched = self.effects is not None
+        self.emit_effects(False)
+        if fast_forward:
+            if self.field:
+                self.field.headless = True
+            else:
+                self.fast_forward = FastForward(self)
+        self.resolve_end = self.race_time + max_ticks
+        self.resolve_chunk = 0
+
+    def resolve_step(self, max_step=SIM_MAX_STEP):
+        """Advance the resolve by one step. True once it is done.
+
+        The end is only checked every 60 ticks, so the steps are the same
+        however the caller spreads them over frames.
+        """
+        if self.resolve_chunk == 0:
+            self.resolve_chunk = 60
+        step = min(self.safe_step(max_step), self.resolve_chunk)
+        self.tick(step)
+        self.resolve_chunk -= step
+        return self.resolve_chunk == 0 and (self.race_time >= self.resolve_end or self.is_settled())
+
+    def resolve_progress(self):
+        """Share of the cars (0..1) that can no longer change the classification."""
+        done = sum(1 for car in self.all_cars if _is_out(car))
+        return done / len(self.all_cars)
+
+    def end_resolve(self):
+        self.fast_forward = None
+        if self.field:
+            self.field.headless = False
+        self.emit_effects(self.resolve_watched)
+
+    def focus_car(self):
+        """Car the camera (and the mass field's full-fidelity window) follows."""
+        if self.player_out:
+            return self.leader() or self.player
+        return self.player
+
+    def leader(self):
+        """Leading car that is still racing (spectator camera target)."""
+        best = None
+        for car in self.all_cars:
+            if car.finished or car.dead:
+                continue
+            if best is None or car.y > best.y:
+                best = car
+        return best
+
+    def classification(self):
+        return list(self.standings.order)
+
+
+def _is_out(car):
+    """Finished, wrecked or stalled for good: can't change the classification."""
+    return car.finished or car.dead or (car.fuel <= 0 and car.speed < 0.1)
@@ -0,0 +1,121 @@
+import random
+from src.settings import *
+from src.models.obstacle import Obstacle
+
+OBSTACLE_TYPES = ["rock", "barrier"]
+
+class Track:
+    """Obstacles and checkpoints, streamed in fixed-length chunks.
+
+    Every chunk is generated from (seed, chunk index) alone, so any stretch
+    of road can be rebuilt on demand and only the chunks around the live
+    cars are kept in memory. A config with length=None is an endless track
+    with a checkpoint at the end of every leg.
+
+    With a layout (TrackFile) the chunks are read from it instead.
+    """
+    def __init__(self, config, seed, obstacle_start, layout=None):
+        self.seed = seed
+        self.layout = layout
+        self.length = config.length
+        self.obstacle_start = obstacle_start
+
+        if self.length is None:
+            # Endless: num_obstacles is per leg, checkpoints appear as chunks do
+            self.obstacle_end = float('inf')
+            self.density = config.num_obstacles / LEG_DISTANCE
+            self.checkpoints = []
+            self.num_chunks = None
+        else:
+            self.obstacle_end = self.length - 1000
+            span = max(1, self.obstacle_end - obstacle_start)
+            self.density = config.num_obstacles / span
+            self.checkpoints = list(config.checkpoints)
+            self.num_chunks = self.length // TRACK_CHUNK_LENGTH + 1
+
+        self.chunks = {} # chunk index -> obstacles, sorted by y
+
+        # Live obstacles in y order. Updated in place so other systems can
+        # hold on to the lists.
+        self.obstacles = []
+        self.obstacle_ys = []
+
+        self.first_chunk = 0
+        self.end_chunk = 0 # One past the last materialised chunk
+        self.end_y = 0     # Nothing beyond this has been generated yet
+        self.closed = False
+
+    def close(self):
+        """Release the layout file, if any. No more chunks can stream in."""
+        if self.layout is not None:
+            self.layout.close()
+        self.closed = True
+
+    def generate_chunk(self, index):
+        """Obstacles of one chunk. Depends only on the seed and the index."""
+        if self.closed:
+            # Never fall back to the seed: a file layout would silently change
+            raise ValueError("track is closed")
+        if self.layout is not None:
+            return self.layout.obstacles_between(index * TRACK_CHUNK_LENGTH, (index + 1) * TRACK_CHUNK_LENGTH)
+        
+        y0 = max(index * TRACK_CHUNK_LENGTH, self.obstacle_start)
+        y1 = min((index + 1) * TRACK_CHUNK_LENGTH, self.obstacle_end)
+        if y1 <= y0:
+            return []
+
+        rng = random.Random(f"{self.seed}:{index}")
+        expected = self.density * (y1 - y0)
+        count = int(expected)
+        if rng.random() < expected - count:
+            count += 1
+
+        obstacles = []
+        for _ in range(count):
+            oy = rng.randint(int(y0), int(y1) - 1)
+            ox = rng.randint(TRACK_X + 20, TRACK_X + TRACK_WIDTH - 50)
+            obstacles.append(Obstacle(ox, oy, rng.choice(OBSTACLE_TYPES)))
+        obstacles.sort(key=lambda o: o.y)
+        return obstacles
+
+    def update(self, back_y, front_y):
+        """Keep chunks from just behind back_y to a few chunks ahead of front_y."""
+        first = max(0, int(back_y // TRACK_CHUNK_LENGTH) - TRACK_CHUNKS_BEHIND)
+        end = int(front_y // TRACK_CHUNK_LENGTH) + 1 + TRACK_CHUNKS_AHEAD
+        if self.num_chunks is not None:
+            end = min(end, self.num_chunks)
+        if first == self.first_chunk and end == self.end_chunk:
+            return
+        self.load_chunks(first, end)
+
+    def load_chunks(self, first, end):
+        """Make chunks first..end-1 the live window."""
+        chunks = self.chunks
+        for index in list(chunks):
+            if index < first or index >= end:
+                del chunks[index]
+        for index in range(first, end):
+            if index not in chunks:
+                chunks[index] = self.generate_chunk(index)
+                if self.length is None:
+                    self.add_checkpoints(index)
+
+        obstacles = []
+        for index in range(first, end):
+            obstacles.extend(chunks[index])
+        self.obstacles[:] = obstacles
+        self.obstacle_ys[:] = [o.y for o in obstacles]
+
+        self.first_chunk = first
+        self.end_chunk = end
+        self.end_y = end * TRACK_CHUNK_LENGTH
+        if self.num_chunks is not None and end == self.num_chunks:
+            self.end_y = float('inf')
+
+    def add_checkpoints(self, index):
+        # Endless tracks: one at the end of every leg, always one past the chunk
+        last = self.checkpoints[-1] if self.checkpoints else 0
+        leg = last + LEG_DISTANCE
+        while leg < (index + 1) * TRACK_CHUNK_LENGTH + LEG_DISTANCE:
+            self.checkpoints.append(leg)
+            leg += LEG_DISTANCE
@@ -1,12 +1,38 @@
 import pygame
 from src.settings import *
+from src.utils.startup import mark
+from src.utils.ui import format_time, get_font
 
-def run_garage(screen, clock, profile):
-    """Garage scene loop."""
+# Race buttons: (scene result, x from the right edge), all on the bottom row
+RACE_BUTTONS = [("RACE", 200), ("FIELD_RACE", 400), ("PRO_RACE", 600), ("TIME_TRIAL", 800)]
+
+def race_button_at(mx, my):
+    """Scene result of the race button at (mx, my), or None."""
+    if not SCREEN_HEIGHT - 100 <= my <= SCREEN_HEIGHT - 20:
+        return None
+    for result, right in RACE_BUTTONS:
+        if SCREEN_WIDTH - right <= mx <= SCREEN_WIDTH - right + 180:
+            return result
+    return None
+
+def run_garage(screen, clock, profile, store=None, history=None, on_hover=None, on_purchase=None, race_type="BEGINNER"):
+    """Garage scene loop. Every completed purchase is saved through store.
+
+    The best time shown is for race_type (a RaceConfig name), the race
+    selected last.
+
+    on_hover(result) is called every frame the pointer is over a race
+    button and on_purchase() after anything is bought, so the next race
+    can be prepared ahead of the click.
+    """
     running = True
-    font_title = pygame.font.Font(None, 64)
-    font_main = pygame.font.Font(None, 36)
-    font_small = pygame.font.Font(None, 24)
+    
+    # Career record, fetched in the background and shown once it arrives
+    best_query = history.personal_best(profile.current_tier.name, race_type) if history else None
+    totals_query = history.totals() if history else None
+    font_title = get_font(64)
+    font_main = get_font(36)
+    font_small = get_font(24)
     
     while running:
         screen.fill(COLOR_BG)
@@ -74,37 +100,72 @@ def run_garage(screen, clock, profile):
         
         screen.blit(font_small.render(f"Charges: {profile.nitro_charges}/{profile.max_nitro_charges}", True, (255, 200, 255)), (nitro_x + 10, status_y + 195))
         
+        # Career Record
+        if totals_query is not None and totals_query.done() and totals_query.exception() is None:
+            races, earned = totals_query.result()
+            screen.blit(font_small.render(f"Races: {races}   Career earnings: ${earned}", True, COLOR_TEXT), (40, status_y + 240))
+        if best_query is not None and best_query.done() and best_query.exception() is None:
+            best = best_query.result()
+            if best is not None:
+                screen.blit(font_small.render(f"Best: {format_time(best)}", True, COLOR_HIGHLIGHT), (SCREEN_WIDTH - 200, SCREEN_HEIGHT - 125))
+        
         # Race Selection (Career Mode)
         # Simple toggle for now: 1v1 or Pack
         pygame.draw.rect(screen, (200, 100, 0), (SCREEN_WIDTH - 200, SCREEN_HEIGHT - 100, 180, 80))
         screen.blit(font_main.render("RACE", True, (255,255,255)), (SCREEN_WIDTH - 150, SCREEN_HEIGHT - 75))
         
+        # Spectacle Event (Mass Field)
+        pygame.draw.rect(screen, (150, 0, 150), (SCREEN_WIDTH - 400, SCREEN_HEIGHT - 100, 180, 80))
+        screen.blit(font_main.render("SPECTACLE", True, (255,255,255)), (SCREEN_WIDTH - 380, SCREEN_HEIGHT - 75))
+        
+        # Pro Endurance (50000m)
+        pygame.draw.rect(screen, (0, 100, 150), (SCREEN_WIDTH - 600, SCREEN_HEIGHT - 100, 180, 80))
+        screen.blit(font_main.render("PRO 50K", True, (255,255,255)), (SCREEN_WIDTH - 565, SCREEN_HEIGHT - 75))
+        
+        # Time Trial (solo, against your ghost)
+        pygame.draw.rect(screen, (0, 130, 90), (SCREEN_WIDTH - 800, SCREEN_HEIGHT - 100, 180, 80))
+        screen.blit(font_main.render("TIME TRIAL", True, (255,255,255)), (SCREEN_WIDTH - 780, SCREEN_HEIGHT - 75))
+        
+        if on_hover is not None:
+            hovered = race_button_at(*pygame.mouse.get_pos())
+            if hovered is not None:
+                on_hover(hovered)
+        
         # Input
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return "QUIT"
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mx, my = pygame.mouse.get_pos()
+                bought = False
                 
                 # Repair Click
                 if 40 <= mx <= 240 and status_y + 150 <= my <= status_y + 190:
                     if repair_cost > 0:
-                        profile.repair_all()
+                        bought = profile.repair_all()
                         
                 # Upgrade Click
                 if 260 <= mx <= 460 and status_y + 150 <= my <= status_y + 190:
-                    profile.upgrade_engine()
+                    bought = profile.upgrade_engine()
                     
                 # Nitro Click
                 if nitro_x <= mx <= nitro_x + 200 and status_y + 150 <= my <= status_y + 190:
                     if not profile.nitro_installed:
-                        profile.buy_nitro_system()
+                        bought = profile.buy_nitro_system()
                     else:
-                        profile.refill_nitro()
+                        bought = profile.refill_nitro()
+                        
+                if bought:
+                    if store is not None:
+                        store.save(profile)
+                    if on_purchase is not None:
+                        on_purchase()
                         
-                # Race Click
-                if SCREEN_WIDTH - 200 <= mx <= SCREEN_WIDTH - 20 and SCREEN_HEIGHT - 100 <= my <= SCREEN_HEIGHT - 20:
-                    return "RACE"
+                # Race, Spectacle, Pro and Time Trial Clicks
+                race = race_button_at(mx, my)
+                if race is not None:
+                    return race
                     
         pygame.display.flip()
+        mark("first frame")
         clock.tick(60)
@@ -0,0 +1,127 @@
+import pygame
+from src.settings import *
+from src.utils.replay import INPUT_NITRO, INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN
+from src.utils.render import draw_car, draw_obstacle
+from src.utils.ui import draw_track, draw_dashboard, draw_net_stats, get_font
+
+def run_net_race(screen, clock, client):
+    """Race loop for a client of a RaceServer (already joined).
+
+    Nothing is simulated here: keys go to the server as input bits every
+    frame and the screen shows the latest snapshot.
+    """
+    world = client.world
+    player = client.car
+    all_cars = world.all_cars
+
+    while True:
+        inputs = 0
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                client.close()
+                return "QUIT"
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    inputs |= INPUT_NITRO
+                elif event.key == pygame.K_ESCAPE or (event.key == pygame.K_r and race_over(client)):
+                    client.close()
+                    return "GARAGE"
+
+        keys = pygame.key.get_pressed()
+        if world.racing:
+            if keys[pygame.K_LEFT]:
+                inputs |= INPUT_LEFT
+            if keys[pygame.K_RIGHT]:
+                inputs |= INPUT_RIGHT
+        if keys[pygame.K_UP]:
+            inputs |= INPUT_UP
+        if keys[pygame.K_DOWN]:
+            inputs |= INPUT_DOWN
+
+        if not client.over:
+            client.send_input(inputs)
+        client.poll()
+
+        camera_y = player.y - SCREEN_HEIGHT // 3
+
+        # Draw
+        draw_track(screen, camera_y, world.race_length, world.checkpoints)
+        for obs in world.obstacles:
+            draw_obstacle(screen, obs, camera_y)
+        # Only cars in the last snapshot: the rest are out of view and stale
+        for i in client.visible:
+            car = all_cars[i]
+            if car is not player:
+                draw_car(screen, car, camera_y)
+        draw_car(screen, player, camera_y)
+
+        draw_dashboard(screen, player)
+        draw_net_stats(screen, client)
+
+        if not world.racing:
+            c_font = get_font(150)
+            secs = (world.countdown_timer // 60) + 1
+            c_text = c_font.render(str(secs), True, (255, 50, 50))
+            if secs == 1:
+                c_text = c_font.render("SET", True, (255, 200, 0))
+            screen.blit(c_text, c_text.get_rect(center=(TRACK_X + TRACK_WIDTH // 2, SCREEN_HEIGHT // 2)))
+
+        if race_over(client):
+            font = get_font(64)
+            if player.finished:
+                msg, col = "FINISHED!", (50, 255, 50)
+            elif player.dead:
+                msg, col = "DNF", (255, 50, 50)
+            else:
+                msg, col = "RACE OVER", COLOR_TEXT
+            text = font.render(msg, True, col)
+            text_rect = text.get_rect(center=(TRACK_X + TRACK_WIDTH // 2, SCREEN_HEIGHT // 3))
+            pygame.draw.rect(screen, (0, 0, 0), text_rect.inflate(20, 10))
+            screen.blit(text, text_rect)
+            hint = get_font(32).render("R: Return", True, COLOR_TEXT)
+            screen.blit(hint, (TRACK_X + TRACK_WIDTH // 2 - 60, SCREEN_HEIGHT // 3 + 50))
+
+        pygame.display.flip()
+        clock.tick(FPS)
+
+def race_over(client):
+    return client.over or client.car.finished or client.car.dead
+
+if __name__ == "__main__":
+    # python -m src.scenes.net_race [players] [rivals]
+    # Loopback race: a server and scripted clients on threads, and one
+    # window driving the first car.
+    import sys
+    import threading
+    import time
+    from src.models.race_config import RaceConfig, RACE_BEGINNER
+    from src.utils.race_server import RaceServer
+    from src.utils.race_client import RaceClient, bot_bits
+    num_players = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    num_ai = int(sys.argv[2]) if len(sys.argv) > 2 else RACE_BEGINNER.num_ai
+
+    config = RaceConfig(RACE_BEGINNER.length, num_ai, RACE_BEGINNER.prize_money, field_mode=num_ai > 100)
+    server = RaceServer(config, num_players, ("127.0.0.1", 0))
+    clients = [RaceClient(server.address) for _ in range(num_players)]
+    joins = [threading.Thread(target=client.join) for client in clients]
+    for thread in joins:
+        thread.start()
+    server.wait_for_players()
+    for thread in joins:
+        thread.join()
+    threading.Thread(target=server.run, daemon=True).start()
+
+    def drive(client):
+        while not client.over:
+            client.poll()
+            client.send_input(bot_bits(client.car, client.world.racing))
+            time.sleep(1.0 / FPS)
+    for bot in clients[1:]:
+        threading.Thread(target=drive, args=(bot,), daemon=True).start()
+
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption(f"DragOn v{VERSION} - Network Race")
+    run_net_race(screen, pygame.time.Clock(), clients[0])
+    pygame.quit()
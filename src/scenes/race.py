@@ -1,93 +1,116 @@
+import os
+import time
 import pygame
-import random
 from src.settings import *
-from src.models.car import Car, AIDriver
-from src.models.player_profile import TIER_1_STARTER
-from src.models.obstacle import Obstacle
+from src.models.race_config import RACE_BEGINNER
+from src.models.race_world import RaceWorld
 from src.models.particle import ParticleSystem
-from src.utils.physics import handle_physics
-from src.utils.ui import draw_track, draw_dashboard, draw_stats_panel
+from src.utils.throttle_policy import ThrottlePolicy, race_legs
+from src.utils.ghost import Ghost, GhostRecorder
+from src.utils.replay import ReplayRecorder, INPUT_NITRO, INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN, STEP_RESOLVE
+from src.utils.render import draw_car, draw_obstacle, draw_particles
+from src.utils.startup import mark
+from src.utils.ui import draw_track, draw_dashboard, draw_stats_panel, draw_classification, get_label
 
-# Import global particles from car (hacky)
-from src.models.car import particles
+def run_race(screen, clock, profile, config=RACE_BEGINNER, history=None, ghost_path=None, world=None, start_state=None):
+    """Main race loop. The result is recorded in history (RaceHistory) on the way out.
 
-def run_race(screen, clock, profile):
-    """Main race loop."""
-    track_center = TRACK_X + TRACK_WIDTH // 2
+    With a ghost_path the best run saved there is shown as a ghost car, and
+    this run replaces it if it is faster. world is an unstarted RaceWorld
+    for config prepared ahead of time (SceneManager), and start_state its
+    snapshot if already taken; without them both are made here.
+    """
+    if world is None:
+        world = RaceWorld(config, profile)
+    world.emit_effects()
+    particles = ParticleSystem()
+    if TELEMETRY_ENABLED:
+        start_telemetry(world)
+    player = world.player
+    ai_cars = world.ai_cars
+    obstacles = world.obstacles
+    checkpoints = world.checkpoints
+    race_length = world.race_length
+    prize_money = world.prize_money
+    total_cars = world.total_cars
     
-    # Setup Race (Career Logic)
-    # Beginner Race: 2 Legs (15000m), 6 Racers
-    race_length = LEG_DISTANCE * 2
-    num_ai = 5
-    prize_money = 500
-    
-    # Grid Start Logic
-    total_cars = num_ai + 1
-    grid_spacing_y = 80
-    grid_spacing_x = 80
-    
-    grid_positions = []
-    for i in range(total_cars):
-        row = i // 2
-        col = i % 2
-        x_offset = -grid_spacing_x/2 if col == 0 else grid_spacing_x/2
-        gx = track_center + x_offset
-        gy = 200 + row * grid_spacing_y
-        grid_positions.append((gx, gy))
-    
-    grid_positions.reverse()
-    
-    # Player
-    p_start = grid_positions[-1]
-    player_stats = profile.get_modified_stats()
-    player = Car(p_start[0], p_start[1], COLOR_PLAYER, player_stats, race_length, is_player=True, profile=profile)
-    
-    # AI
-    ai_cars = []
-    for i in range(num_ai):
-        pos = grid_positions[i]
-        # AI uses base tier
-        ai_cars.append(AIDriver(Car(pos[0], pos[1], (0,0,0), TIER_1_STARTER, race_length))) # Color randomized in Car init
-    
-    # Obstacles
-    obstacles = []
-    track_left = TRACK_X
-    track_right = TRACK_X + TRACK_WIDTH
-    
-    for _ in range(40):
-        oy = random.randint(2000, race_length - 1000)
-        ox = random.randint(track_left + 20, track_right - 50)
-        otype = random.choice(["rock", "barrier"])
-        obstacles.append(Obstacle(ox, oy, otype))
-        
-    # Checkpoints (Every Leg)
-    checkpoints = [LEG_DISTANCE * (i+1) for i in range(race_length // LEG_DISTANCE)]
-    
-    # Reset Particles
-    particles.particles = []
+    # Player throttle assist (toggle with A)
+    assist_policy = None # Fetched when the assist is first turned on (usually solved ahead)
+    assist_on = False
         
     running = True
     race_over = False
-    race_time = 0
     
-    # Game States
-    STATE_COUNTDOWN = 0
-    STATE_RACING = 1
-    game_state = STATE_COUNTDOWN
-    countdown_timer = 300 # 5 seconds at 60fps
+    # Spectator time warp (once the player is out)
+    warp_idx = 0
+    resolving = False # F: resolve headless, a frame budget at a time
+    resolved = False
     
     player_rank = total_cars
     popup_timer = 0
     popup_text = ""
     
+    # Instant retry: BACKSPACE from the start, C from the last checkpoint.
+    # F5 / F9 save and load a debug state.
+    if start_state is None:
+        start_state = world.snapshot()
+    checkpoint_state = None
+    debug_state = None
+    
+    # Everything done to the world is logged, so the race can be replayed
+    recorder = ReplayRecorder(world, start_state)
+    
+    ghost = Ghost.open(ghost_path, world.track.seed) if ghost_path else None
+    ghost_recorder = GhostRecorder(world.track.seed) if ghost_path else None
+    
     while running:
+        inputs = 0 # Player inputs applied this frame (replay bits)
+        restore_state = None
+        
         # Input
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                save_replay(recorder)
+                if world.telemetry:
+                    world.telemetry.close()
+                if ghost:
+                    ghost.close()
+                world.close()
                 return "QUIT"
             elif event.type == pygame.KEYDOWN:
+                if resolving and event.key not in (pygame.K_BACKSPACE, pygame.K_c, pygame.K_F9):
+                    # The replay runs the resolve as one step: no inputs inside it
+                    continue
                 if event.key == pygame.K_SPACE:
                     player.use_nitro()
+                    inputs |= INPUT_NITRO
+                elif event.key == pygame.K_a:
+                    assist_on = not assist_on
+                    if assist_policy is None:
+                        assist_policy = ThrottlePolicy.for_stats(player.stats, race_legs(checkpoints, race_length))
+                    popup_text = "ASSIST ON" if assist_on else "ASSIST OFF"
+                    popup_timer = 60
+                elif event.key == pygame.K_BACKSPACE:
+                    restore_state = start_state
+                    popup_text = "RETRY"
+                elif event.key == pygame.K_c and checkpoint_state is not None:
+                    restore_state = checkpoint_state
+                    popup_text = "BACK TO CHECKPOINT"
+                elif event.key == pygame.K_F5:
+                    debug_state = world.snapshot()
+                    popup_text = "STATE SAVED"
+                    popup_timer = 60
+                elif event.key == pygame.K_F9 and debug_state is not None:
+                    restore_state = debug_state
+                    popup_text = "STATE LOADED"
+                elif event.key == pygame.K_w and race_over:
+                    warp_idx = (warp_idx + 1) % len(WARP_LEVELS)
+                elif event.key == pygame.K_f and race_over and not resolved:
+                    if inputs:
+                        recorder.log(inputs, 0)
+                        inputs = 0
+                    world.begin_resolve()
+                    resolving = True
                 elif event.key == pygame.K_r and race_over:
                     # Save state
                     profile.health = player.health
@@ -102,139 +125,207 @@ def run_race(screen, clock, profile):
                     if profile.nitro_installed:
                         profile.nitro_charges = player.nitro_charges
                     
+                    winnings = 0
                     if player.finished:
                         rank_factor = max(0, 1.0 - (player_rank - 1) * 0.1)
                         winnings = int(prize_money * rank_factor)
                         profile.money += winnings
                     
+                    if history is not None:
+                        history.record(world, winnings)
+                    save_replay(recorder)
+                    if world.telemetry:
+                        world.telemetry.close()
+                    if ghost:
+                        ghost.close()
+                    if ghost_recorder and player.finished:
+                        ghost_recorder.save_if_best(ghost_path, player.finish_time)
+                    world.close()
+                    
                     return "GARAGE"
                     
+        if restore_state is not None:
+            if resolving:
+                world.end_resolve()
+                resolving = False
+            world.restore(restore_state)
+            race_over = world.player_out
+            resolved = False
+            popup_timer = 60
+            inputs = 0
+            if restore_state is start_state:
+                checkpoint_state = None
+            # The replay and telemetry restart here. A ghost can only be set by a run from the start.
+            recorder = ReplayRecorder(world, restore_state)
+            if world.telemetry:
+                world.telemetry.close()
+                start_telemetry(world)
+            if ghost:
+                ghost.close()
+                ghost = Ghost.open(ghost_path, world.track.seed)
+            ghost_recorder = GhostRecorder(world.track.seed) if ghost_path and restore_state is start_state else None
+            particles.clear()
+            
         keys = pygame.key.get_pressed()
         
-        if game_state == STATE_RACING:
+        if resolving:
+            pass
+        elif world.racing:
             if keys[pygame.K_LEFT]:
                 player.steer(-1)
+                inputs |= INPUT_LEFT
             if keys[pygame.K_RIGHT]:
                 player.steer(1)
+                inputs |= INPUT_RIGHT
                 
-        if keys[pygame.K_UP]:
+        if keys[pygame.K_UP] and not resolving:
             player.adjust_throttle(1)
-        if keys[pygame.K_DOWN]:
+            inputs |= INPUT_UP
+        if keys[pygame.K_DOWN] and not resolving:
             player.adjust_throttle(-1)
+            inputs |= INPUT_DOWN
+        if assist_on and world.racing and not (keys[pygame.K_UP] or keys[pygame.K_DOWN]):
+            assist_target = assist_policy.target_throttle(player, checkpoints)
+            if player.throttle < assist_target:
+                player.adjust_throttle(1)
+                inputs |= INPUT_UP
+            elif player.throttle > assist_target:
+                player.adjust_throttle(-1)
+                inputs |= INPUT_DOWN
             
-        all_cars = [player] + [ai.car for ai in ai_cars]
-
-        if game_state == STATE_COUNTDOWN:
-            countdown_timer -= 1
-            
-            # Launch Logic
-            if countdown_timer == 0:
-                game_state = STATE_RACING
-                # Check throttle for optimal launch
-                if 80 <= player.throttle <= 90:
-                    popup_text = "PERFECT LAUNCH!"
-                    popup_timer = 60
-                    player.speed = player.stats.max_speed * 0.5 # Boost
-                elif player.throttle > 95:
-                    popup_text = "WHEELSPIN!"
-                    popup_timer = 60
-                    player.speed = 0 # Stall/Spin
-                    player.heat += 10
-                else:
-                    player.speed = 0
-            
-            player.update_resources()
-            # Keep player stationary but allow engine revving
-            # We need to prevent movement but allow resource update? 
-            # Actually update_resources burns fuel.
-            # Let's just clamp speed to 0
-            player.speed = 0
+        # Simulation
+        if not race_over:
+            world.tick()
+            recorder.log(inputs, 1)
+            if ghost_recorder and world.racing:
+                # The countdown's last tick starts it at race time 0
+                ghost_recorder.sample(world.race_time, player)
+        elif resolving:
+            # Resolve in chunks within the same frame budget as the MAX warp,
+            # logged as one step once it is done
+            deadline = time.perf_counter() + WARP_FRAME_BUDGET
+            done = False
+            while not done and time.perf_counter() < deadline:
+                done = world.resolve_step()
+            if done:
+                world.end_resolve()
+                recorder.log(0, STEP_RESOLVE)
+                resolving = False
+                resolved = True
+        elif not world.is_settled():
+            # Spectating: run several ticks per rendered frame
+            warp = WARP_LEVELS[warp_idx]
+            if warp == 0:
+                # Max speed: simulate until the frame budget is spent
+                deadline = time.perf_counter() + WARP_FRAME_BUDGET
+                while time.perf_counter() < deadline:
+                    world.advance(10)
+                    recorder.log(inputs, 10)
+                    inputs = 0
+                    if world.is_settled():
+                        break
+            else:
+                world.advance(warp)
+                recorder.log(inputs, warp)
+        elif inputs:
+            # Nothing left to simulate, but keep the player's state in step
+            recorder.log(inputs, 0)
             
-        elif game_state == STATE_RACING:
-            race_time += 1
-            player.update()
+        particles.update()
+        if world.effects: # None while resolving
+            particles.spawn(world.effects)
+            world.effects.clear()
             
-            # Checkpoints
-            if player.next_checkpoint_idx < len(checkpoints):
-                cp_y = checkpoints[player.next_checkpoint_idx]
-                if player.y >= cp_y:
-                    player.next_checkpoint_idx += 1
-                    player.fuel = min(player.stats.fuel_capacity, player.fuel + 40.0)
-                    player.heat = max(0.0, player.heat - 50.0)
-                    popup_text = "CHECKPOINT!"
-                    popup_timer = 60
+        for name, car in world.pop_events():
+            if name == "PERFECT_LAUNCH":
+                popup_text = "PERFECT LAUNCH!"
+            elif name == "WHEELSPIN":
+                popup_text = "WHEELSPIN!"
+            elif name == "CHECKPOINT":
+                popup_text = "CHECKPOINT!"
+                checkpoint_state = world.snapshot()
+            popup_timer = 60
             
-            for ai in ai_cars:
-                ai.update(track_center, obstacles, all_cars)
-                ai.car.update()
-                
-            handle_physics(all_cars, obstacles)
-            particles.update()
-            
-            for car in all_cars:
-                car.check_finish(race_time)
-            
-            if player.finished or player.dead or (player.fuel <= 0 and player.speed < 0.1):
-                race_over = True
-                if player.fuel <= 0 and player.speed < 0.1:
-                    player.dead = True
-        
-        # Sorting
-        all_cars.sort(key=lambda c: (0, c.finish_time) if c.finished else (1, -c.y))
-        player_rank = all_cars.index(player) + 1
+        race_over = world.player_out
+        race_time = world.race_time
+        standings = world.standings
+        player_rank = standings.rank(player)
 
-        camera_y = player.y - SCREEN_HEIGHT // 3
+        # Spectator camera follows the leader once the player is out
+        camera_y = world.focus_car().y - SCREEN_HEIGHT // 3
                 
         # Draw
         draw_track(screen, camera_y, race_length, checkpoints)
         
         for obs in obstacles:
-            obs.draw(screen, camera_y)
+            draw_obstacle(screen, obs, camera_y)
+            
+        if ghost:
+            ghost.draw(screen, camera_y, race_time)
             
         for ai in ai_cars:
-            ai.car.draw(screen, camera_y)
+            draw_car(screen, ai.car, camera_y)
             
-        player.draw(screen, camera_y)
-        particles.draw(screen, camera_y)
+        draw_car(screen, player, camera_y)
+        draw_particles(screen, particles, camera_y)
         
         # UI Overlays
         draw_dashboard(screen, player)
-        draw_stats_panel(screen, player, all_cars, race_time, total_cars)
+        draw_stats_panel(screen, player, standings, race_time, total_cars)
         
         # Popup
         if popup_timer > 0:
             popup_timer -= 1
-            p_font = pygame.font.Font(None, 64)
-            p_surf = p_font.render(popup_text, True, COLOR_HIGHLIGHT)
+            p_surf = get_label(popup_text, 64, COLOR_HIGHLIGHT)
             p_rect = p_surf.get_rect(center=(TRACK_X + TRACK_WIDTH // 2, SCREEN_HEIGHT // 2))
             screen.blit(p_surf, p_rect)
             
         # Countdown
-        if game_state == STATE_COUNTDOWN:
-            c_font = pygame.font.Font(None, 150)
-            secs = (countdown_timer // 60) + 1
-            c_text = c_font.render(str(secs), True, (255, 50, 50))
+        if not world.racing:
+            secs = (world.countdown_timer // 60) + 1
             if secs == 1:
-                c_text = c_font.render("SET", True, (255, 200, 0))
+                c_text = get_label("SET", 150, (255, 200, 0))
+            else:
+                c_text = get_label(str(secs), 150, (255, 50, 50))
             
             c_rect = c_text.get_rect(center=(TRACK_X + TRACK_WIDTH // 2, SCREEN_HEIGHT // 2))
             screen.blit(c_text, c_rect)
             
-            hint_font = pygame.font.Font(None, 40)
-            hint = hint_font.render("Target 80-90% RPM!", True, COLOR_TEXT)
+            hint = get_label("Target 80-90% RPM!", 40, COLOR_TEXT)
             screen.blit(hint, (TRACK_X + TRACK_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 + 80))
         
         if race_over:
-            font = pygame.font.Font(None, 64)
             msg = "FINISHED!" if player.finished else "DNF"
             col = (50, 255, 50) if player.finished else (255, 50, 50)
-            text = font.render(msg, True, col)
+            text = get_label(msg, 64, col)
             text_rect = text.get_rect(center=(TRACK_X + TRACK_WIDTH // 2, SCREEN_HEIGHT // 3))
             pygame.draw.rect(screen, (0, 0, 0), text_rect.inflate(20, 10))
             screen.blit(text, text_rect)
             
-            hint = pygame.font.Font(None, 32).render("Press R to Return", True, COLOR_TEXT)
-            screen.blit(hint, (TRACK_X + TRACK_WIDTH // 2 - 100, SCREEN_HEIGHT // 3 + 50))
+            hint = get_label("BACKSPACE: Retry" if resolving else "R: Return   BACKSPACE: Retry", 32, COLOR_TEXT)
+            screen.blit(hint, (TRACK_X + TRACK_WIDTH // 2 - 150, SCREEN_HEIGHT // 3 + 50))
+            
+            if resolving:
+                progress = f"RESOLVING... {int(world.resolve_progress() * 100)}%"
+                screen.blit(get_label(progress, 28, COLOR_TEXT), (TRACK_X + TRACK_WIDTH // 2 - 140, SCREEN_HEIGHT // 3 + 80))
+            elif world.is_settled():
+                draw_classification(screen, world.classification())
+            else:
+                warp = WARP_LEVELS[warp_idx]
+                warp_label = "MAX" if warp == 0 else f"{warp}x"
+                warp_text = f"W: Warp ({warp_label})   F: Resolve Race"
+                screen.blit(get_label(warp_text, 28, COLOR_TEXT), (TRACK_X + TRACK_WIDTH // 2 - 140, SCREEN_HEIGHT // 3 + 80))
         
         pygame.display.flip()
+        mark("first race frame")
         clock.tick(FPS)
+
+def start_telemetry(world):
+    """Record the race from here on to data/telemetry/last, replacing what is there."""
+    # Imported here: telemetry needs NumPy, the game doesn't
+    from src.utils.telemetry import TelemetryRecorder
+    world.telemetry = TelemetryRecorder(world, os.path.join(TELEMETRY_DIR, "last"))
+
+def save_replay(recorder):
+    """Keep the race just run as data/replays/last.rpl."""
+    recorder.replay().save(os.path.join(REPLAY_DIR, "last.rpl"))
@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor
+from src.settings import *
+from src.models.race_config import RACE_BEGINNER, RACE_PRO, RACE_SPECTACLE, RACE_TIME_TRIAL
+from src.models.race_world import RaceWorld
+from src.scenes.garage import run_garage
+from src.scenes.race import run_race
+from src.utils.race_state import repack_player
+from src.utils.throttle_policy import ThrottlePolicy, race_legs
+
+# Garage results that start a race
+RACES = {
+    "RACE": RACE_BEGINNER,
+    "FIELD_RACE": RACE_SPECTACLE,
+    "PRO_RACE": RACE_PRO,
+    "TIME_TRIAL": RACE_TIME_TRIAL,
+}
+
+class SceneManager:
+    """Runs the garage and races, preparing the next race ahead of time.
+
+    While the garage is up, the world for the race the player is likely to
+    pick next (the last one raced, or the one under the pointer) is built
+    on a worker thread, with its start snapshot, so clicking RACE starts
+    it without building the grid, AI and track first. A prepared world is
+    kept until it is raced: garage purchases only change the player's car,
+    which is refitted from the profile at the start (and its record in the
+    snapshot repacked) if it changed since the world was built.
+    """
+    def __init__(self, screen, clock, profile, store, history):
+        self.screen = screen
+        self.clock = clock
+        self.profile = profile
+        self.store = store
+        self.history = history
+        self.race_config = RACE_BEGINNER
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="race-preload")
+        # Purchase solves get their own worker, so a build is never queued behind one
+        self.solver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="policy-solve")
+        self.prepared = {} # config -> Future of (world, start snapshot, profile.car_state() it was built with)
+        self.refits = 0    # Prepared worlds whose player car had to be refitted
+
+    def run(self):
+        """Scene loop; returns when the player quits."""
+        while True:
+            if PRELOAD_RACES:
+                self.prepare(self.race_config)
+            result = run_garage(self.screen, self.clock, self.profile, self.store, self.history,
+                                on_hover=self.hover if PRELOAD_RACES else None,
+                                on_purchase=self.purchased if PRELOAD_RACES else None,
+                                race_type=self.race_config.name)
+            if result == "QUIT":
+                break
+            if result not in RACES:
+                continue
+            self.race_config = config = RACES[result]
+            world, start_state = self.take(config)
+            result = run_race(self.screen, self.clock, self.profile, config, self.history,
+                              self.store.ghost_path(config), world, start_state)
+            if result == "QUIT":
+                break
+            # Wear, nitro and winnings were just written back to the profile
+            self.store.save(self.profile)
+        self.close()
+
+    def hover(self, result):
+        self.prepare(RACES[result])
+
+    def purchased(self):
+        # The prepared worlds stay: only their player cars are out of date.
+        # Warm the new car's throttle policy (an engine upgrade needs a solve)
+        self.warm_policy(self.race_config)
+
+    def prepare(self, config):
+        """Start building a world for config unless one is ready or on the way."""
+        if config not in self.prepared:
+            self.prepared[config] = self.executor.submit(self._build, config)
+            self.warm_policy(config)
+
+    def warm_policy(self, config):
+        """Solve the throttle assist's policy for the current car in the background."""
+        self.solver.submit(ThrottlePolicy.for_stats, self.profile.get_modified_stats(),
+                           race_legs(config.checkpoints, config.length))
+
+    def take(self, config):
+        """(world, start snapshot): an unstarted race for config matching the profile as it is now."""
+        future = self.prepared.pop(config, None)
+        if future is not None:
+            try:
+                world, start_state, car_state = future.result() # Waits if the build is still running
+            except Exception:
+                future = None # Build failed: make it here instead
+        if future is None:
+            return RaceWorld(config, self.profile), None
+        if car_state != self.profile.car_state():
+            world.refit_player(self.profile)
+            start_state = repack_player(world, start_state)
+            self.refits += 1
+        return world, start_state
+
+    def close(self):
+        self.solver.shutdown(cancel_futures=True)
+        self.executor.shutdown(cancel_futures=True) # Waits for a build in progress
+        for future in self.prepared.values():
+            if not future.cancelled() and future.exception() is None:
+                future.result()[0].close()
+        self.prepared.clear()
+
+    def _build(self, config):
+        # Taken first: a purchase made while building shows up as a mismatch
+        car_state = self.profile.car_state()
+        world = RaceWorld(config, self.profile)
+        return world, world.snapshot(), car_state
@@ -1,4 +1,4 @@
-import pygame
+import os
 
 # ============================================================================
 # VERSION INFO
@@ -55,6 +55,7 @@ NITRO_FUEL_COST = 10.0
 NITRO_HEAT_SPIKE = 15.0
 
 AI_SPEED_VARIANCE = 1.0
+AI_LOOK_AHEAD = 400 # How far ahead AI drivers scan for hazards and draft targets
 
 # ============================================================================
 # COLORS
@@ -65,6 +66,7 @@ COLOR_TRACK = (60, 60, 60)
 COLOR_TRACK_EDGE = (120, 120, 120)
 COLOR_PLAYER = (80, 180, 80)
 COLOR_PLAYER_HOT = (180, 80, 80)
+COLOR_GUESTS = [(80, 140, 220), (220, 160, 60), (190, 90, 200), (60, 200, 190)] # Other human cars in network races
 COLOR_TEXT = (200, 200, 200)
 COLOR_HIGHLIGHT = (255, 200, 0)
 
@@ -72,3 +74,107 @@ COLOR_HIGHLIGHT = (255, 200, 0)
 # CAREER CONSTANTS
 # ============================================================================
 LEG_DISTANCE = 7500 # 1 Leg = 7500 meters/pixels
+CHECKPOINT_FUEL_REFILL = 40.0
+CHECKPOINT_HEAT_DROP = 50.0
+
+# ============================================================================
+# TRACK STREAMING
+# ============================================================================
+TRACK_CHUNK_LENGTH = 2000  # Obstacles are generated and dropped a chunk at a time
+TRACK_CHUNKS_AHEAD = 2     # Chunks kept in front of the leading live car
+TRACK_CHUNKS_BEHIND = 1    # Chunks kept behind the last live car
+
+# ============================================================================
+# STORAGE
+# ============================================================================
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+SAVE_DIR = os.path.join(DATA_DIR, "saves")
+SAVE_SLOTS = 3 # Career slots, one save file each
+HISTORY_DB = os.path.join(DATA_DIR, "history.sqlite3")
+REPLAY_DIR = os.path.join(DATA_DIR, "replays")
+REPLAY_KEYFRAME_TICKS = FPS * 15 # Full-state keyframe interval for replay seeking
+GHOST_SAMPLE_TICKS = 4 # Ghost car position sample interval
+
+# ============================================================================
+# MASS FIELD (Spectacle events)
+# ============================================================================
+FIELD_FIDELITY_RADIUS = 900   # Cars closer than this to the focus run full physics
+FIELD_DEMOTE_RADIUS = 1100    # Hysteresis so cars don't flicker between tiers
+FIELD_MAX_FULL = 40           # Hard cap on full-fidelity AI cars per tick
+FIELD_LANE_WIDTH = DRAFTING_WIDTH * 2
+FIELD_INCIDENT_RATE = 0.0005  # Per-tick contact chance while running in traffic
+FIELD_CONTACT_RATE = 0.01     # Chance a slingshot out of the draft ends in contact instead
+FIELD_OBSTACLE_AVOID = 0.97   # Chance a far car dodges an obstacle in its lane
+
+# ============================================================================
+# THROTTLE POLICY (Solved heat/fuel strategy)
+# ============================================================================
+POLICY_DIST_STEP = 250        # Distance resolution of the solved table
+POLICY_RES_BINS = 25          # Fuel and heat resolution of the solved table
+POLICY_SPEED_BINS = 8         # Speed resolution of the solved table (0 to max speed)
+POLICY_CRUISE_THROTTLE = 80   # Lowest throttle the table picks unless it has to cool (lifting
+                              # in front of the pack gets a car rear-ended by its drafters)
+POLICY_MAX_LEGS = 4           # Legs of look-ahead solved; longer races reuse the last one
+AI_THROTTLE_POLICY = True     # AI throttle from the solved table instead of the heat hysteresis
+
+# ============================================================================
+# TIME WARP (Spectating)
+# ============================================================================
+WARP_LEVELS = [1, 2, 4, 8, 0]   # Ticks per rendered frame; 0 = as fast as possible
+WARP_FRAME_BUDGET = 0.012       # Seconds of simulation per frame at max warp
+RESOLVE_MAX_TICKS = FPS * 60 * 20 # Safety cap for headless race resolution
+SIM_MAX_STEP = 4                # Longest step (ticks) for warp and headless runs while cars are spread out
+
+# ============================================================================
+# FAST FORWARD (Headless resolution)
+# ============================================================================
+FF_MIN_TICKS = 10     # Shorter isolation windows are simulated normally
+FF_MAX_TICKS = 600    # Re-check isolation at least this often
+FF_MARGIN = 20        # Extra clearance (pixels) on every predicted event
+
+# ============================================================================
+# TRAINING ENVIRONMENT (Learned drivers)
+# ============================================================================
+ENV_MAX_TICKS = FPS * 60 * 3  # Episode cut-off in race ticks
+ENV_THROTTLE_STEP = 5         # Throttle points per unit of throttle action
+ENV_NEAREST_CARS = 4          # Rival cars in each observation
+ENV_NEAREST_OBSTACLES = 4     # Obstacles ahead in each observation
+ENV_POOL_TIMEOUT = 120        # Seconds to wait on env workers before giving up on them
+
+# ============================================================================
+# NETWORK RACES (Authoritative server)
+# ============================================================================
+NET_PORT = 47800              # Default server UDP port
+NET_MAX_PACKET = 1400         # Datagrams are kept under a typical MTU
+NET_VIEW_RADIUS = 900         # Cars further than this from a client's car aren't sent to it
+NET_MAX_CARS = 32             # At most this many cars per snapshot, nearest first
+NET_SNAPSHOT_HISTORY = 64     # Snapshots kept per client as delta baselines
+NET_INPUT_REDUNDANCY = 8      # Past inputs repeated in every input packet
+NET_INPUT_BUFFER = 6          # Queued inputs per client beyond this are dropped (latency cap)
+NET_JOIN_TIMEOUT = 10         # Seconds to wait for a server or for players
+NET_STATS_WINDOW = 1.0        # Seconds of traffic averaged in the stats overlay
+
+# ============================================================================
+# ROLLBACK (Peer-to-peer races)
+# ============================================================================
+ROLLBACK_MAX_FRAMES = 8       # Furthest we run ahead of the peer's inputs before waiting for them
+ROLLBACK_INPUT_DELAY = 1      # Frames local input is held back (fewer rollbacks, a little lag)
+ROLLBACK_CHECK_FRAMES = 60    # Confirmed-state checksum interval, to catch desyncs
+
+# ============================================================================
+# TELEMETRY (Balance tuning traces)
+# ============================================================================
+TELEMETRY_ENABLED = False            # Record every race to TELEMETRY_DIR (needs NumPy)
+TELEMETRY_DIR = os.path.join(DATA_DIR, "telemetry")
+TELEMETRY_SAMPLE_TICKS = 1           # Race ticks between samples
+TELEMETRY_BLOCK_SAMPLES = 600        # Samples per block handed to the writer
+TELEMETRY_BLOCK_BYTES = 4 * 1024 * 1024 # Blocks are shortened to stay under this for big fields
+TELEMETRY_RING_BLOCKS = 4            # Blocks in the ring; samples are dropped if all are waiting on the writer
+
+# ============================================================================
+# STARTUP
+# ============================================================================
+PREWARM_ASSETS = True                # Build fonts and HUD surfaces on a loader thread during the garage
+STARTUP_REPORT = True                # Print time to first frame and to the first race frame
+PRELOAD_RACES = True                 # Build the next race's world on a worker thread while the garage is up
@@ -0,0 +1,63 @@
+import threading
+import time
+from src.settings import *
+from src.utils.ghost import GHOST_COLOR
+from src.utils.render import get_sprite
+from src.utils.startup import mark
+from src.utils.ui import get_font, get_label, track_background, finish_line, tacho_dial
+
+# Everything the race draws that can be built ahead of time
+FONT_SIZES = (20, 24, 26, 28, 32, 36, 40, 48, 64, 150)
+LABELS = [
+    ("CHECKPOINT", 20, (0, 200, 255)),
+    ("RPM", 28, (100, 100, 100)),
+    ("NITRO", 28, COLOR_TEXT),
+    ("STANDINGS", 36, COLOR_TEXT),
+    ("3", 150, (255, 50, 50)),
+    ("2", 150, (255, 50, 50)),
+    ("SET", 150, (255, 200, 0)),
+    ("Target 80-90% RPM!", 40, COLOR_TEXT),
+    ("PERFECT LAUNCH!", 64, COLOR_HIGHLIGHT),
+    ("WHEELSPIN!", 64, COLOR_HIGHLIGHT),
+    ("CHECKPOINT!", 64, COLOR_HIGHLIGHT),
+    ("FINISHED!", 64, (50, 255, 50)),
+    ("DNF", 64, (255, 50, 50)),
+    ("R: Return   BACKSPACE: Retry", 32, COLOR_TEXT),
+]
+
+def prewarm():
+    """Build the fonts and pre-rendered surfaces the race uses."""
+    for size in FONT_SIZES:
+        get_font(size)
+    for text, size, color in LABELS:
+        get_label(text, size, color)
+    track_background()
+    finish_line()
+    tacho_dial()
+    get_sprite(20, 35, GHOST_COLOR)
+
+class AssetLoader:
+    """Runs prewarm() on a thread, so the garage is up before the assets are.
+
+    Start it once the display mode is set. Nothing waits for it: whatever
+    it hasn't built yet is built on first use instead.
+    """
+    def __init__(self):
+        self.seconds = None # Build time, once done
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="asset-loader", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def ready(self):
+        return self.seconds is not None
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            prewarm()
+        except Exception as e:
+            self.error = e # Left to the lazy path
+        self.seconds = time.perf_counter() - start
+        mark("assets ready")
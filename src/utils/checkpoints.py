@@ -0,0 +1,31 @@
+from src.settings import *
+
+class CheckpointTracker:
+    """Checkpoint crossings for every car.
+
+    Each car keeps a cursor into the sorted checkpoint list
+    (car.next_checkpoint_idx), so a tick costs one comparison per car
+    unless it actually crosses a line. Crossing refills fuel, drops heat
+    and records the race time in car.splits.
+    """
+    def __init__(self, cars, checkpoints):
+        self.cars = cars
+        self.checkpoints = checkpoints # Sorted; endless tracks append to it
+
+    def update(self, race_time):
+        """Process crossings since the last call. Returns the cars that crossed."""
+        checkpoints = self.checkpoints
+        num = len(checkpoints)
+        crossed = []
+        for car in self.cars:
+            idx = car.next_checkpoint_idx
+            if idx >= num or car.finished or car.dead:
+                continue
+            while idx < num and car.y >= checkpoints[idx]:
+                idx += 1
+                car.splits.append(race_time)
+                car.fuel = min(car.stats.fuel_capacity, car.fuel + CHECKPOINT_FUEL_REFILL)
+                car.heat = max(0.0, car.heat - CHECKPOINT_HEAT_DROP)
+                crossed.append(car)
+            car.next_checkpoint_idx = idx
+        return crossed
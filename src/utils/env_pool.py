@@ -0,0 +1,236 @@
+import multiprocessing
+import os
+import random
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from src.settings import *
+from src.models.race_config import RACE_BEGINNER
+from src.utils.race_env import BatchRaceEnv, OBS_SIZE, ACT_SIZE
+
+# Commands, written to the header before the "go" barrier
+CMD_NONE = 0
+CMD_STEP = 1
+CMD_RESET = 2
+CMD_CLOSE = 3
+
+def _layout(num_envs):
+    # (name, dtype, shape) of every array in the shared block, in order
+    return [
+        ("header", np.int64, (3,)),               # command, seed, seed given
+        ("actions", np.float32, (num_envs, ACT_SIZE)),
+        ("obs", np.float32, (num_envs, OBS_SIZE)),
+        ("rewards", np.float32, (num_envs,)),
+        ("dones", np.bool_, (num_envs,)),
+        # Result of each race that ended this step
+        ("final_obs", np.float32, (num_envs, OBS_SIZE)),
+        ("returns", np.float64, (num_envs,)),
+        ("ticks", np.int32, (num_envs,)),
+        ("ranks", np.int32, (num_envs,)),
+        ("finished", np.bool_, (num_envs,)),
+    ]
+
+def _map(buf, num_envs):
+    """Arrays of the shared block over buf (None as buf just sizes it)."""
+    arrays = {}
+    offset = 0
+    for name, dtype, shape in _layout(num_envs):
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if buf is not None:
+            arrays[name] = np.ndarray(shape, dtype, buf, offset)
+        offset += (size + 7) // 8 * 8
+    return arrays, offset
+
+def _worker(shm_name, num_envs, first, count, config, seed, frame_skip, max_ticks, barrier):
+    shm = SharedMemory(name=shm_name)
+    arrays, _ = _map(shm.buf, num_envs)
+    header = arrays["header"]
+    mine = slice(first, first + count)
+    env = BatchRaceEnv(count, config, seed, frame_skip, max_ticks,
+                     buffers=(arrays["obs"][mine], arrays["rewards"][mine], arrays["dones"][mine]),
+                     first_index=first)
+    actions = arrays["actions"][mine]
+    try:
+        while True:
+            barrier.wait()
+            command = header[0]
+            if command == CMD_CLOSE:
+                break
+            if command == CMD_STEP:
+                _, _, _, infos = env.step(actions)
+                for i, info in enumerate(infos):
+                    if info:
+                        j = first + i
+                        arrays["final_obs"][j] = info["terminal_observation"]
+                        arrays["returns"][j] = info["episode_return"]
+                        arrays["ticks"][j] = info["episode_ticks"]
+                        arrays["ranks"][j] = info["rank"]
+                        arrays["finished"][j] = info["finished"]
+            elif command == CMD_RESET:
+                env.reset(int(header[1]) if header[2] else None)
+            barrier.wait()
+    except BaseException:
+        # Wake the parent instead of leaving it blocked on the barrier
+        barrier.abort()
+        raise
+    finally:
+        del arrays, header, actions, env
+        shm.close()
+
+class SubprocRaceEnv:
+    """BatchRaceEnv spread over worker processes, one core each.
+
+    Every worker owns a contiguous slice of the races and steps it with
+    its own BatchRaceEnv. Observations, rewards, done flags and results are
+    written straight into one shared-memory block, and the parent puts
+    actions in the same block. A step is two waits on a Barrier: one to
+    start the workers and one for them all to finish. Nothing is pickled
+    after start-up. Races, seeds and results are the same as for a
+    BatchRaceEnv built with the same arguments.
+    """
+    def __init__(self, num_envs, num_workers=None, config=RACE_BEGINNER, seed=None,
+                 frame_skip=1, max_ticks=ENV_MAX_TICKS):
+        self.num_envs = num_envs
+        self.num_workers = max(1, min(num_envs, num_workers or os.cpu_count() or 1))
+        self.seed = seed if seed is not None else random.getrandbits(32)
+
+        _, size = _map(None, num_envs)
+        self.shm = SharedMemory(create=True, size=size)
+        self.arrays, _ = _map(self.shm.buf, num_envs)
+        self.obs = self.arrays["obs"]
+        self.rewards = self.arrays["rewards"]
+        self.dones = self.arrays["dones"]
+
+        self.barrier = multiprocessing.Barrier(self.num_workers + 1)
+        self.workers = []
+        for w in range(self.num_workers):
+            first = num_envs * w // self.num_workers
+            end = num_envs * (w + 1) // self.num_workers
+            process = multiprocessing.Process(
+                target=_worker, name=f"race-env-{w}", daemon=True,
+                args=(self.shm.name, num_envs, first, end - first, config, self.seed,
+                      frame_skip, max_ticks, self.barrier))
+            process.start()
+            self.workers.append(process)
+        self.closed = False
+
+        # Throughput
+        self.num_steps = 0
+        self.step_seconds = 0.0
+
+    def reset(self, seed=None):
+        """Start a new race everywhere. Returns the observation array."""
+        header = self.arrays["header"]
+        if seed is not None:
+            self.seed = seed
+            header[1] = seed
+        header[2] = seed is not None
+        self._run(CMD_RESET)
+        return self.obs
+
+    def step(self, actions):
+        """Same as BatchRaceEnv.step, with every worker stepping its races at once."""
+        start = time.perf_counter()
+        self.arrays["actions"][:] = actions
+        self._run(CMD_STEP)
+
+        arrays = self.arrays
+        infos = [{}] * self.num_envs
+        for i in np.flatnonzero(self.dones).tolist():
+            infos[i] = {
+                "terminal_observation": arrays["final_obs"][i].copy(),
+                "episode_return": float(arrays["returns"][i]),
+                "episode_ticks": int(arrays["ticks"][i]),
+                "rank": int(arrays["ranks"][i]),
+                "finished": bool(arrays["finished"][i]),
+            }
+        self.num_steps += self.num_envs
+        self.step_seconds += time.perf_counter() - start
+        return self.obs, self.rewards, self.dones, infos
+
+    def steps_per_second(self):
+        """Race steps per second of time spent in step(), over every race."""
+        return self.num_steps / self.step_seconds if self.step_seconds else 0.0
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._run(CMD_CLOSE, wait_done=False)
+        except RuntimeError:
+            pass
+        for process in self.workers:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        self.obs = self.rewards = self.dones = self.arrays = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass # The caller still holds views of the arrays; the mapping goes with the process
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self, command, wait_done=True):
+        # Only the parent writes the header, and only while the workers are parked on the barrier
+        if self.closed and command != CMD_CLOSE:
+            raise RuntimeError("env pool is closed")
+        self.arrays["header"][0] = command
+        try:
+            self.barrier.wait(ENV_POOL_TIMEOUT)
+            if wait_done:
+                self.barrier.wait(ENV_POOL_TIMEOUT)
+        except threading.BrokenBarrierError:
+            dead = [p.name for p in self.workers if not p.is_alive()]
+            raise RuntimeError(f"env workers failed or timed out (dead: {', '.join(dead) or 'none'})") from None
+
+def make_race_env(num_envs, num_workers=None, config=RACE_BEGINNER, seed=None,
+                  frame_skip=1, max_ticks=ENV_MAX_TICKS):
+    """The env to train with: a SubprocRaceEnv when there is more than one
+    core to spread the races over, else a BatchRaceEnv in this process
+    (a single worker only adds the barrier round trips). Both take the
+    same calls and give the same races for the same seed.
+    """
+    num_workers = max(1, min(num_envs, num_workers or os.cpu_count() or 1))
+    if num_workers > 1:
+        return SubprocRaceEnv(num_envs, num_workers, config, seed, frame_skip, max_ticks)
+    return BatchRaceEnv(num_envs, config, seed, frame_skip, max_ticks)
+
+if __name__ == "__main__":
+    # python -m src.utils.env_pool [races] [steps] [workers]
+    # Throughput of the pool against the same races as N single-race loops
+    # in one process, and the cost of a bare barrier round trip. The pool
+    # can only come out ahead with a core per worker.
+    import sys
+    num_envs = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    num_workers = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+    actions = np.random.default_rng(0).uniform(-1, 1, (steps, num_envs, ACT_SIZE)).astype(np.float32)
+
+    singles = [BatchRaceEnv(1, seed=1, first_index=i) for i in range(num_envs)]
+    for single in singles:
+        single.reset()
+    for t in range(steps):
+        for i, single in enumerate(singles):
+            single.step(actions[t, i:i + 1])
+    single_rate = num_envs * steps / sum(single.step_seconds for single in singles)
+    print(f"{num_envs} single-race envs: {single_rate:.0f} steps/s")
+
+    with SubprocRaceEnv(num_envs, num_workers, seed=1) as pool:
+        pool.reset()
+        for t in range(steps):
+            pool.step(actions[t])
+        same = all(np.array_equal(pool.obs[i], single.obs[0]) for i, single in enumerate(singles))
+        print(f"{pool.num_workers} workers on {os.cpu_count()} cores: {pool.steps_per_second():.0f} steps/s, "
+              f"{pool.steps_per_second() / single_rate:.2f}x (same observations: {same})")
+        start = time.perf_counter()
+        for _ in range(1000):
+            pool._run(CMD_NONE)
+        print(f"barrier round trip: {(time.perf_counter() - start):.3f}ms")
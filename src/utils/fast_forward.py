@@ -0,0 +1,156 @@
+from bisect import bisect_left, bisect_right
+from src.settings import *
+from src.utils.physics import handle_physics
+
+# Widest lateral distance at which AIDriver treats an obstacle as blocking
+OBSTACLE_SENSE_X = 48
+OBSTACLE_MAX_HEIGHT = 40
+
+def _car_y(car):
+    return car.y
+
+class FastForward:
+    """Event-driven skipping of isolated AI cars for headless runs.
+
+    Every tick, each AI car that is due is given a horizon: the number of
+    ticks before anything could interact with it (another car entering its
+    sensor band, an obstacle in its lateral path, a checkpoint, the finish,
+    running dry or overheating). Horizons assume every car might be moving
+    at the fastest possible speed, so nothing skipped could have mattered.
+    Cars with a long enough horizon are advanced straight to its end with
+    AIDriver.update_isolated + Car.update and sit out the world tick until
+    the race clock catches up. Everyone else runs the normal AI and physics.
+
+    Outcomes are equivalent in distribution, not bit-identical: random draws
+    for skipped cars happen in a different order.
+    """
+    def __init__(self, world):
+        self.world = world
+        self.track = world.track
+        self.ahead_until = {} # id(ai) -> last race tick already simulated, for skipped cars
+
+        # Fastest any car can go (full drafting stack) and worst-case resource rates
+        top_speed = max(car.stats.max_speed for car in world.all_cars)
+        self.max_speed = top_speed * DRAFTING_SPEED_BONUS * 1.15
+        self.max_burn = max(v[0] for v in EFFICIENCY_CURVE.values())
+        self.max_heat = max(v[1] for v in EFFICIENCY_CURVE.values())
+
+        self.skipped_ticks = 0
+
+    def step(self, dt=1):
+        """Advance every AI car to the current race tick, skipping ahead where it is safe to."""
+        world = self.world
+        t = world.race_time
+        ahead_until = self.ahead_until
+
+        max_speed = self.max_speed
+        for car in world.all_cars:
+            if car.speed > max_speed:
+                max_speed = car.speed
+
+        # Running order of everything still on track
+        live = [car for car in world.all_cars if not car.finished]
+        live.sort(key=_car_y)
+        ys = [car.y for car in live]
+        any_finished = len(live) < len(world.all_cars)
+
+        cars = list(world.players)
+        for ai in world.ai_cars:
+            # Ticks this car is behind the race clock
+            lag = t - ahead_until.get(id(ai), t - dt)
+            if lag <= 0:
+                continue
+            ticks, is_urgent = self.horizon(ai, ys, any_finished, max_speed)
+            if ticks >= FF_MIN_TICKS:
+                self.advance(ai, ticks, is_urgent)
+                ahead_until[id(ai)] = t - lag + ticks
+            else:
+                ahead_until.pop(id(ai), None)
+                ai.update(world.track_center, world.obstacles, world.all_cars)
+                ai.car.update(lag, ai.drive)
+                cars.append(ai.car)
+
+        handle_physics(cars, world.obstacles, world.effects)
+
+    def horizon(self, ai, ys, any_finished, v):
+        """(ticks until the car could next interact with anything, urgency)."""
+        car = ai.car
+        if car.dead or car.finished or car.fuel <= 0 or car.is_drafting or car.is_side_drafting:
+            return 0, False
+
+        y = car.y
+        race_length = car.race_length
+        band = AI_LOOK_AHEAD + car.height * 2 + FF_MARGIN
+
+        # Nearest cars ahead and behind
+        lo = bisect_left(ys, y)
+        hi = bisect_right(ys, y)
+        if hi - lo > 1:
+            return 0, False
+        gap = float('inf')
+        if lo > 0:
+            gap = y - ys[lo - 1]
+        if hi < len(ys):
+            gap = min(gap, ys[hi] - y)
+        ticks = min(FF_MAX_TICKS, (gap - band) / v)
+
+        # Rank can only change through something we would have stopped for
+        urgent_y = race_length * 0.85
+        is_urgent = hi < len(ys) or any_finished or y > urgent_y
+        if y < urgent_y:
+            ticks = min(ticks, (urgent_y - y) / v)
+
+        # Next checkpoint, or the finish
+        checkpoints = self.world.checkpoints
+        cp_idx = bisect_right(checkpoints, y)
+        next_line = race_length
+        if cp_idx < len(checkpoints):
+            next_line = min(next_line, checkpoints[cp_idx])
+        ticks = min(ticks, (next_line - y - car.height - FF_MARGIN) / v)
+
+        # Resources: worst-case burn and heat gain
+        burn = self.max_burn
+        if car.comp_rear < 0.8:
+            burn += (0.8 - car.comp_rear) * 0.1
+        ticks = min(ticks, (car.fuel - 1.0) / burn)
+        ticks = min(ticks, (car.stats.heat_capacity - car.heat - 1.0) / self.max_heat)
+
+        # Nothing is known past the end of the streamed track
+        ticks = min(ticks, (self.track.end_y - y - band) / v)
+
+        if ticks < FF_MIN_TICKS:
+            return 0, False
+
+        # Obstacles anywhere in the lateral band the car can sweep while cruising
+        preferred_x = self.world.track_center + ai.lane_preference * 60
+        target_x = ai.target_x if ai.target_x is not None else preferred_x
+        drift = abs(car.lateral_speed) * 12.5 + FF_MARGIN
+        x_lo = min(car.x, target_x, preferred_x) - drift - car.width / 2 - OBSTACLE_SENSE_X
+        x_hi = max(car.x, target_x, preferred_x) + drift + car.width / 2 + OBSTACLE_SENSE_X
+
+        reach = y + band + v * ticks
+        obstacles = self.track.obstacles
+        j = bisect_left(self.track.obstacle_ys, y - car.height - OBSTACLE_MAX_HEIGHT)
+        while j < len(obstacles):
+            obs = obstacles[j]
+            if obs.y > reach:
+                break
+            if obs.x + obs.width > x_lo and obs.x < x_hi:
+                ticks = min(ticks, (obs.y - y - band) / v)
+                break
+            j += 1
+
+        if ticks < FF_MIN_TICKS:
+            return 0, False
+        return int(ticks), is_urgent
+
+    def advance(self, ai, ticks, is_urgent):
+        """Tight inner loop: nothing but this car exists for the next `ticks` ticks."""
+        car = ai.car
+        track_center = self.world.track_center
+        update_isolated = ai.update_isolated
+        update = car.update
+        for _ in range(ticks):
+            update_isolated(track_center, is_urgent)
+            update()
+        self.skipped_ticks += ticks
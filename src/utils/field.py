@@ -0,0 +1,220 @@
+from bisect import bisect_left, bisect_right
+from src.settings import *
+from src.utils.physics import handle_physics
+
+SECTORS = ("FRONT", "REAR", "FL", "FR", "RL", "RR")
+
+def _car_y(ai):
+    return ai.car.y
+
+class FieldSimulator:
+    """Two-tier simulation for mass-field races.
+
+    The AI cars closest to the focus (at most FIELD_MAX_FULL of them) run the
+    regular AIDriver / Car.update / handle_physics stack together with the
+    human cars. Everyone else runs Car.update_reduced: throttle and resources are
+    integrated as normal, drafting is resolved per lane in one pass over the
+    running order, and contact with cars and obstacles is rolled instead of
+    tested with rects.
+
+    While headless (a resolve nobody watches) there is no window at all:
+    every AI car runs the reduced model, and steps may be several ticks.
+    """
+    def __init__(self, ai_drivers, track, track_center, rng):
+        self.track_center = track_center
+        self.rng = rng
+        self.effects = None # Set by RaceWorld.emit_effects
+        self.headless = False # No full-fidelity window (RaceWorld.begin_resolve)
+        # Streamed by the Track, kept sorted by y
+        self.obstacles = track.obstacles
+        self.obstacle_ys = track.obstacle_ys
+
+        # Running order (ascending y). Re-sorted every tick, which is close
+        # to linear because the order barely changes between ticks.
+        self.order = list(ai_drivers)
+        self.near = []
+
+        self.num_lanes = TRACK_WIDTH // FIELD_LANE_WIDTH + 1
+        self.lane_car = [None] * self.num_lanes
+
+        for ai in self.order:
+            ai.full_fidelity = False
+
+    def step(self, players, focus_y, dt=1):
+        """Advance every AI car by dt ticks. The human cars are updated by the caller."""
+        order = self.order
+        order.sort(key=_car_y)
+        ys = [ai.car.y for ai in order]
+
+        lead_y = max(car.y for car in players)
+        if ys and ys[-1] > lead_y:
+            lead_y = ys[-1]
+        urgent_y = players[0].race_length * 0.85
+
+        if self.headless:
+            for ai in self.near:
+                self._demote(ai)
+            self.near = []
+        else:
+            self._retier(players, focus_y, ys)
+        self._step_far(lead_y, urgent_y, dt)
+
+        # Full fidelity window around the focus
+        window = list(players)
+        for ai in self.near:
+            window.append(ai.car)
+
+        lo = bisect_left(self.obstacle_ys, focus_y - FIELD_DEMOTE_RADIUS - 400)
+        hi = bisect_right(self.obstacle_ys, focus_y + FIELD_DEMOTE_RADIUS + 400)
+        local_obstacles = self.obstacles[lo:hi]
+
+        for ai in self.near:
+            car = ai.car
+            ai.update(self.track_center, local_obstacles, window, car.y < lead_y or car.y > urgent_y)
+            car.update(dt, ai.drive)
+
+        handle_physics(window, local_obstacles, self.effects)
+
+    def _retier(self, players, focus_y, ys):
+        lo = bisect_left(ys, focus_y - FIELD_DEMOTE_RADIUS)
+        hi = bisect_right(ys, focus_y + FIELD_DEMOTE_RADIUS)
+
+        # Cars already at full fidelity keep it until the demote radius
+        near = []
+        for ai in self.order[lo:hi]:
+            if ai.full_fidelity or abs(ai.car.y - focus_y) < FIELD_FIDELITY_RADIUS:
+                near.append(ai)
+
+        if len(near) > FIELD_MAX_FULL:
+            near.sort(key=lambda ai: abs(ai.car.y - focus_y))
+            del near[FIELD_MAX_FULL:]
+
+        kept = set(map(id, near))
+        for ai in self.near:
+            if id(ai) not in kept:
+                self._demote(ai)
+
+        placed = list(players)
+        for ai in near:
+            if ai.full_fidelity:
+                placed.append(ai.car)
+        for ai in near:
+            if not ai.full_fidelity:
+                self._promote(ai, placed)
+                placed.append(ai.car)
+
+        self.near = near
+
+    def _promote(self, ai, placed):
+        car = ai.car
+        ai.full_fidelity = True
+        ai.target_x = None
+        car.lateral_speed = 0.0
+
+        # Far cars are allowed to overlap. Slot in behind anything we would
+        # land on so the car doesn't take collision damage on its first tick.
+        for _ in range(len(placed)):
+            rect = car.get_rect()
+            blocker = None
+            for other in placed:
+                if rect.colliderect(other.get_rect()):
+                    blocker = other
+                    break
+            if blocker is None:
+                break
+            car.y = blocker.y - car.height - 1
+
+    def _demote(self, ai):
+        ai.full_fidelity = False
+        ai.car.lateral_speed = 0.0
+        ai.car.is_side_drafting = False
+
+    def _step_far(self, lead_y, urgent_y, dt):
+        order = self.order
+        obstacles = self.obstacles
+        obstacle_ys = self.obstacle_ys
+        lane_car = self.lane_car
+        last_lane = self.num_lanes - 1
+        rand = self.rng.random
+
+        for i in range(len(lane_car)):
+            lane_car[i] = None
+
+        # Front to back, so lane_car always holds the nearest car ahead
+        for idx in range(len(order) - 1, -1, -1):
+            ai = order[idx]
+            car = ai.car
+
+            if car.finished or car.dead:
+                if not ai.full_fidelity:
+                    for _ in range(dt):
+                        car.update_reduced()
+                continue
+
+            lane = int((car.x - TRACK_X) // FIELD_LANE_WIDTH)
+            if lane < 0:
+                lane = 0
+            elif lane > last_lane:
+                lane = last_lane
+
+            ahead = lane_car[lane]
+            lane_car[lane] = car
+
+            if ai.full_fidelity:
+                continue
+
+            # Aggregate drafting: only the car directly ahead in the lane counts
+            car.is_drafting = False
+            if ahead is not None:
+                gap = ahead.y - car.y
+                if gap < car.height + 15:
+                    # Slingshot into a neighbouring lane, occasionally trading paint
+                    if rand() < FIELD_CONTACT_RATE:
+                        impact = abs(car.speed - ahead.speed) * 2.0
+                        car.speed *= 0.9
+                        car.y = ahead.y - car.height - 1
+                        car.apply_damage(impact, "FRONT")
+                        ahead.apply_damage(impact, "REAR")
+                    else:
+                        if lane == 0 or (lane < last_lane and rand() < 0.5):
+                            lane += 1
+                        else:
+                            lane -= 1
+                        car.x = TRACK_X + (lane + 0.5) * FIELD_LANE_WIDTH
+                elif gap < DRAFTING_DIST:
+                    car.is_drafting = True
+                    if rand() < FIELD_INCIDENT_RATE * dt:
+                        car.apply_damage(5.0, self.rng.choice(SECTORS))
+                        car.speed *= 0.9
+
+            is_urgent = car.y < lead_y or car.y > urgent_y
+            prev_y = car.y
+            for _ in range(dt):
+                ai.update_throttle(is_urgent)
+                car.update_reduced()
+
+            # Obstacles crossed this tick
+            k = bisect_right(obstacle_ys, prev_y)
+            end = bisect_right(obstacle_ys, car.y)
+            while k < end:
+                self._pass_obstacle(car, obstacles[k])
+                k += 1
+
+    def _pass_obstacle(self, car, obs):
+        half_w = car.width / 2
+        if car.x + half_w <= obs.x or car.x - half_w >= obs.x + obs.width:
+            return
+
+        if self.rng.random() < FIELD_OBSTACLE_AVOID:
+            # Dodged: end up on the nearer clear side
+            left = obs.x - half_w - 1
+            right = obs.x + obs.width + half_w + 1
+            if left < TRACK_X + half_w:
+                car.x = right
+            elif right > TRACK_X + TRACK_WIDTH - half_w:
+                car.x = left
+            else:
+                car.x = left if car.x - left < right - car.x else right
+        else:
+            car.apply_damage(max(1.0, obs.damage), "FRONT")
+            car.speed *= 0.5
@@ -0,0 +1,157 @@
+import os
+import struct
+from src.settings import *
+from src.utils.render import get_sprite
+
+GHOST_MAGIC = b"DRGH"
+GHOST_FORMAT_VERSION = 2 # 2: race time of the first sample
+
+# magic, version, ticks per sample, track seed, finish time, start time, start x, start y, samples
+_HEADER = struct.Struct("<4sHHIIIiiI")
+_DELTA = struct.Struct("<hh") # Quantised move since the previous sample
+
+GHOST_QUANT = 8 # Positions are stored in 1/8 px
+GHOST_BLOCK_SAMPLES = 256 # Samples read from disk at a time
+GHOST_COLOR = (180, 200, 255, 100)
+
+def ghost_finish_time(path):
+    """Finish time of the ghost saved at path, or None."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, _, _, finish_time, _, _, _, _ = _HEADER.unpack(data)
+    if magic != GHOST_MAGIC or version != GHOST_FORMAT_VERSION:
+        return None
+    return finish_time
+
+class GhostRecorder:
+    """Samples the player's position every GHOST_SAMPLE_TICKS of race time.
+
+    The first sample is taken at the first call (the end of the countdown,
+    race time 0) and its race time is saved, so the ghost lines up with
+    the run whenever recording started.
+    """
+    def __init__(self, seed):
+        self.seed = seed
+        self.start = None
+        self.start_time = 0
+        self.last = None   # Last position written, quantised
+        self.deltas = bytearray()
+        self.count = 0
+        self.next_sample = 0
+
+    def sample(self, race_time, car):
+        if self.start is None:
+            self.start = self.last = (round(car.x * GHOST_QUANT), round(car.y * GHOST_QUANT))
+            self.start_time = race_time
+            self.next_sample = race_time + GHOST_SAMPLE_TICKS
+            return
+        while race_time >= self.next_sample:
+            self.next_sample += GHOST_SAMPLE_TICKS
+            q = (round(car.x * GHOST_QUANT), round(car.y * GHOST_QUANT))
+            # Deltas are taken from the last written position, so a clamped
+            # step is made up on the next samples instead of drifting
+            dx = max(-32768, min(32767, q[0] - self.last[0]))
+            dy = max(-32768, min(32767, q[1] - self.last[1]))
+            self.deltas += _DELTA.pack(dx, dy)
+            self.last = (self.last[0] + dx, self.last[1] + dy)
+            self.count += 1
+
+    def save_if_best(self, path, finish_time):
+        """Write the run to path unless the ghost already there is at least as fast."""
+        if self.start is None:
+            return False
+        best = ghost_finish_time(path)
+        if best is not None and best <= finish_time:
+            return False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(GHOST_MAGIC, GHOST_FORMAT_VERSION, GHOST_SAMPLE_TICKS, self.seed,
+                                 finish_time, self.start_time, self.start[0], self.start[1], self.count))
+            f.write(self.deltas)
+        os.replace(tmp_path, path)
+        return True
+
+class Ghost:
+    """Best previous run, replayed from disk as the race goes on.
+
+    Purely visual: it is never part of all_cars, so physics, AI and
+    particles don't know it exists. Samples are read a block at a time
+    and positions are interpolated between them.
+    """
+    def __init__(self, path, seed):
+        self.file = open(path, "rb")
+        header = self.file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            self.file.close()
+            raise ValueError(f"{path}: not a ghost")
+        magic, version, interval, ghost_seed, finish_time, start_time, x, y, count = _HEADER.unpack(header)
+        if magic != GHOST_MAGIC or version != GHOST_FORMAT_VERSION or ghost_seed != seed:
+            self.file.close()
+            raise ValueError(f"{path}: not a ghost of this track")
+        self.interval = interval
+        self.finish_time = finish_time
+        self.start_time = start_time
+        self.remaining = count # Samples still on disk
+        self.block = b""
+        self.block_pos = 0
+
+        self.index = 0 # Sample at or before the current race time
+        self.cur = (x, y)
+        self.next = self._read_next(self.cur)
+
+        self.surface = get_sprite(20, 35, GHOST_COLOR)
+
+    @classmethod
+    def open(cls, path, seed):
+        """Ghost at path, or None if there isn't a usable one."""
+        try:
+            return cls(path, seed)
+        except (OSError, ValueError):
+            return None
+
+    def close(self):
+        self.file.close()
+
+    def _read_next(self, base):
+        # Sample after base, or None past the end of the run
+        if self.block_pos >= len(self.block):
+            if self.remaining <= 0:
+                return None
+            count = min(self.remaining, GHOST_BLOCK_SAMPLES)
+            self.block = self.file.read(count * _DELTA.size)
+            self.block_pos = 0
+            self.remaining -= count
+            if len(self.block) < _DELTA.size:
+                self.remaining = 0
+                return None
+        dx, dy = _DELTA.unpack_from(self.block, self.block_pos)
+        self.block_pos += _DELTA.size
+        return (base[0] + dx, base[1] + dy)
+
+    def position(self, race_time):
+        """Interpolated (x, y) at race_time. Race time only moves forward."""
+        f = max(0, race_time - self.start_time) / self.interval
+        i = int(f)
+        while self.index < i and self.next is not None:
+            nxt = self._read_next(self.next)
+            self.cur = self.next
+            self.next = nxt
+            self.index += 1
+        if self.next is None or self.index < i:
+            return self.cur[0] / GHOST_QUANT, self.cur[1] / GHOST_QUANT
+        t = f - self.index
+        x = self.cur[0] + (self.next[0] - self.cur[0]) * t
+        y = self.cur[1] + (self.next[1] - self.cur[1]) * t
+        return x / GHOST_QUANT, y / GHOST_QUANT
+
+    def draw(self, surface, camera_y, race_time):
+        x, y = self.position(race_time)
+        screen_y = SCREEN_HEIGHT - (y - camera_y) - 35 // 2
+        if -35 < screen_y < SCREEN_HEIGHT + 35:
+            surface.blit(self.surface, (x - 20 // 2, screen_y))
@@ -0,0 +1,227 @@
+import struct
+import time
+from collections import deque
+from src.settings import *
+from src.models.race_config import RaceConfig
+from src.utils.varint import write_varint, read_varint, zigzag, unzigzag
+
+# Wire format of network races. Every datagram starts with a message type.
+#
+#   HELLO     client -> server  join request
+#   WELCOME   server -> client  race setup: config, world seed, your car
+#   INPUT     client -> server  newest input bits plus the ones before them
+#   SNAPSHOT  server -> client  race clock, your car's private state, and the
+#                               cars around you, delta-encoded against the
+#                               last snapshot you acknowledged
+#   BYE       either way        leaving / race over
+
+NET_PROTOCOL_VERSION = 1
+
+MSG_HELLO = 1
+MSG_WELCOME = 2
+MSG_INPUT = 3
+MSG_SNAPSHOT = 4
+MSG_BYE = 5
+
+_HELLO = struct.Struct("<BH")          # type, protocol version
+# type, protocol version, your car, human cars, world seed,
+# length (-1 = endless), rivals, prize money, obstacles, track seed (or -1), checkpoints, field mode
+_WELCOME = struct.Struct("<BHBBIiIIIqH?")
+# type, acked snapshot, client timestamp (ms), newest input number, inputs that follow
+_INPUT = struct.Struct("<BIIIB")
+# type, snapshot number, baseline (0 = none), race time, countdown, flags,
+# your rank, your fuel (/255 of capacity), throttle, nitro charges, echoed timestamp, hold (ms)
+_SNAPSHOT = struct.Struct("<BIIihBHBBBIH")
+
+SNAP_RACING = 1
+SNAP_SETTLED = 2 # Nothing left to simulate
+
+# Quantised car record, one int per field
+CAR_X = 0       # 1/8 px
+CAR_Y = 1       # 1/8 px
+CAR_SPEED = 2   # 1/16 px per tick
+CAR_HEAT = 3    # whole degrees
+CAR_HEALTH = 4  # whole points
+CAR_FLAGS = 5   # FLAG_* bits
+CAR_FIELDS = 6
+
+FLAG_FINISHED = 1
+FLAG_DEAD = 2
+FLAG_DRAFTING = 4
+FLAG_SIDE_DRAFTING = 8
+FLAG_NITRO = 16
+
+def timestamp_ms():
+    return int(time.perf_counter() * 1000) & 0xFFFFFFFF
+
+def quantise_car(car):
+    flags = 0
+    if car.finished: flags |= FLAG_FINISHED
+    if car.dead: flags |= FLAG_DEAD
+    if car.is_drafting: flags |= FLAG_DRAFTING
+    if car.is_side_drafting: flags |= FLAG_SIDE_DRAFTING
+    if car.nitro_active > 0: flags |= FLAG_NITRO
+    return (round(car.x * 8), round(car.y * 8), round(car.speed * 16),
+            min(255, max(0, round(car.heat))), max(0, round(car.health)), flags)
+
+def apply_car(car, record):
+    """Put a quantised record back on a (display-only) car."""
+    car.x = record[CAR_X] / 8
+    car.y = record[CAR_Y] / 8
+    car.speed = record[CAR_SPEED] / 16
+    car.heat = float(record[CAR_HEAT])
+    car.health = float(record[CAR_HEALTH])
+    flags = record[CAR_FLAGS]
+    car.finished = bool(flags & FLAG_FINISHED)
+    car.dead = bool(flags & FLAG_DEAD)
+    car.is_drafting = bool(flags & FLAG_DRAFTING)
+    car.is_side_drafting = bool(flags & FLAG_SIDE_DRAFTING)
+    car.nitro_active = 1 if flags & FLAG_NITRO else 0
+
+def pack_hello():
+    return _HELLO.pack(MSG_HELLO, NET_PROTOCOL_VERSION)
+
+def unpack_hello(data):
+    _, version = _HELLO.unpack_from(data)
+    return version
+
+def pack_welcome(index, num_players, world_seed, config):
+    # Track files aren't sent: the track is regenerated from its seed
+    body = _WELCOME.pack(MSG_WELCOME, NET_PROTOCOL_VERSION, index, num_players, world_seed,
+                         config.length if config.length is not None else -1, config.num_ai,
+                         config.prize_money, config.num_obstacles,
+                         config.seed if config.seed is not None else -1,
+                         len(config.checkpoints), config.field_mode)
+    return body + struct.pack(f"<{len(config.checkpoints)}I", *config.checkpoints)
+
+def unpack_welcome(data):
+    """(protocol version, your car, human cars, world seed, RaceConfig)."""
+    (_, version, index, num_players, world_seed, length, num_ai, prize, num_obstacles,
+     seed, num_cps, field_mode) = _WELCOME.unpack_from(data)
+    checkpoints = list(struct.unpack_from(f"<{num_cps}I", data, _WELCOME.size))
+    config = RaceConfig(length if length >= 0 else None, num_ai, prize, checkpoints,
+                        num_obstacles=num_obstacles, field_mode=field_mode,
+                        seed=seed if seed >= 0 else None, name="NETWORK")
+    return version, index, num_players, world_seed, config
+
+def pack_input(ack, stamp, newest, history):
+    """history: input bits, oldest first, the last one being input number newest."""
+    return _INPUT.pack(MSG_INPUT, ack, stamp, newest, len(history)) + bytes(history)
+
+def unpack_input(data):
+    """(acked snapshot, client timestamp, newest input number, [bits], oldest first)."""
+    _, ack, stamp, newest, count = _INPUT.unpack_from(data)
+    return ack, stamp, newest, list(data[_INPUT.size:_INPUT.size + count])
+
+def pack_snapshot(header, cars, baseline):
+    """Snapshot message. header is the _SNAPSHOT fields after the type,
+    cars is {car index: record} and baseline the cars of the snapshot the
+    client acknowledged (None = send everything).
+
+    Only cars that changed since the baseline are written, each with a
+    mask of the fields that changed and the zigzag delta of each. Cars that
+    dropped out of view are listed by index.
+    """
+    if baseline is None:
+        baseline = {}
+    out = bytearray(_SNAPSHOT.pack(MSG_SNAPSHOT, *header))
+
+    # Indices are written as gaps from the previous one
+    removed = sorted(i for i in baseline if i not in cars)
+    write_varint(out, len(removed))
+    prev = -1
+    for i in removed:
+        write_varint(out, i - prev - 1)
+        prev = i
+
+    changed = []
+    for i in sorted(cars):
+        record = cars[i]
+        if baseline.get(i) != record:
+            changed.append(i)
+    write_varint(out, len(changed))
+    prev = -1
+    empty = (0,) * CAR_FIELDS
+    for i in changed:
+        record = cars[i]
+        base = baseline.get(i, empty)
+        write_varint(out, i - prev - 1)
+        prev = i
+        mask = 0
+        for f in range(CAR_FIELDS):
+            if record[f] != base[f]:
+                mask |= 1 << f
+        out.append(mask)
+        for f in range(CAR_FIELDS):
+            if mask & (1 << f):
+                write_varint(out, zigzag(record[f] - base[f]))
+    return bytes(out)
+
+def unpack_snapshot(data, baselines):
+    """(header fields after the type, {car index: record}).
+
+    baselines maps snapshot numbers to the cars already decoded for them.
+    Returns None if the baseline the server used is not among them.
+    """
+    header = _SNAPSHOT.unpack_from(data)[1:]
+    baseline_seq = header[1]
+    if baseline_seq:
+        baseline = baselines.get(baseline_seq)
+        if baseline is None:
+            return None
+        cars = dict(baseline)
+    else:
+        cars = {}
+    offset = _SNAPSHOT.size
+
+    count, offset = read_varint(data, offset)
+    i = -1
+    for _ in range(count):
+        gap, offset = read_varint(data, offset)
+        i += gap + 1
+        cars.pop(i, None)
+
+    count, offset = read_varint(data, offset)
+    i = -1
+    empty = (0,) * CAR_FIELDS
+    for _ in range(count):
+        gap, offset = read_varint(data, offset)
+        i += gap + 1
+        mask = data[offset]
+        offset += 1
+        record = list(cars.get(i, empty))
+        for f in range(CAR_FIELDS):
+            if mask & (1 << f):
+                delta, offset = read_varint(data, offset)
+                record[f] += unzigzag(delta)
+        cars[i] = tuple(record)
+    return header, cars
+
+class TrafficMeter:
+    """Packets and bytes over the last NET_STATS_WINDOW seconds, plus totals."""
+    def __init__(self):
+        self.window = deque() # (time, bytes)
+        self.window_bytes = 0
+        self.total_packets = 0
+        self.total_bytes = 0
+
+    def add(self, nbytes):
+        now = time.perf_counter()
+        self.window.append((now, nbytes))
+        self.window_bytes += nbytes
+        self.total_packets += 1
+        self.total_bytes += nbytes
+        self._trim(now)
+
+    def bytes_per_second(self):
+        self._trim(time.perf_counter())
+        return self.window_bytes / NET_STATS_WINDOW
+
+    def packets_per_second(self):
+        self._trim(time.perf_counter())
+        return len(self.window) / NET_STATS_WINDOW
+
+    def _trim(self, now):
+        window = self.window
+        while window and window[0][0] < now - NET_STATS_WINDOW:
+            self.window_bytes -= window.popleft()[1]
@@ -1,26 +1,88 @@
 from src.settings import *
-from src.models.particle import ParticleSystem
+from src.models.effects import EFFECT_WRECK, EFFECT_SCRAPE, EFFECT_SIDE, EFFECT_BUMP
 
-# We need to pass the particle system in or use the global one from car.py (which is bad practice but quick refactor)
-# Better: Pass it in. For now, let's import the one from car.py to maintain state
-from src.models.car import particles
+def sweep_time(ax, ay, aw, ah, dx, dy, bx, by, bw, bh):
+    """Time of impact (0..1) of box a moving by (dx, dy) into static box b.
 
-def handle_physics(cars, obstacles=None):
+    Boxes are (left, top, width, height). Returns None if a never touches b
+    during the move or already overlaps it at the start.
+    """
+    if dx > 0:
+        x_entry = (bx - (ax + aw)) / dx
+        x_exit = (bx + bw - ax) / dx
+    elif dx < 0:
+        x_entry = (bx + bw - ax) / dx
+        x_exit = (bx - (ax + aw)) / dx
+    elif ax + aw <= bx or ax >= bx + bw:
+        return None
+    else:
+        x_entry = float('-inf')
+        x_exit = float('inf')
+        
+    if dy > 0:
+        y_entry = (by - (ay + ah)) / dy
+        y_exit = (by + bh - ay) / dy
+    elif dy < 0:
+        y_entry = (by + bh - ay) / dy
+        y_exit = (by - (ay + ah)) / dy
+    elif ay + ah <= by or ay >= by + bh:
+        return None
+    else:
+        y_entry = float('-inf')
+        y_exit = float('inf')
+        
+    entry = max(x_entry, y_entry)
+    if entry < 0 or entry > 1 or entry > min(x_exit, y_exit):
+        return None
+    return entry
+
+def swept_bounds(car):
+    """(left, right, top, bottom) of everything the car covered during its last update."""
+    # One pixel of slack covers the integer rounding in get_rect()
+    half_w = car.width / 2 + 1
+    half_h = car.height / 2 + 1
+    return (min(car.prev_x, car.x) - half_w, max(car.prev_x, car.x) + half_w,
+            min(car.prev_y, car.y) - half_h, max(car.prev_y, car.y) + half_h)
+
+def handle_physics(cars, obstacles=None, effects=None):
+    """Collisions and drafting for one step. Impacts are reported to effects (a list) if given."""
     if obstacles is None:
-        obstacles = []
+        obstacles = ()
         
     for car in cars:
         car.is_drafting = False
         car.is_side_drafting = False
+    
+    # Continuous collision: each car is swept from where it started the
+    # update to where it ended, so long steps can't tunnel through anything.
+    # (Built per call: races on other threads may be in here too)
+    bounds = [swept_bounds(car) for car in cars]
         
     for i, car_a in enumerate(cars):
         if car_a.finished:
             continue
             
         rect_a = car_a.get_rect()
+        left_a, right_a, top_a, bottom_a = bounds[i]
         
         for obs in obstacles:
-            if rect_a.colliderect(obs.get_rect()):
+            if obs.y >= bottom_a or obs.y + obs.height <= top_a or obs.x >= right_a or obs.x + obs.width <= left_a:
+                continue
+            
+            # Resolve at the moment of contact, so a long step can't carry
+            # the car into (or through) the obstacle first
+            hit = rect_a.colliderect(obs.get_rect())
+            dx = car_a.x - car_a.prev_x
+            dy = car_a.y - car_a.prev_y
+            toi = sweep_time(car_a.prev_x - car_a.width / 2, car_a.prev_y - car_a.height / 2, car_a.width, car_a.height,
+                             dx, dy, obs.x, obs.y, obs.width, obs.height)
+            if toi is not None:
+                car_a.x = car_a.prev_x + dx * toi
+                car_a.y = car_a.prev_y + dy * toi
+                rect_a = car_a.get_rect()
+                hit = True
+                    
+            if hit:
                 is_head_on = False
                 if car_a.y < obs.y:
                     x_overlap = min(car_a.x + car_a.width, obs.x + obs.width) - max(car_a.x, obs.x)
@@ -31,12 +93,14 @@ def handle_physics(cars, obstacles=None):
                     car_a.health = 0
                     car_a.dead = True
                     car_a.speed = 0
-                    particles.add_explosion(car_a.x + car_a.width/2, car_a.y + car_a.height, 20, (255, 50, 0))
+                    if effects is not None:
+                        effects.append((EFFECT_WRECK, car_a.x + car_a.width/2, car_a.y + car_a.height, 20))
                 else:
                     dmg_amount = max(1.0, obs.damage) 
                     car_a.apply_damage(dmg_amount, "FRONT") 
                     car_a.speed *= 0.5
-                    particles.add_explosion(car_a.x + car_a.width/2, car_a.y + car_a.height/2, 5, (200, 200, 200))
+                    if effects is not None:
+                        effects.append((EFFECT_SCRAPE, car_a.x + car_a.width/2, car_a.y + car_a.height/2, 5))
                     
                     if car_a.y < obs.y: 
                         car_a.y = obs.y - car_a.height - 5
@@ -46,14 +110,40 @@ def handle_physics(cars, obstacles=None):
                 continue
                 
             rect_b = car_b.get_rect()
+            left_b, right_b, top_b, bottom_b = bounds[j]
+            
+            hit = rect_a.colliderect(rect_b)
+            if left_a < right_b and left_b < right_a and top_a < bottom_b and top_b < bottom_a:
+                # Sweep a against b in b's frame of reference to find first contact
+                da_x = car_a.x - car_a.prev_x
+                da_y = car_a.y - car_a.prev_y
+                db_x = car_b.x - car_b.prev_x
+                db_y = car_b.y - car_b.prev_y
+                toi = sweep_time(car_a.prev_x - car_a.width / 2, car_a.prev_y - car_a.height / 2, car_a.width, car_a.height,
+                                 da_x - db_x, da_y - db_y,
+                                 car_b.prev_x - car_b.width / 2, car_b.prev_y - car_b.height / 2, car_b.width, car_b.height)
+                if toi is not None:
+                    # Offset at the moment of contact. The car that ran into the
+                    # other is put back at that offset; the one hit keeps its progress.
+                    rel_x = car_a.prev_x - car_b.prev_x + (da_x - db_x) * toi
+                    rel_y = car_a.prev_y - car_b.prev_y + (da_y - db_y) * toi
+                    if abs(rel_x) > abs(rel_y) or rel_y < 0:
+                        car_a.x = car_b.x + rel_x
+                        car_a.y = car_b.y + rel_y
+                    else:
+                        car_b.x = car_a.x - rel_x
+                        car_b.y = car_a.y - rel_y
+                    rect_a = car_a.get_rect()
+                    hit = True
             
-            if rect_a.colliderect(rect_b):
+            if hit:
                 dx = car_a.x - car_b.x
                 dy = car_a.y - car_b.y
                 
                 if abs(dx) > abs(dy):
                     push = COLLISION_BOUNCE
-                    particles.add_explosion(car_a.x + (0 if dx > 0 else car_a.width), car_a.y + car_a.height/2, 5, (255, 200, 0))
+                    if effects is not None:
+                        effects.append((EFFECT_SIDE, car_a.x + (0 if dx > 0 else car_a.width), car_a.y + car_a.height/2, 5))
                     if dx > 0:
                         car_a.x += push
                         car_b.x -= push
@@ -66,7 +156,8 @@ def handle_physics(cars, obstacles=None):
                         car_b.apply_damage(5.0, "FL" if car_b.y > car_a.y else "RL")
                         
                 else:
-                    particles.add_explosion(car_a.x + car_a.width/2, car_a.y + (car_a.height if dy < 0 else 0), 8, (255, 100, 0))
+                    if effects is not None:
+                        effects.append((EFFECT_BUMP, car_a.x + car_a.width/2, car_a.y + (car_a.height if dy < 0 else 0), 8))
                     if dy < 0:
                         car_a.speed *= 0.9
                         car_a.y = car_b.y - car_a.height - 1
@@ -0,0 +1,165 @@
+import random
+import socket
+import struct
+import time
+from collections import deque
+from src.settings import *
+from src.models.player_profile import PlayerProfile
+from src.models.race_world import RaceWorld
+from src.utils.replay import INPUT_UP, INPUT_DOWN
+from src.utils.net_protocol import *
+
+class RaceClient:
+    """Connection to a RaceServer, and the race as last reported by it.
+
+    join() builds the same RaceWorld the server runs (same config and world
+    seed, so the same grid, colours and track) but never ticks it: poll()
+    writes the latest snapshot onto its cars and streams the track around
+    this client's car. visible holds the indices of the cars in that
+    snapshot; the rest are out of view and stale.
+    """
+    def __init__(self, server_address):
+        self.server = server_address
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1" if server_address[0] in ("127.0.0.1", "localhost") else "", 0))
+        self.sock.setblocking(False)
+        self.world = None
+        self.car = None
+        self.visible = ()
+        self.over = False     # Server said the race is over (or went away)
+        self.settled = False  # Nothing left to simulate on the server
+
+        self.input_seq = 0
+        self.history = deque(maxlen=NET_INPUT_REDUNDANCY)
+        self.latest = 0       # Newest snapshot decoded
+        self.states = {}      # Snapshot number -> cars, kept as delta baselines
+        self.rank = 0
+
+        # Stats
+        self.rtt_ms = 0.0     # Smoothed round trip
+        self.lost = 0         # Snapshots never received (gaps in numbering)
+        self.late = 0         # Snapshots that arrived after a newer one
+        self.undecodable = 0  # Snapshots whose baseline we no longer had
+        self.last_size = 0    # Bytes in the newest snapshot
+        self.traffic_in = TrafficMeter()
+        self.traffic_out = TrafficMeter()
+
+    def join(self, timeout=NET_JOIN_TIMEOUT):
+        """Say HELLO until the server answers with the race. False on timeout."""
+        deadline = time.perf_counter() + timeout
+        hello = pack_hello()
+        next_hello = 0.0
+        while time.perf_counter() < deadline:
+            now = time.perf_counter()
+            if now >= next_hello:
+                self._send(hello)
+                next_hello = now + 0.25
+            try:
+                data = self.sock.recv(NET_MAX_PACKET)
+            except (BlockingIOError, InterruptedError, ConnectionResetError):
+                time.sleep(0.005)
+                continue
+            if data and data[0] == MSG_WELCOME:
+                self.traffic_in.add(len(data))
+                version, index, num_players, world_seed, config = unpack_welcome(data)
+                if version != NET_PROTOCOL_VERSION:
+                    return False
+                self.world = RaceWorld(config, PlayerProfile(), random.Random(world_seed),
+                                       guests=[PlayerProfile() for _ in range(num_players - 1)])
+                self.car = self.world.players[index]
+                return True
+        return False
+
+    def send_input(self, bits):
+        """Send this frame's input bits, with the last few again in case of loss."""
+        self.input_seq += 1
+        self.history.append(bits)
+        self._send(pack_input(self.latest, timestamp_ms(), self.input_seq, self.history))
+
+    def poll(self):
+        """Read everything that arrived and show the newest snapshot. True if it changed."""
+        newest = None
+        while True:
+            try:
+                data = self.sock.recv(NET_MAX_PACKET)
+            except (BlockingIOError, InterruptedError, ConnectionResetError):
+                break
+            if not data:
+                continue
+            self.traffic_in.add(len(data))
+            if data[0] == MSG_BYE:
+                self.over = True
+            elif data[0] == MSG_SNAPSHOT and self.world is not None:
+                decoded = self._decode(data)
+                if decoded is not None:
+                    newest = decoded
+        if newest is None:
+            return False
+        self._apply(*newest)
+        return True
+
+    def close(self):
+        if self.sock.fileno() >= 0:
+            self._send(bytes((MSG_BYE,)))
+            self.sock.close()
+
+    def _decode(self, data):
+        seq = struct.unpack_from("<I", data, 1)[0]
+        if seq <= self.latest:
+            self.late += 1
+            return None
+        snapshot = unpack_snapshot(data, self.states)
+        if snapshot is None:
+            self.undecodable += 1
+            return None
+        header, cars = snapshot
+        if self.latest:
+            self.lost += seq - self.latest - 1
+        self.latest = seq
+        self.last_size = len(data)
+        self.states[seq] = cars
+        # The server only deltas against what we acked; older baselines are dead
+        baseline = header[1]
+        for old in [old for old in self.states if old < baseline]:
+            del self.states[old]
+        now = timestamp_ms()
+        rtt = ((now - header[9]) & 0xFFFFFFFF) - header[10]
+        self.rtt_ms = rtt if not self.rtt_ms else self.rtt_ms * 0.875 + rtt * 0.125
+        return header, cars
+
+    def _apply(self, header, cars):
+        (_, _, race_time, countdown, flags, rank, fuel, throttle, nitro_charges, _, _) = header
+        world = self.world
+        world.race_time = race_time
+        world.countdown_timer = countdown
+        world.racing = bool(flags & SNAP_RACING)
+        self.settled = bool(flags & SNAP_SETTLED)
+        self.rank = rank
+        all_cars = world.all_cars
+        for i, record in cars.items():
+            apply_car(all_cars[i], record)
+        self.visible = list(cars)
+
+        # Private to our car
+        car = self.car
+        car.fuel = fuel / 255 * car.stats.fuel_capacity
+        car.throttle = throttle
+        car.nitro_charges = nitro_charges
+        world.track.update(car.y, car.y)
+
+    def _send(self, data):
+        try:
+            self.sock.sendto(data, self.server)
+        except OSError:
+            return
+        self.traffic_out.add(len(data))
+
+def bot_bits(car, racing):
+    """Input bits for a scripted driver: launch throttle, then manage heat."""
+    target = 85 if not racing else (80 if car.heat < HEAT_WARNING - 10 else 60)
+    bits = 0
+    if car.throttle < target:
+        bits |= INPUT_UP
+    elif car.throttle > target:
+        bits |= INPUT_DOWN
+    return bits
@@ -0,0 +1,237 @@
+import heapq
+import random
+import time
+from bisect import bisect_left
+import numpy as np
+from src.settings import *
+from src.models.player_profile import PlayerProfile
+from src.models.race_config import RACE_BEGINNER
+from src.models.race_world import RaceWorld
+
+# Observation layout, float32 per race:
+#   own car: speed, heat, fuel, throttle, lateral speed, offset from the track
+#            centre, health, nitro charges, distance to the next checkpoint
+#            (or the finish), race progress
+#   ENV_NEAREST_CARS x (present, dx, dy, relative speed), nearest first
+#   ENV_NEAREST_OBSTACLES x (present, dx, dy) of the next obstacles ahead
+OBS_CAR = 10
+OBS_RIVAL = 4
+OBS_OBSTACLE = 3
+OBS_SIZE = OBS_CAR + ENV_NEAREST_CARS * OBS_RIVAL + ENV_NEAREST_OBSTACLES * OBS_OBSTACLE
+
+# Actions, one row per race: steer (-1..1), throttle change (-1..1, in units
+# of ENV_THROTTLE_STEP), nitro (fired when > 0.5)
+ACT_SIZE = 3
+
+# Reward: distance gained, less damage taken, plus a placing bonus on finishing
+REWARD_PER_PX = 0.01
+REWARD_PER_DAMAGE = 0.05
+REWARD_FINISH = 10.0
+
+_NO_RIVAL = (0.0, 0.0, 0.0, 0.0)
+_NO_OBSTACLE = (0.0, 0.0, 0.0)
+_NO_INFO = {}
+
+def _abs_dy(item):
+    return item[0]
+
+class BatchRaceEnv:
+    """N independent races stepped in lockstep, for training a driver.
+
+    The races are stepped one after another in this process: batching
+    saves the per-call overhead and gives one array per step, but the
+    physics still runs car by car, so it is no faster than N single-race
+    envs. For throughput train through env_pool.make_race_env, which
+    spreads the races over worker processes.
+
+    The learned driver has the player car in every race; rivals are the
+    usual AIDriver. step() takes one row of actions per race, runs
+    frame_skip ticks everywhere and writes observations, rewards and done
+    flags into preallocated arrays, or into the caller's arrays when given
+    buffers=(obs, rewards, dones). A race that ends is reset on the spot;
+    its final observation and result are in that race's info dict.
+
+    Episode k of race i is seeded from f"{seed}:{i}:{k}" (i counted from
+    first_index), so a run is reproducible however the races interleave.
+    """
+    def __init__(self, num_envs, config=RACE_BEGINNER, seed=None, frame_skip=1,
+                 max_ticks=ENV_MAX_TICKS, buffers=None, first_index=0):
+        self.num_envs = num_envs
+        self.config = config
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.frame_skip = frame_skip
+        self.max_ticks = max_ticks
+        self.first_index = first_index
+
+        if buffers is None:
+            buffers = (np.zeros((num_envs, OBS_SIZE), np.float32),
+                       np.zeros(num_envs, np.float32),
+                       np.zeros(num_envs, np.bool_))
+        self.obs, self.rewards, self.dones = buffers
+
+        self.worlds = [None] * num_envs
+        self.episodes = [0] * num_envs   # Episodes started per race
+        self.returns = [0.0] * num_envs
+        self.last_y = [0.0] * num_envs
+        self.last_health = [0.0] * num_envs
+
+        # Throughput
+        self.num_steps = 0       # Race steps taken (num_envs per step() call)
+        self.step_seconds = 0.0  # Time spent inside step()
+
+    def reset(self, seed=None):
+        """Start a new race everywhere. Returns the observation array."""
+        if seed is not None:
+            self.seed = seed
+            self.episodes = [0] * self.num_envs
+        for i in range(self.num_envs):
+            self._reset_race(i)
+        return self.obs
+
+    def step(self, actions):
+        """Apply actions (num_envs x ACT_SIZE) and run frame_skip ticks in every race.
+
+        Returns (obs, rewards, dones, infos). infos[i] is empty unless race i
+        ended this step.
+        """
+        start = time.perf_counter()
+        if hasattr(actions, "tolist"):
+            actions = actions.tolist() # Plain floats are much cheaper to work with per element
+        infos = [_NO_INFO] * self.num_envs
+        rewards = self.rewards
+        dones = self.dones
+        frame_skip = self.frame_skip
+
+        for i, world in enumerate(self.worlds):
+            steer, throttle, nitro = actions[i]
+            player = world.player
+            steer = max(-1.0, min(1.0, steer))
+            player.adjust_throttle(round(max(-1.0, min(1.0, throttle)) * ENV_THROTTLE_STEP))
+            if nitro > 0.5:
+                player.use_nitro()
+            for _ in range(frame_skip):
+                # Steering is held for the whole step, like a key
+                if steer:
+                    player.steer(steer)
+                world.tick()
+                if world.player_out:
+                    break
+            if world.events:
+                world.pop_events()
+
+            damage = self.last_health[i] - player.health
+            reward = (player.y - self.last_y[i]) * REWARD_PER_PX - max(0.0, damage) * REWARD_PER_DAMAGE
+            done = world.player_out or world.race_time >= self.max_ticks
+            if player.finished:
+                reward += REWARD_FINISH * (1.0 - (world.standings.rank(player) - 1) / world.total_cars)
+            self.returns[i] += reward
+            rewards[i] = reward
+            dones[i] = done
+
+            self._observe(i, world)
+            if done:
+                infos[i] = {
+                    "terminal_observation": self.obs[i].copy(),
+                    "episode_return": self.returns[i],
+                    "episode_ticks": world.race_time,
+                    "rank": world.standings.rank(player),
+                    "finished": player.finished,
+                }
+                self._reset_race(i)
+            else:
+                self.last_y[i] = player.y
+                self.last_health[i] = player.health
+
+        self.num_steps += self.num_envs
+        self.step_seconds += time.perf_counter() - start
+        return self.obs, rewards, dones, infos
+
+    def steps_per_second(self):
+        """Race steps per second of time spent in step(), over every race."""
+        return self.num_steps / self.step_seconds if self.step_seconds else 0.0
+
+    def _reset_race(self, i):
+        seed = f"{self.seed}:{self.first_index + i}:{self.episodes[i]}"
+        self.episodes[i] += 1
+        if self.worlds[i] is not None:
+            self.worlds[i].close()
+        world = RaceWorld(self.config, PlayerProfile(), random.Random(seed))
+        # Skip the countdown (no launch attempt: the car starts from rest)
+        while not world.racing:
+            world.tick(world.countdown_timer)
+        world.pop_events()
+        self.worlds[i] = world
+        self.returns[i] = 0.0
+        self.last_y[i] = world.player.y
+        self.last_health[i] = world.player.health
+        self._observe(i, world)
+
+    def _observe(self, i, world):
+        player = world.player
+        stats = player.stats
+        x = player.x
+        y = player.y
+
+        checkpoints = world.checkpoints
+        k = player.next_checkpoint_idx
+        target = checkpoints[k] if k < len(checkpoints) else world.race_length
+        progress = y / world.race_length if world.race_length != float('inf') else 0.0
+        row = [player.speed / stats.max_speed,
+               player.heat / stats.heat_capacity,
+               player.fuel / stats.fuel_capacity,
+               player.throttle / 100.0,
+               player.lateral_speed / 3.0,
+               (x - world.track_center) / (TRACK_WIDTH / 2),
+               player.health / stats.durability,
+               float(player.nitro_charges),
+               min(target - y, LEG_DISTANCE) / LEG_DISTANCE,
+               progress]
+
+        # Nearest rivals still on track (wrecks included: they are in the way)
+        near = heapq.nsmallest(ENV_NEAREST_CARS,
+                               [(abs(car.y - y), car) for car in world.all_cars if car is not player and not car.finished],
+                               key=_abs_dy)
+        for _, car in near:
+            row += ((1.0, (car.x - x) / TRACK_WIDTH, (car.y - y) / AI_LOOK_AHEAD,
+                     (car.speed - player.speed) / stats.max_speed))
+        for _ in range(ENV_NEAREST_CARS - len(near)):
+            row += _NO_RIVAL
+
+        # Next obstacles ahead (the live list is sorted by y)
+        obstacles = world.obstacles
+        j = bisect_left(world.track.obstacle_ys, y - player.height)
+        ahead = obstacles[j:j + ENV_NEAREST_OBSTACLES]
+        for obs in ahead:
+            row += (1.0, (obs.x + obs.width / 2 - x) / TRACK_WIDTH, (obs.y - y) / AI_LOOK_AHEAD)
+        for _ in range(ENV_NEAREST_OBSTACLES - len(ahead)):
+            row += _NO_OBSTACLE
+
+        self.obs[i] = row
+
+if __name__ == "__main__":
+    # python -m src.utils.race_env [races] [steps]
+    # Random actions through one batched env, then through one env per race.
+    # Both run the same physics in one process, so expect a ratio near 1.
+    import sys
+    num_envs = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    actions = np.random.default_rng(0).uniform(-1, 1, (steps, num_envs, ACT_SIZE)).astype(np.float32)
+
+    env = BatchRaceEnv(num_envs, seed=1)
+    env.reset()
+    episodes = 0
+    for t in range(steps):
+        _, _, dones, _ = env.step(actions[t])
+        episodes += int(dones.sum())
+    print(f"batched, {num_envs} races: {env.steps_per_second():.0f} steps/s ({episodes} episodes ended)")
+
+    singles = [BatchRaceEnv(1, seed=1, first_index=i) for i in range(num_envs)]
+    for single in singles:
+        single.reset()
+    for t in range(steps):
+        for i, single in enumerate(singles):
+            single.step(actions[t, i:i + 1])
+    seconds = sum(single.step_seconds for single in singles)
+    single_rate = num_envs * steps / seconds
+    print(f"{num_envs} single-race envs: {single_rate:.0f} steps/s")
+    print(f"batched / single: {env.steps_per_second() / single_rate:.2f}x")
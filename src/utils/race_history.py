@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.settings import *
+
+HISTORY_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS races (
+    id INTEGER PRIMARY KEY,
+    profile INTEGER NOT NULL,    -- Career slot
+    date REAL NOT NULL,          -- Unix time
+    race_type TEXT NOT NULL,
+    length INTEGER,              -- NULL = endless
+    seed INTEGER NOT NULL,
+    num_cars INTEGER NOT NULL,
+    race_time INTEGER NOT NULL,  -- Ticks simulated when the result was taken
+    winnings INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entrants (
+    race_id INTEGER NOT NULL REFERENCES races(id),
+    car INTEGER NOT NULL,        -- Index in the race (0 = player)
+    is_player INTEGER NOT NULL,
+    tier TEXT NOT NULL,
+    race_type TEXT NOT NULL,     -- Copied from races for the leaderboard index
+    position INTEGER NOT NULL,
+    finish_time INTEGER,         -- Ticks; NULL unless finished
+    distance REAL NOT NULL,
+    dnf_reason TEXT,             -- WRECKED / OVERHEAT / NO FUEL; NULL if finished or still running
+    PRIMARY KEY (race_id, car)
+);
+CREATE TABLE IF NOT EXISTS splits (
+    race_id INTEGER NOT NULL,
+    car INTEGER NOT NULL,
+    checkpoint INTEGER NOT NULL,
+    race_time INTEGER NOT NULL,
+    PRIMARY KEY (race_id, car, checkpoint)
+);
+CREATE INDEX IF NOT EXISTS idx_entrants_board ON entrants (tier, race_type, finish_time);
+CREATE INDEX IF NOT EXISTS idx_races_profile ON races (profile, date);
+"""
+
+# Statements are module constants so sqlite3's per-connection statement
+# cache keeps them prepared
+_INSERT_RACE = "INSERT INTO races (profile, date, race_type, length, seed, num_cars, race_time, winnings) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+_INSERT_ENTRANT = "INSERT INTO entrants VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_INSERT_SPLIT = "INSERT INTO splits VALUES (?, ?, ?, ?)"
+_PERSONAL_BEST = """
+SELECT MIN(e.finish_time) FROM entrants e JOIN races r ON r.id = e.race_id
+WHERE e.tier = ? AND e.race_type = ? AND e.is_player = 1 AND r.profile = ?
+"""
+_LEADERBOARD = """
+SELECT e.finish_time, r.profile, r.date FROM entrants e JOIN races r ON r.id = e.race_id
+WHERE e.tier = ? AND e.race_type = ? AND e.finish_time IS NOT NULL AND e.is_player = 1
+ORDER BY e.finish_time LIMIT ?
+"""
+_EARNINGS = "SELECT date, race_type, winnings FROM races WHERE profile = ? ORDER BY date DESC LIMIT ?"
+_TOTALS = "SELECT COUNT(*), COALESCE(SUM(winnings), 0) FROM races WHERE profile = ?"
+
+class RaceHistory:
+    """Race results in a local SQLite database.
+
+    Every database call runs on one worker thread that owns the connection,
+    so nothing here blocks a frame. record() snapshots the result on the
+    caller's thread and queues it. Queued results are written together in
+    one transaction. Queries return a Future: poll .done() once per frame,
+    then read .result().
+
+    A failed write is reported on stderr and kept in self.error, and its
+    races stay queued for the next write. close() raises if they still
+    can't be written.
+    """
+    def __init__(self, profile=0, path=HISTORY_DB):
+        self.profile = profile
+        self.path = path
+        self.conn = None # Worker thread only
+        self.lock = threading.Lock()
+        self.pending = []          # Snapshotted races waiting for the next write
+        self.flush_queued = False
+        self.error = None          # Last write failure, None once a write succeeds
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="race-history")
+
+    def record(self, world, winnings):
+        """Queue the current classification of a race for writing."""
+        config = world.config
+        race = (self.profile, time.time(), config.name or "CUSTOM", config.length, world.track.seed,
+                world.total_cars, world.race_time, winnings)
+        entrants = []
+        splits = []
+        race_type = race[2]
+        index = {car: i for i, car in enumerate(world.all_cars)}
+        for position, car in enumerate(world.classification(), 1):
+            i = index[car]
+            status = car.get_status_text()
+            dnf_reason = None if status in ("FINISHED", "RACING") else status
+            finish_time = car.finish_time if car.finished else None
+            entrants.append((i, int(car.is_player), car.stats.name, race_type, position, finish_time, car.y, dnf_reason))
+            for checkpoint, t in enumerate(car.splits):
+                splits.append((i, checkpoint, t))
+
+        with self.lock:
+            self.pending.append((race, entrants, splits))
+            if self.flush_queued:
+                return
+            self.flush_queued = True
+        self.executor.submit(self._write_pending).add_done_callback(self._write_done)
+
+    def personal_best(self, tier, race_type):
+        """Future: this profile's best finish time (ticks) or None."""
+        return self._query(_PERSONAL_BEST, (tier, race_type, self.profile), one=True)
+
+    def leaderboard(self, tier, race_type, limit=10):
+        """Future: [(finish_time, profile, date)] of the fastest player runs."""
+        return self._query(_LEADERBOARD, (tier, race_type, limit))
+
+    def earnings(self, limit=20):
+        """Future: [(date, race_type, winnings)] for this profile, newest first."""
+        return self._query(_EARNINGS, (self.profile, limit))
+
+    def totals(self):
+        """Future: (races entered, total winnings) for this profile."""
+        return self._query(_TOTALS, (self.profile,), one=True, whole_row=True)
+
+    def close(self):
+        """Write everything still queued and stop the worker.
+
+        Raises the write error if queued races could not be written.
+        """
+        self.executor.submit(self._write_pending).add_done_callback(self._write_done)
+        self.executor.submit(self._close_connection)
+        self.executor.shutdown(wait=True)
+        if self.error is not None:
+            raise self.error
+
+    def _query(self, sql, params, one=False, whole_row=False):
+        def run():
+            row_source = self._connection().execute(sql, params)
+            if not one:
+                return row_source.fetchall()
+            row = row_source.fetchone()
+            if whole_row:
+                return row
+            return row[0] if row else None
+        return self.executor.submit(run)
+
+    def _connection(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > HISTORY_SCHEMA_VERSION:
+                conn.close()
+                raise RuntimeError(f"{self.path}: history schema {version} is newer than this build")
+            with conn:
+                conn.executescript(_SCHEMA)
+                conn.execute(f"PRAGMA user_version = {HISTORY_SCHEMA_VERSION}")
+            self.conn = conn
+        return self.conn
+
+    def _write_pending(self):
+        with self.lock:
+            batch = self.pending
+            self.pending = []
+            self.flush_queued = False
+        if not batch:
+            return
+        try:
+            conn = self._connection()
+            with conn: # One transaction for the whole batch
+                for race, entrants, splits in batch:
+                    race_id = conn.execute(_INSERT_RACE, race).lastrowid
+                    conn.executemany(_INSERT_ENTRANT, [(race_id,) + row for row in entrants])
+                    conn.executemany(_INSERT_SPLIT, [(race_id,) + row for row in splits])
+        except BaseException:
+            # The transaction rolled back: keep the races for the next write
+            with self.lock:
+                self.pending[:0] = batch
+            raise
+        self.error = None
+
+    def _write_done(self, future):
+        error = future.exception()
+        if error is not None:
+            self.error = error
+            print(f"Race history: write failed, results kept queued: {error!r}", file=sys.stderr)
+
+    def _close_connection(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,276 @@
+import heapq
+import random
+import socket
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from src.settings import *
+from src.models.player_profile import PlayerProfile
+from src.models.race_config import RaceConfig, RACE_BEGINNER
+from src.models.race_world import RaceWorld
+from src.utils.replay import apply_input, INPUT_NITRO
+from src.utils.net_protocol import *
+
+class _Peer:
+    """A joined client and its car."""
+    def __init__(self, address):
+        self.address = address
+        self.car = None
+        self.index = 0          # Car index in world.all_cars
+        self.inputs = deque()   # Input bits not applied yet, oldest first
+        self.last_input = 0     # Newest input number received
+        self.last_bits = 0      # Bits applied last tick (repeated when nothing arrives)
+        self.acked = 0          # Newest snapshot the client has decoded
+        self.sent = {}          # Snapshot number -> cars sent in it (delta baselines)
+        self.stamp = 0          # Newest client timestamp, echoed for RTT
+        self.stamp_at = 0.0
+        self.left = False
+        self.traffic_out = TrafficMeter()
+        self.traffic_in = TrafficMeter()
+        self.starved_ticks = 0  # Ticks run on a repeated input
+
+class RaceServer:
+    """Authoritative host for a network race over UDP.
+
+    The server owns the only RaceWorld that is simulated. Every client
+    drives one of its human cars: the first to join gets world.player, the
+    rest are guests. Each tick the server applies one queued input per
+    client (repeating the last steer/throttle when none has arrived),
+    ticks the world and sends every client a snapshot.
+
+    A snapshot only holds the cars within NET_VIEW_RADIUS of that client's
+    car (at most NET_MAX_CARS, nearest first), quantised, and only those
+    that changed since the last snapshot the client acknowledged. Traffic
+    per client therefore depends on the cars around it, not on the size of
+    the grid. Network races use stock cars for everyone.
+    """
+    def __init__(self, config=RACE_BEGINNER, num_players=2, address=("127.0.0.1", NET_PORT), seed=None):
+        self.config = config
+        self.num_players = num_players
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(address)
+        self.address = self.sock.getsockname()
+        self.peers = {}     # address -> _Peer, in join order
+        self.world = None
+        self.seq = 0        # Snapshots sent so far (numbered from 1)
+        self.closed = False
+        self.tick_seconds = 0.0 # Time spent simulating and sending, for the host stats
+
+    def wait_for_players(self, timeout=NET_JOIN_TIMEOUT):
+        """Take joins until the race is full or timeout runs out, then start it.
+
+        Returns the number of players in the race (0 = nobody came).
+        """
+        deadline = time.perf_counter() + timeout
+        while len(self.peers) < self.num_players:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self.sock.settimeout(remaining)
+            try:
+                data, address = self.sock.recvfrom(NET_MAX_PACKET)
+            except socket.timeout:
+                break
+            if data and data[0] == MSG_HELLO and address not in self.peers:
+                if unpack_hello(data) == NET_PROTOCOL_VERSION:
+                    self.peers[address] = _Peer(address)
+        self.sock.setblocking(False)
+        if self.peers:
+            self.start()
+        return len(self.peers)
+
+    def start(self):
+        peers = list(self.peers.values())
+        world = RaceWorld(self.config, PlayerProfile(), random.Random(self.seed),
+                          guests=[PlayerProfile() for _ in peers[1:]])
+        index = {id(car): i for i, car in enumerate(world.all_cars)}
+        for peer, car in zip(peers, world.players):
+            peer.car = car
+            peer.index = index[id(car)]
+        self.world = world
+        for peer in peers:
+            self._welcome(peer)
+
+    def run(self, max_ticks=None):
+        """Tick at FPS until the race is over, everyone left or max_ticks ran."""
+        period = 1.0 / FPS
+        next_time = time.perf_counter()
+        ticks = 0
+        while not self.closed and (max_ticks is None or ticks < max_ticks):
+            self.step()
+            ticks += 1
+            if self.world.is_settled() or all(peer.left for peer in self.peers.values()):
+                break
+            next_time += period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -4 * period:
+                next_time = time.perf_counter() # Fell behind: drop the backlog rather than burst
+        self.close()
+
+    def step(self):
+        """One server tick: read inputs, apply them, simulate, send snapshots."""
+        start = time.perf_counter()
+        self._receive()
+        world = self.world
+        for peer in self.peers.values():
+            if peer.inputs:
+                bits = peer.inputs.popleft()
+            else:
+                bits = peer.last_bits & ~INPUT_NITRO
+                peer.starved_ticks += 1
+            peer.last_bits = bits
+            apply_input(peer.car, bits)
+        world.tick()
+        world.pop_events()
+        self._send_snapshots()
+        self.tick_seconds += time.perf_counter() - start
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        bye = bytes((MSG_BYE,))
+        for peer in self.peers.values():
+            if not peer.left:
+                self._send(peer, bye)
+        self.sock.close()
+        if self.world is not None:
+            self.world.close()
+
+    def _welcome(self, peer):
+        world = self.world
+        # The track seed is drawn from the world's generator when the config has none
+        config = RaceConfig(self.config.length, self.config.num_ai, self.config.prize_money,
+                            list(self.config.checkpoints), num_obstacles=self.config.num_obstacles,
+                            field_mode=self.config.field_mode, seed=self.config.seed)
+        self._send(peer, pack_welcome(world.players.index(peer.car), len(world.players), self.seed, config))
+
+    def _receive(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(NET_MAX_PACKET)
+            except (BlockingIOError, InterruptedError):
+                return
+            except ConnectionResetError:
+                continue # ICMP port unreachable from a client that went away
+            peer = self.peers.get(address)
+            if peer is None or not data:
+                continue
+            peer.traffic_in.add(len(data))
+            kind = data[0]
+            if kind == MSG_INPUT:
+                self._on_input(peer, data)
+            elif kind == MSG_HELLO:
+                self._welcome(peer) # Our WELCOME was lost
+            elif kind == MSG_BYE:
+                peer.left = True
+
+    def _on_input(self, peer, data):
+        ack, stamp, newest, history = unpack_input(data)
+        if ack > peer.acked:
+            peer.acked = ack
+            for seq in [seq for seq in peer.sent if seq < ack]:
+                del peer.sent[seq]
+        peer.stamp = stamp
+        peer.stamp_at = time.perf_counter()
+        # Redundant copies: queue only the inputs not seen yet
+        first = newest - len(history) + 1
+        for n in range(max(first, peer.last_input + 1), newest + 1):
+            peer.inputs.append(history[n - first])
+        if newest > peer.last_input:
+            peer.last_input = newest
+        while len(peer.inputs) > NET_INPUT_BUFFER:
+            peer.inputs.popleft()
+
+    def _send_snapshots(self):
+        world = self.world
+        self.seq += 1
+        seq = self.seq
+        cars = world.all_cars
+        order = sorted(range(len(cars)), key=lambda i: cars[i].y)
+        ys = [cars[i].y for i in order]
+
+        flags = 0
+        if world.racing: flags |= SNAP_RACING
+        if world.is_settled(): flags |= SNAP_SETTLED
+
+        for peer in self.peers.values():
+            if peer.left:
+                continue
+            car = peer.car
+            # Interest: the cars nearest to this client's car
+            lo = bisect_left(ys, car.y - NET_VIEW_RADIUS)
+            hi = bisect_right(ys, car.y + NET_VIEW_RADIUS)
+            near = order[lo:hi]
+            if len(near) > NET_MAX_CARS:
+                near = heapq.nsmallest(NET_MAX_CARS, near, key=lambda i: abs(cars[i].y - car.y))
+            view = {i: quantise_car(cars[i]) for i in near}
+            view[peer.index] = quantise_car(car)
+
+            baseline = peer.sent.get(peer.acked)
+            hold = min(0xFFFF, int((time.perf_counter() - peer.stamp_at) * 1000))
+            header = (seq, peer.acked if baseline is not None else 0, world.race_time,
+                      max(0, world.countdown_timer), flags, world.standings.rank(car),
+                      min(255, max(0, round(car.fuel / car.stats.fuel_capacity * 255))),
+                      car.throttle, car.nitro_charges, peer.stamp, hold)
+            self._send(peer, pack_snapshot(header, view, baseline))
+
+            peer.sent[seq] = view
+            if len(peer.sent) > NET_SNAPSHOT_HISTORY:
+                del peer.sent[min(peer.sent)]
+
+    def _send(self, peer, data):
+        try:
+            self.sock.sendto(data, peer.address)
+        except OSError:
+            return
+        peer.traffic_out.add(len(data))
+
+if __name__ == "__main__":
+    # python -m src.utils.race_server [clients] [seconds] [rivals]
+    # Loopback test: a server and scripted clients in one process, then
+    # traffic and latency per client.
+    import sys
+    import threading
+    from src.utils.race_client import RaceClient, bot_bits
+    num_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    num_ai = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    config = RaceConfig(RACE_BEGINNER.length, num_ai, RACE_BEGINNER.prize_money,
+                        field_mode=num_ai > 100)
+    server = RaceServer(config, num_clients, ("127.0.0.1", 0), seed=1)
+    clients = [RaceClient(server.address) for _ in range(num_clients)]
+    joined = [threading.Thread(target=client.join) for client in clients]
+    for thread in joined:
+        thread.start()
+    server.wait_for_players()
+    for thread in joined:
+        thread.join()
+    thread = threading.Thread(target=server.run, args=(int(seconds * FPS),))
+    thread.start()
+
+    period = 1.0 / FPS
+    next_time = time.perf_counter()
+    while thread.is_alive():
+        for client in clients:
+            client.poll()
+            client.send_input(bot_bits(client.car, client.world.racing))
+        next_time += period
+        time.sleep(max(0.0, next_time - time.perf_counter()))
+    for client in clients:
+        client.poll()
+
+    print(f"{len(server.peers)} clients, {server.world.total_cars} cars, {server.seq} ticks, "
+          f"server {server.tick_seconds / max(1, server.seq) * 1000:.3f}ms/tick")
+    for peer, client in zip(server.peers.values(), clients):
+        out = peer.traffic_out
+        print(f"  car {peer.index}: {out.total_bytes / max(1, out.total_packets):.0f} B/snapshot, "
+              f"{out.total_bytes / seconds / 1024:.1f} KB/s down, "
+              f"{peer.traffic_in.total_bytes / seconds / 1024:.1f} KB/s up, "
+              f"rtt {client.rtt_ms:.2f}ms, {client.lost} lost, {peer.starved_ticks} starved ticks, "
+              f"{len(client.visible)} cars in view")
+        client.close()
@@ -0,0 +1,122 @@
+import struct
+from operator import attrgetter
+from src.settings import *
+from src.utils.standings import Standings
+
+# Everything that changes while a race runs, packed into one flat buffer.
+# Constants (stats, sizes, race length) are left out, and obstacles are
+# stored as the streamed chunk window: their contents depend only on the
+# track seed (or file) and the chunk index.
+
+# race_time, countdown, focus_y, racing, player_out, number of cars
+_WORLD = struct.Struct("<iid??I")
+# First and end streamed chunk, number of checkpoints (endless tracks grow them)
+_TRACK = struct.Struct("<iiI")
+# Mersenne Twister: version, 625 words of state, gauss_next, has gauss_next
+_RNG = struct.Struct("<i625Id?")
+
+CAR_FLOATS = ("x", "y", "prev_x", "prev_y", "speed", "lateral_speed", "fuel", "heat", "health",
+              "comp_front", "comp_rear", "comp_fl", "comp_fr", "comp_rl", "comp_rr")
+CAR_INTS = ("throttle", "nitro_charges", "nitro_active", "finish_time", "next_checkpoint_idx")
+CAR_FLAGS = ("finished", "dead", "is_drafting", "is_side_drafting")
+_CAR = struct.Struct(f"<{len(CAR_FLOATS)}d{len(CAR_INTS)}i{len(CAR_FLAGS)}?3B")
+CAR_FIELDS = CAR_FLOATS + CAR_INTS + CAR_FLAGS
+_car_values = attrgetter(*CAR_FIELDS) # One call per car instead of a getattr per field
+
+# target_speed_offset, lane_preference, reaction_timer, target_x (NaN = None),
+# is_urgent, cooling_mode, full_fidelity
+_AI = struct.Struct("<dbid???")
+
+def pack_state(world):
+    """World state as bytes. Pairs with unpack_state on the same RaceWorld (or one built from the same config)."""
+    cars = world.all_cars
+    parts = [_WORLD.pack(world.race_time, world.countdown_timer, world.focus_y,
+                         world.racing, world.player_out, len(cars))]
+
+    track = world.track
+    parts.append(_TRACK.pack(track.first_chunk, track.end_chunk, len(track.checkpoints)))
+    parts.append(struct.pack(f"<{len(track.checkpoints)}i", *track.checkpoints))
+
+    version, words, gauss = world.rng.getstate()
+    parts.append(_RNG.pack(version, *words, gauss or 0.0, gauss is not None))
+
+    for car in cars:
+        parts.append(_CAR.pack(*_car_values(car), *car.color))
+        # One split per checkpoint passed
+        parts.append(struct.pack(f"<{len(car.splits)}i", *car.splits))
+
+    for ai in world.ai_cars:
+        target_x = ai.target_x if ai.target_x is not None else float('nan')
+        parts.append(_AI.pack(ai.target_speed_offset, ai.lane_preference, ai.reaction_timer, target_x,
+                              ai.is_urgent, ai.cooling_mode, ai.full_fidelity))
+
+    if world.field:
+        # Running order breaks ties between equal y, so it is part of the state
+        index = {id(ai): i for i, ai in enumerate(world.ai_cars)}
+        parts.append(struct.pack(f"<{len(world.ai_cars)}I", *[index[id(ai)] for ai in world.field.order]))
+
+    return b"".join(parts)
+
+def repack_player(world, data):
+    """data, a pack_state of world from before the start, with the player's car packed again.
+
+    For a world whose player car was refitted (RaceWorld.refit_player):
+    everything else in the state is unchanged, so only that record is
+    replaced. The player is the first car and has no splits yet.
+    """
+    num_cps = _TRACK.unpack_from(data, _WORLD.size)[2]
+    offset = _WORLD.size + _TRACK.size + 4 * num_cps + _RNG.size
+    car = world.player
+    return data[:offset] + _CAR.pack(*_car_values(car), *car.color) + data[offset + _CAR.size:]
+
+def unpack_state(world, data):
+    """Put world back in the state pack_state captured."""
+    race_time, countdown, focus_y, racing, player_out, num_cars = _WORLD.unpack_from(data)
+    cars = world.all_cars
+    if num_cars != len(cars):
+        raise ValueError(f"state has {num_cars} cars, race has {len(cars)}")
+    world.race_time = race_time
+    world.countdown_timer = countdown
+    world.focus_y = focus_y
+    world.racing = racing
+    world.player_out = player_out
+    offset = _WORLD.size
+
+    first_chunk, end_chunk, num_cps = _TRACK.unpack_from(data, offset)
+    offset += _TRACK.size
+    world.track.checkpoints[:] = struct.unpack_from(f"<{num_cps}i", data, offset) # In place: shared with AI and the tracker
+    offset += 4 * num_cps
+
+    fields = _RNG.unpack_from(data, offset)
+    world.rng.setstate((fields[0], fields[1:626], fields[626] if fields[627] else None))
+    offset += _RNG.size
+
+    for car in cars:
+        values = _CAR.unpack_from(data, offset)
+        offset += _CAR.size
+        # Plain attributes, so one dict update restores them all
+        car.__dict__.update(zip(CAR_FIELDS, values))
+        car.color = values[-3:]
+        num_splits = car.next_checkpoint_idx
+        car.splits = list(struct.unpack_from(f"<{num_splits}i", data, offset))
+        offset += 4 * num_splits
+
+    for ai in world.ai_cars:
+        (ai.target_speed_offset, ai.lane_preference, ai.reaction_timer, target_x,
+         ai.is_urgent, ai.cooling_mode, ai.full_fidelity) = _AI.unpack_from(data, offset)
+        ai.target_x = None if target_x != target_x else target_x
+        offset += _AI.size
+
+    if world.field:
+        ai_cars = world.ai_cars
+        order = struct.unpack_from(f"<{len(ai_cars)}I", data, offset)
+        world.field.order = [ai_cars[i] for i in order]
+        world.field.near = [ai for ai in world.field.order if ai.full_fidelity]
+
+    # Derived state
+    world.standings = Standings(cars)
+    world.fast_forward = None
+    world.events = []
+    world.track.load_chunks(first_chunk, end_chunk)
+    if world.effects is not None:
+        world.effects.clear()
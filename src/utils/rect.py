@@ -0,0 +1,20 @@
+class Rect:
+    """Integer axis-aligned box for the simulation.
+
+    Stands in for pygame.Rect so the race can run without pygame: same
+    (x, y, width, height) layout, same truncation of floats and the same
+    colliderect() rule (touching edges don't collide, empty boxes never do).
+    """
+    def __init__(self, x, y, width, height):
+        self.x = int(x)
+        self.y = int(y)
+        self.width = int(width)
+        self.height = int(height)
+
+    def colliderect(self, other):
+        return (self.x < other.x + other.width and other.x < self.x + self.width and
+                self.y < other.y + other.height and other.y < self.y + self.height and
+                self.width > 0 and self.height > 0 and other.width > 0 and other.height > 0)
+
+    def __repr__(self):
+        return f"<Rect({self.x}, {self.y}, {self.width}, {self.height})>"
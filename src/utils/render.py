@@ -0,0 +1,54 @@
+import pygame
+from src.settings import *
+
+# Drawing for the simulation objects. The models themselves never import
+# pygame, so headless workers can run races without it.
+
+# Plain sprites by (width, height, RGBA colour)
+_sprites = {}
+
+def get_sprite(width, height, color):
+    sprite = _sprites.get((width, height, color))
+    if sprite is None:
+        sprite = _sprites[(width, height, color)] = pygame.Surface((width, height), pygame.SRCALPHA)
+        sprite.fill(color)
+    return sprite
+
+def draw_car(surface, car, camera_y):
+    screen_y = SCREEN_HEIGHT - (car.y - camera_y) - car.height // 2
+    screen_x = car.x - car.width // 2
+
+    if -car.height < screen_y < SCREEN_HEIGHT + car.height:
+        color = car.color
+        if car.is_player and car.heat > HEAT_WARNING:
+            heat_factor = (car.heat - HEAT_WARNING) / (car.stats.heat_capacity - HEAT_WARNING)
+            color = (
+                int(car.color[0] + (COLOR_PLAYER_HOT[0] - car.color[0]) * heat_factor),
+                int(car.color[1] + (COLOR_PLAYER_HOT[1] - car.color[1]) * heat_factor),
+                int(car.color[2] + (COLOR_PLAYER_HOT[2] - car.color[2]) * heat_factor),
+            )
+
+        pygame.draw.rect(surface, color, (screen_x, screen_y, car.width, car.height))
+
+        if car.nitro_active > 0:
+            pygame.draw.rect(surface, (255, 200, 0), (screen_x - 2, screen_y + car.height - 5, car.width + 4, 5))
+
+        if car.is_drafting:
+            pygame.draw.circle(surface, (100, 255, 255), (screen_x + car.width//2, screen_y - 5), 3)
+
+def draw_obstacle(surface, obs, camera_y):
+    screen_y = SCREEN_HEIGHT - (obs.y - camera_y)
+    if -50 < screen_y < SCREEN_HEIGHT + 50:
+        pygame.draw.rect(surface, obs.color, (obs.x, screen_y, obs.width, obs.height))
+        pygame.draw.rect(surface, (0,0,0), (obs.x, screen_y, obs.width, obs.height), 1)
+
+def draw_particles(surface, system, camera_y):
+    for p in system.particles:
+        if p.life > 0:
+            s = max(1, int(p.size * (p.life / p.max_life)))
+            # Fix coordinate system: y increases upwards in world
+            screen_y = SCREEN_HEIGHT - (p.y - camera_y)
+
+            # Only draw if on screen
+            if -50 < screen_y < SCREEN_HEIGHT + 50:
+                pygame.draw.circle(surface, p.color, (int(p.x), int(screen_y)), s)
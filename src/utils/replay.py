@@ -0,0 +1,255 @@
+import os
+import struct
+import time
+import zlib
+from bisect import bisect_right
+from src.settings import *
+from src.models.player_profile import CarStats, PlayerProfile
+from src.models.race_config import RaceConfig
+from src.models.race_world import RaceWorld
+from src.utils.varint import write_varint, read_varint, zigzag, unzigzag
+
+REPLAY_MAGIC = b"DRGR"
+REPLAY_FORMAT_VERSION = 5 # 5: mass-field resolves run headless
+
+# Player inputs for one frame, as bits (applied in this order)
+INPUT_NITRO = 1
+INPUT_LEFT = 2
+INPUT_RIGHT = 4
+INPUT_UP = 8
+INPUT_DOWN = 16
+
+# Step sizes in the log: n > 0 is world.advance(n), 0 is no simulation
+STEP_RESOLVE = -1
+
+_HEADER = struct.Struct("<4sHH")     # magic, version, keyframes
+# length (-1 = endless), rivals, prize money, obstacles, seed, checkpoints, field mode
+_CONFIG = struct.Struct("<iIIIIH?")
+_STATS = struct.Struct("<6d")        # max speed, accel, fuel cap, heat cap, cooling, durability
+_KEYFRAME = struct.Struct("<iII")    # race time, log position, state size
+
+def apply_input(player, bits):
+    if bits & INPUT_NITRO:
+        player.use_nitro()
+    if bits & INPUT_LEFT:
+        player.steer(-1)
+    if bits & INPUT_RIGHT:
+        player.steer(1)
+    if bits & INPUT_UP:
+        player.adjust_throttle(1)
+    if bits & INPUT_DOWN:
+        player.adjust_throttle(-1)
+
+class Replay:
+    """A recorded race: config, player stats, input log and keyframes.
+
+    The log is one (input bits, step) entry per simulation call. On disk it
+    is run-length encoded with each run stored as a delta from the one
+    before. Keyframes are RaceWorld.snapshot() buffers taken every
+    REPLAY_KEYFRAME_TICKS.
+    """
+    def __init__(self, config, player_stats, entries, keyframes):
+        self.config = config
+        self.player_stats = player_stats
+        self.entries = entries     # [(bits, step)]
+        self.keyframes = keyframes # [(race_time, log position, state)], by race time
+
+    def save(self, path):
+        config = self.config
+        stats = self.player_stats
+        body = [_CONFIG.pack(config.length if config.length is not None else -1, config.num_ai,
+                             config.prize_money, config.num_obstacles, config.seed,
+                             len(config.checkpoints), config.field_mode)]
+        body.append(struct.pack(f"<{len(config.checkpoints)}I", *config.checkpoints))
+        for text in (config.name or "", config.track_file or "", stats.name):
+            body.append(_pack_str(text))
+        body.append(_STATS.pack(stats.max_speed, stats.acceleration, stats.fuel_capacity,
+                                stats.heat_capacity, stats.cooling_factor, stats.durability))
+        for race_time, position, state in self.keyframes:
+            body.append(_KEYFRAME.pack(race_time, position, len(state)))
+        for _, _, state in self.keyframes:
+            body.append(state)
+        body.append(_encode_log(self.entries))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(REPLAY_MAGIC, REPLAY_FORMAT_VERSION, len(self.keyframes)))
+            f.write(zlib.compress(b"".join(body), 6))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < _HEADER.size:
+            raise ValueError(f"{path}: not a replay")
+        magic, version, num_keyframes = _HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_FORMAT_VERSION:
+            raise ValueError(f"{path}: not a version {REPLAY_FORMAT_VERSION} replay")
+        body = zlib.decompress(data[_HEADER.size:])
+
+        length, num_ai, prize, num_obstacles, seed, num_cps, field_mode = _CONFIG.unpack_from(body)
+        offset = _CONFIG.size
+        checkpoints = list(struct.unpack_from(f"<{num_cps}I", body, offset))
+        offset += 4 * num_cps
+        name, offset = _unpack_str(body, offset)
+        track_file, offset = _unpack_str(body, offset)
+        stats_name, offset = _unpack_str(body, offset)
+        stats = CarStats(stats_name, *_STATS.unpack_from(body, offset))
+        offset += _STATS.size
+
+        config = RaceConfig(length if length >= 0 else None, num_ai, prize, checkpoints,
+                            num_obstacles=num_obstacles, field_mode=field_mode, seed=seed, name=name or None)
+        config.track_file = track_file or None
+
+        index = []
+        for _ in range(num_keyframes):
+            index.append(_KEYFRAME.unpack_from(body, offset))
+            offset += _KEYFRAME.size
+        keyframes = []
+        for race_time, position, size in index:
+            keyframes.append((race_time, position, body[offset:offset + size]))
+            offset += size
+        return cls(config, stats, _decode_log(body, offset), keyframes)
+
+class ReplayRecorder:
+    """Logs what run_race does to the world, in the order it does it."""
+    def __init__(self, world, state=None):
+        """state: world.snapshot() of the world as it is now, if already taken."""
+        self.world = world
+        config = world.config
+        # Pin the layout the race actually got
+        self.config = RaceConfig(config.length, config.num_ai, config.prize_money, list(config.checkpoints),
+                                 num_obstacles=config.num_obstacles, field_mode=config.field_mode,
+                                 seed=world.track.seed, name=config.name)
+        self.config.track_file = config.track_file
+        self.entries = []
+        self.keyframes = [(world.race_time, 0, state if state is not None else world.snapshot())]
+        self.next_keyframe = world.race_time + REPLAY_KEYFRAME_TICKS
+
+    def log(self, bits, step):
+        """Record that bits were applied to the player and then the world took step."""
+        self.entries.append((bits, step))
+        world = self.world
+        if world.race_time >= self.next_keyframe:
+            self.keyframes.append((world.race_time, len(self.entries), world.snapshot()))
+            self.next_keyframe = world.race_time + REPLAY_KEYFRAME_TICKS
+
+    def replay(self):
+        return Replay(self.config, self.world.player.stats, list(self.entries), list(self.keyframes))
+
+class ReplayPlayer:
+    """Re-runs a Replay on a fresh RaceWorld, with seeking.
+
+    Keyframes reached during playback are compared with the live state, so a
+    replay that no longer reproduces (code changed, nondeterminism) is
+    caught at the first keyframe after it diverges.
+    """
+    def __init__(self, replay):
+        self.replay = replay
+        self.world = RaceWorld(replay.config, PlayerProfile())
+        self.world.player.stats = replay.player_stats
+        self.keyframe_times = [k[0] for k in replay.keyframes]
+        self.checks = {position: state for _, position, state in replay.keyframes}
+        self.position = 0
+        self.desync_at = None # Race time of the first keyframe that didn't match
+        self.seek(0)
+
+    def done(self):
+        return self.position >= len(self.replay.entries)
+
+    def seek(self, race_time):
+        """Restore the nearest keyframe at or before race_time and play forward to it."""
+        i = max(0, bisect_right(self.keyframe_times, race_time) - 1)
+        _, position, state = self.replay.keyframes[i]
+        self.world.restore(state)
+        self.position = position
+        while not self.done() and self.world.race_time < race_time:
+            self.step()
+
+    def step(self):
+        """Play the next log entry."""
+        bits, step = self.replay.entries[self.position]
+        self.position += 1
+        world = self.world
+        apply_input(world.player, bits)
+        if step == STEP_RESOLVE:
+            world.resolve()
+        elif step > 0:
+            world.advance(step)
+
+        state = self.checks.get(self.position)
+        if state is not None and self.desync_at is None and world.snapshot() != state:
+            self.desync_at = world.race_time
+
+def _pack_str(text):
+    data = text.encode("utf-8")
+    return struct.pack("<H", len(data)) + data
+
+def _unpack_str(data, offset):
+    size = struct.unpack_from("<H", data, offset)[0]
+    offset += 2
+    return data[offset:offset + size].decode("utf-8"), offset + size
+
+def _encode_log(entries):
+    # Runs of identical entries: run length, bits XOR previous bits, zigzag step delta
+    out = bytearray()
+    write_varint(out, len(entries))
+    prev_bits = 0
+    prev_step = 0
+    i = 0
+    while i < len(entries):
+        entry = entries[i]
+        j = i + 1
+        while j < len(entries) and entries[j] == entry:
+            j += 1
+        bits, step = entry
+        delta = step - prev_step
+        write_varint(out, j - i)
+        out.append(bits ^ prev_bits)
+        write_varint(out, zigzag(delta))
+        prev_bits = bits
+        prev_step = step
+        i = j
+    return bytes(out)
+
+def _decode_log(data, offset):
+    count, offset = read_varint(data, offset)
+    entries = []
+    bits = 0
+    step = 0
+    while len(entries) < count:
+        run, offset = read_varint(data, offset)
+        bits ^= data[offset]
+        offset += 1
+        delta, offset = read_varint(data, offset)
+        step += unzigzag(delta)
+        entries.extend([(bits, step)] * run)
+    return entries
+
+if __name__ == "__main__":
+    # python -m src.utils.replay data/replays/last.rpl [seek tick]
+    # Plays the replay headless, checks it still reproduces and lists the slowest steps.
+    import sys
+    replay = Replay.load(sys.argv[1])
+    start = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    player = ReplayPlayer(replay)
+    t = time.perf_counter()
+    player.seek(start)
+    print(f"Seek to {start}: {(time.perf_counter() - t) * 1000:.1f}ms (race time {player.world.race_time})")
+
+    timings = []
+    while not player.done():
+        race_time = player.world.race_time
+        t = time.perf_counter()
+        player.step()
+        timings.append((time.perf_counter() - t, race_time))
+    timings.sort(reverse=True)
+    print(f"{len(replay.entries)} log entries, {len(replay.keyframes)} keyframes, ended at race time {player.world.race_time}")
+    for seconds, race_time in timings[:10]:
+        print(f"  tick {race_time}: {seconds * 1000:.2f}ms")
+    if player.desync_at is not None:
+        print(f"DESYNC at race time {player.desync_at}")
+    else:
+        print("Reproduced exactly")
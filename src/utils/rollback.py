@@ -0,0 +1,315 @@
+import heapq
+import random
+import socket
+import struct
+import time
+import zlib
+from src.settings import *
+from src.utils.replay import apply_input, INPUT_NITRO
+
+# Input packet: acked frame (we have all of the peer's inputs before it),
+# checksum frame (0 = none) and CRC, first frame carried, inputs that follow
+_PACKET = struct.Struct("<IIIIB")
+
+class UdpLink:
+    """Datagram link to one peer."""
+    def __init__(self, address=("127.0.0.1", 0), peer_address=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(address)
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+        self.peer = peer_address
+
+    def send(self, data):
+        try:
+            self.sock.sendto(data, self.peer)
+        except OSError:
+            pass
+
+    def receive(self):
+        packets = []
+        while True:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return packets
+            except ConnectionResetError:
+                continue
+            if address == self.peer:
+                packets.append(data)
+
+    def close(self):
+        self.sock.close()
+
+class LagLink:
+    """Wraps a link and holds back what it sends: latency +- jitter, and loss.
+
+    Jitter can reorder packets, as on a real network. For testing only.
+    """
+    def __init__(self, link, latency_ms, jitter_ms=0.0, loss=0.0, seed=None):
+        self.link = link
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.queue = [] # (due, n, data)
+        self.sent = 0
+
+    def send(self, data):
+        self.flush()
+        if self.rng.random() < self.loss:
+            return
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        self.sent += 1
+        heapq.heappush(self.queue, (time.perf_counter() + delay, self.sent, data))
+
+    def receive(self):
+        self.flush()
+        return self.link.receive()
+
+    def flush(self):
+        now = time.perf_counter()
+        while self.queue and self.queue[0][0] <= now:
+            self.link.send(heapq.heappop(self.queue)[2])
+
+    def close(self):
+        self.link.close()
+
+class RollbackSession:
+    """Peer-to-peer race between the two human cars of a RaceWorld.
+
+    Both peers run the same world (same config and seed, one guest). Each
+    frame the local input is sent to the peer and the world is ticked at
+    once, with the peer's input predicted as its last known steer and
+    throttle (nitro is never predicted). A state is saved before every
+    tick. When a peer input arrives that differs from what was predicted,
+    the world is restored to the frame it belongs to and the frames since
+    are re-simulated. The session never runs more than max_frames ahead of
+    the peer's inputs (it stalls instead), which bounds how much one
+    rollback can cost.
+
+    Confirmed states are checksummed every ROLLBACK_CHECK_FRAMES frames and
+    compared with the peer's, so a desync is caught where it happens.
+    """
+    def __init__(self, world, local_index, link, input_delay=ROLLBACK_INPUT_DELAY,
+                 max_frames=ROLLBACK_MAX_FRAMES):
+        if len(world.players) != 2:
+            raise ValueError("rollback races need a world with exactly one guest")
+        self.world = world
+        self.local_index = local_index
+        self.link = link
+        self.input_delay = input_delay
+        self.max_frames = max_frames
+
+        self.frame = 0           # Next frame to simulate
+        self.local_inputs = {f: 0 for f in range(input_delay)} # Frame -> our bits
+        self.input_end = input_delay # First frame we have no input for yet
+        self.remote_inputs = {}  # Frame -> peer bits, confirmed
+        self.remote_next = 0     # Peer bits are confirmed for every frame before this
+        self.predicted = {}      # Frame -> peer bits guessed when it was simulated
+        self.states = {}         # Frame -> world snapshot from before it was simulated
+        self.peer_next = 0       # Peer has our bits for every frame before this
+
+        self.checksums = {}      # Frame -> CRC of our confirmed state
+        self.peer_checksum = (0, 0)
+        self.checks = 0          # Checksums compared with the peer's
+        self.desync_frame = None # First frame whose checksum didn't match
+
+        # Metrics
+        self.stalls = 0          # Frames spent waiting for the peer
+        self.predictions = 0     # Frames simulated on a guessed peer input
+        self.mispredictions = 0
+        self.rollbacks = 0
+        self.resim_frames = 0    # Frames simulated again after a rollback
+        self.resim_seconds = 0.0
+        self.max_depth = 0       # Deepest rollback, in frames
+        self.max_resim_ms = 0.0  # Worst rollback cost in one frame
+        self.depths = [0] * (max_frames + 1) # Rollbacks by depth
+
+    def advance(self, bits):
+        """Run one frame with our input bits. False if we had to wait for the peer instead."""
+        self._receive()
+        if self.frame - self.remote_next >= self.max_frames:
+            self.stalls += 1
+            self._send()
+            return False
+        self.local_inputs[self.input_end] = bits
+        self.input_end += 1
+        self._send()
+        self._simulate(self.frame)
+        if self.frame in self.predicted:
+            self.predictions += 1
+        self.frame += 1
+        return True
+
+    def rollback_summary(self):
+        """Mean rollback depth and re-simulation cost per rollback (ms)."""
+        if not self.rollbacks:
+            return 0.0, 0.0
+        depth = sum(d * n for d, n in enumerate(self.depths)) / self.rollbacks
+        return depth, self.resim_seconds / self.rollbacks * 1000
+
+    def _simulate(self, frame):
+        world = self.world
+        self.states[frame] = world.snapshot()
+        remote = self.remote_inputs.get(frame)
+        if remote is None:
+            # Guess: the peer keeps steering and working the throttle as it last did
+            remote = self.remote_inputs.get(self.remote_next - 1, 0) & ~INPUT_NITRO
+            self.predicted[frame] = remote
+        local = self.local_inputs[frame]
+        # Same order on both peers: player first, then the guest
+        for i, car in enumerate(world.players):
+            apply_input(car, local if i == self.local_index else remote)
+        world.tick()
+
+    def _rollback(self, frame):
+        start = time.perf_counter()
+        world = self.world
+        depth = self.frame - frame
+        # Events and effects of frames already shown aren't reported twice
+        watched = world.effects is not None
+        world.emit_effects(False)
+        events = world.events
+        world.restore(self.states[frame])
+        for f in range(frame, self.frame):
+            self.predicted.pop(f, None)
+            self._simulate(f)
+        world.events = events
+        world.emit_effects(watched)
+
+        seconds = time.perf_counter() - start
+        self.rollbacks += 1
+        self.resim_frames += depth
+        self.resim_seconds += seconds
+        self.max_depth = max(self.max_depth, depth)
+        self.max_resim_ms = max(self.max_resim_ms, seconds * 1000)
+        self.depths[min(depth, self.max_frames)] += 1
+
+    def _receive(self):
+        first_wrong = None
+        for data in self.link.receive():
+            if len(data) < _PACKET.size:
+                continue
+            ack, check_frame, check_crc, first, count = _PACKET.unpack_from(data)
+            self.peer_next = max(self.peer_next, ack)
+            if check_frame > self.peer_checksum[0]:
+                self.peer_checksum = (check_frame, check_crc)
+            for k in range(count):
+                f = first + k
+                if f < self.remote_next or f in self.remote_inputs:
+                    continue
+                bits = data[_PACKET.size + k]
+                self.remote_inputs[f] = bits
+                guess = self.predicted.pop(f, None)
+                if guess is not None and guess != bits:
+                    self.mispredictions += 1
+                    if first_wrong is None or f < first_wrong:
+                        first_wrong = f
+        while self.remote_next in self.remote_inputs:
+            self.remote_next += 1
+        if first_wrong is not None:
+            self._rollback(first_wrong)
+        self._confirm()
+
+    def _confirm(self):
+        # Frames before remote_next can't be rolled back any more
+        confirmed = min(self.remote_next, self.frame)
+        for f in [f for f in self.states if f < confirmed]:
+            state = self.states.pop(f)
+            if f and f % ROLLBACK_CHECK_FRAMES == 0:
+                self.checksums[f] = zlib.crc32(state)
+        # Keep the last confirmed input (the prediction) and any the peer sent ahead of us
+        for f in [f for f in self.remote_inputs if f < min(self.remote_next - 1, confirmed)]:
+            del self.remote_inputs[f]
+        for f in [f for f in self.local_inputs if f < min(confirmed, self.peer_next)]:
+            del self.local_inputs[f]
+
+        check_frame, check_crc = self.peer_checksum
+        ours = self.checksums.get(check_frame)
+        if ours is not None and check_crc is not None:
+            self.checks += 1
+            if ours != check_crc and self.desync_frame is None:
+                self.desync_frame = check_frame
+            self.peer_checksum = (check_frame, None) # Compared
+            for f in [f for f in self.checksums if f < check_frame]:
+                del self.checksums[f]
+
+    def _send(self):
+        # Every input the peer hasn't acknowledged, oldest first
+        end = self.input_end
+        first = max(self.peer_next, end - 255)
+        inputs = bytes(self.local_inputs[f] for f in range(first, end))
+        check_frame = max(self.checksums) if self.checksums else 0
+        self.link.send(_PACKET.pack(self.remote_next, check_frame, self.checksums.get(check_frame, 0),
+                                    first, len(inputs)) + inputs)
+
+if __name__ == "__main__":
+    # python -m src.utils.rollback [latency ms] [jitter ms] [seconds] [loss]
+    # Two peers in one process over loopback UDP, each with artificial
+    # one-way latency and jitter, driven by scripted inputs that change
+    # often enough to force mispredictions.
+    import sys
+    from src.models.player_profile import PlayerProfile
+    from src.models.race_config import RACE_BEGINNER
+    from src.models.race_world import RaceWorld
+    from src.utils.race_client import bot_bits
+    from src.utils.replay import INPUT_LEFT, INPUT_RIGHT
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 40
+    jitter = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 20
+    loss = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+
+    links = [UdpLink(), UdpLink()]
+    links[0].peer, links[1].peer = links[1].address, links[0].address
+    sessions = []
+    for i, link in enumerate(links):
+        world = RaceWorld(RACE_BEGINNER, PlayerProfile(), random.Random(1), guests=[PlayerProfile()])
+        sessions.append(RollbackSession(world, i, LagLink(link, latency, jitter, loss, seed=i)))
+    drivers = [random.Random(10 + i) for i in range(2)]
+    steer = [0, 0]
+
+    period = 1.0 / FPS
+    next_time = time.perf_counter()
+    frame_seconds = [0.0, 0.0]
+    worst_frame = [0.0, 0.0]
+    for _ in range(int(seconds * FPS)):
+        for i, session in enumerate(sessions):
+            car = session.world.players[i]
+            if drivers[i].random() < 0.05:
+                steer[i] = drivers[i].choice((0, 0, INPUT_LEFT, INPUT_RIGHT))
+            bits = bot_bits(car, session.world.racing) | (steer[i] if session.world.racing else 0)
+            start = time.perf_counter()
+            session.advance(bits)
+            spent = time.perf_counter() - start
+            frame_seconds[i] += spent
+            worst_frame[i] = max(worst_frame[i], spent)
+        next_time += period
+        time.sleep(max(0.0, next_time - time.perf_counter()))
+
+    # Let the last inputs land so the final checksums can be compared
+    deadline = time.perf_counter() + 1 + 2 * (latency + jitter) / 1000
+    while time.perf_counter() < deadline:
+        for session in sessions:
+            session._receive()
+            session._send()
+        time.sleep(0.005)
+
+    print(f"one-way latency {latency:.0f}ms +- {jitter:.0f}ms, loss {loss:.0%}, {seconds:.0f}s")
+    for i, session in enumerate(sessions):
+        depth, cost = session.rollback_summary()
+        frames = max(1, session.frame)
+        print(f"  peer {i}: {session.frame} frames, {session.stalls} stalls, "
+              f"{session.mispredictions}/{session.predictions} mispredicted, "
+              f"{session.rollbacks} rollbacks (mean depth {depth:.1f}, max {session.max_depth}), "
+              f"re-sim {session.resim_frames} frames at {cost:.2f}ms per rollback (max {session.max_resim_ms:.2f}ms), "
+              f"frame {frame_seconds[i] / frames * 1000:.2f}ms avg / {worst_frame[i] * 1000:.2f}ms max "
+              f"of a {period * 1000:.1f}ms budget")
+        print(f"          rollbacks by depth: {session.depths}")
+    a, b = sessions
+    if a.desync_frame is not None or b.desync_frame is not None:
+        print(f"DESYNC at frame {a.desync_frame if a.desync_frame is not None else b.desync_frame}")
+    else:
+        same = a.world.snapshot() == b.world.snapshot() if a.frame == b.frame else None
+        print(f"In sync: {a.checks + b.checks} checksums matched" +
+              ("" if same is None else f", final states {'identical' if same else 'DIFFER'}"))
@@ -0,0 +1,193 @@
+import os
+import struct
+import threading
+import zlib
+from src.settings import *
+from src.models.player_profile import PlayerProfile, TIERS
+
+SAVE_MAGIC = b"DRGS"
+SAVE_FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHB") # magic, version, slot
+_CRC = struct.Struct("<I")       # crc32 of everything before it
+
+# Record layout per format version. An older version keeps its entry here
+# and gets a step in _migrate, so old careers load into the current profile.
+_RECORDS = {
+    # money, tier index, engine level, health, front, rear, fl, fr, rl, rr,
+    # nitro installed, nitro charges, max nitro charges
+    1: struct.Struct("<qBH7f?BB"),
+}
+
+def pack_profile(profile, slot):
+    """Profile as save-file bytes."""
+    record = _RECORDS[SAVE_FORMAT_VERSION]
+    data = _HEADER.pack(SAVE_MAGIC, SAVE_FORMAT_VERSION, slot) + record.pack(
+        profile.money, TIERS.index(profile.current_tier), profile.engine_level,
+        profile.health, profile.comp_front, profile.comp_rear,
+        profile.comp_fl, profile.comp_fr, profile.comp_rl, profile.comp_rr,
+        profile.nitro_installed, profile.nitro_charges, profile.max_nitro_charges)
+    return data + _CRC.pack(zlib.crc32(data))
+
+def unpack_profile(data):
+    """(slot, PlayerProfile) from save-file bytes. Raises ValueError if they don't check out."""
+    if len(data) < _HEADER.size + _CRC.size:
+        raise ValueError("save file too short")
+    magic, version, slot = _HEADER.unpack_from(data)
+    if magic != SAVE_MAGIC:
+        raise ValueError("not a save file")
+    record = _RECORDS.get(version)
+    if record is None:
+        raise ValueError(f"unknown save format version {version}")
+    if len(data) != _HEADER.size + record.size + _CRC.size:
+        raise ValueError("save file has the wrong size")
+    body_end = _HEADER.size + record.size
+    if _CRC.unpack_from(data, body_end)[0] != zlib.crc32(data[:body_end]):
+        raise ValueError("save file checksum mismatch")
+
+    fields = _migrate(version, record.unpack_from(data, _HEADER.size))
+    (money, tier, engine_level, health, front, rear, fl, fr, rl, rr,
+     nitro_installed, nitro_charges, max_nitro_charges) = fields
+    if tier >= len(TIERS) or nitro_charges > max_nitro_charges:
+        raise ValueError("save file values out of range")
+
+    profile = PlayerProfile()
+    profile.money = money
+    profile.current_tier = TIERS[tier]
+    profile.engine_level = engine_level
+    profile.health = min(health, profile.current_tier.durability)
+    profile.comp_front = _unit(front)
+    profile.comp_rear = _unit(rear)
+    profile.comp_fl = _unit(fl)
+    profile.comp_fr = _unit(fr)
+    profile.comp_rl = _unit(rl)
+    profile.comp_rr = _unit(rr)
+    profile.nitro_installed = nitro_installed
+    profile.nitro_charges = nitro_charges
+    profile.max_nitro_charges = max_nitro_charges
+    return slot, profile
+
+def _migrate(version, fields):
+    # Bring an old record up to the current layout one version at a time
+    # (nothing to do yet: version 1 is the only format)
+    return fields
+
+def _unit(value):
+    return min(1.0, max(0.0, value))
+
+def write_atomic(path, data):
+    """Replace path with data so a crash leaves either the old file or the new one."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    # Make the rename itself durable where the OS lets us
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+class ProfileStore:
+    """One career slot on disk.
+
+    save() only packs the profile (a few dozen bytes) and hands it to a
+    background writer, so the fsync never lands on the game loop. Saves
+    that arrive while a write is in flight are coalesced to the newest.
+    """
+    def __init__(self, slot=0, directory=SAVE_DIR):
+        if not 0 <= slot < SAVE_SLOTS:
+            raise ValueError(f"slot must be 0-{SAVE_SLOTS - 1}")
+        self.slot = slot
+        self.path = os.path.join(directory, f"slot_{slot}.sav")
+
+        self.cond = threading.Condition()
+        self.pending = None   # Newest bytes not yet written
+        self.writing = False
+        self.closed = False
+        self.thread = None    # Started on the first save
+        self.error = None     # Last write failure, for the caller to report
+
+    def ghost_path(self, config):
+        """Where this career keeps its best-run ghost for config (fixed-layout races only)."""
+        if config.seed is None or not config.name:
+            return None
+        return os.path.join(os.path.dirname(self.path), f"slot_{self.slot}_{config.name.lower()}.ghost")
+
+    def load(self):
+        """Saved profile for this slot, or None if there is no usable save.
+
+        A save that fails validation is moved aside to *.bad rather than
+        overwritten by the next save.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            slot, profile = unpack_profile(data)
+            if slot != self.slot:
+                raise ValueError(f"save belongs to slot {slot}")
+        except ValueError:
+            os.replace(self.path, self.path + ".bad")
+            return None
+        return profile
+
+    def load_or_new(self):
+        profile = self.load()
+        return profile if profile is not None else PlayerProfile()
+
+    def save(self, profile):
+        """Queue a save of the profile as it is right now."""
+        data = pack_profile(profile, self.slot)
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("store is closed")
+            self.pending = data
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f"save-slot-{self.slot}", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def flush(self):
+        """Block until every queued save is on disk."""
+        with self.cond:
+            while self.pending is not None or self.writing:
+                self.cond.wait()
+
+    def close(self):
+        self.flush()
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None and not self.closed:
+                    self.cond.wait()
+                if self.pending is None:
+                    return
+                data = self.pending
+                self.pending = None
+                self.writing = True
+            try:
+                write_atomic(self.path, data)
+                self.error = None
+            except OSError as e:
+                self.error = e
+            with self.cond:
+                self.writing = False
+                self.cond.notify_all()
+
+def used_slots(directory=SAVE_DIR):
+    """Slots that have a save file, without loading them."""
+    return [slot for slot in range(SAVE_SLOTS) if os.path.exists(os.path.join(directory, f"slot_{slot}.sav"))]
@@ -0,0 +1,64 @@
+from src.settings import *
+
+def classification_key(car):
+    """Finished cars by finish time, then everyone else by distance."""
+    return (0, car.finish_time) if car.finished else (1, -car.y)
+
+class Standings:
+    """Running order, kept up to date instead of re-sorted every frame.
+
+    self.order is the classification: finished cars in finishing order,
+    then everyone else by distance. Finishes are events (on_finish) that
+    move a car into the finished block. The rest only moves a little per
+    tick, so update() is an insertion pass that costs about one comparison
+    per car when nobody overtakes. Wrecked and stalled cars stay ranked by
+    distance like in the classification; they simply stop moving.
+    """
+    def __init__(self, cars):
+        self.order = sorted(cars, key=classification_key)
+        self.num_finished = sum(1 for car in cars if car.finished)
+        self.index = {}
+        for i, car in enumerate(self.order):
+            self.index[car] = i
+
+    def rank(self, car):
+        """1-based position of car."""
+        return self.index[car] + 1
+
+    def top(self, count=10):
+        return self.order[:count]
+
+    def on_finish(self, car):
+        """Move a car that just finished behind the cars already finished."""
+        order = self.order
+        index = self.index
+        start = self.num_finished
+        i = index[car]
+        while i > start:
+            other = order[i - 1]
+            order[i] = other
+            index[other] = i
+            i -= 1
+        order[start] = car
+        index[car] = start
+        self.num_finished += 1
+
+    def update(self):
+        """Restore distance order among cars still on the road after a tick."""
+        order = self.order
+        index = self.index
+        start = self.num_finished
+        for i in range(start + 1, len(order)):
+            car = order[i]
+            y = car.y
+            if order[i - 1].y >= y:
+                continue
+            # Overtake: slide the car forward past everyone it passed
+            j = i
+            while j > start and order[j - 1].y < y:
+                other = order[j - 1]
+                order[j] = other
+                index[other] = j
+                j -= 1
+            order[j] = car
+            index[car] = j
@@ -0,0 +1,18 @@
+import threading
+import time
+from src.settings import *
+
+# Startup milestones, timed from when this module was first imported. main
+# imports it before anything else, so pygame's own import is included.
+LAUNCHED = time.perf_counter()
+milestones = {}
+_lock = threading.Lock() # The asset loader marks from its own thread
+
+def mark(name):
+    """Record the first time name happens (later calls are ignored)."""
+    with _lock:
+        if name in milestones:
+            return
+        milestones[name] = seconds = time.perf_counter() - LAUNCHED
+        if STARTUP_REPORT:
+            print(f"Startup: {name} at {seconds * 1000:.0f}ms")
@@ -0,0 +1,244 @@
+import glob
+import os
+import queue
+import threading
+import time
+from itertools import chain
+from operator import attrgetter
+import numpy as np
+from src.settings import *
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Recordable fields and how they are stored. "rank" comes from the
+# standings; everything else is a Car attribute.
+TELEMETRY_FIELDS = {
+    "y": np.float32,
+    "speed": np.float32,
+    "throttle": np.int16,
+    "heat": np.float32,
+    "fuel": np.float32,
+    "health": np.float32,
+    "comp_front": np.float32,
+    "comp_rear": np.float32,
+    "comp_fl": np.float32,
+    "comp_fr": np.float32,
+    "comp_rl": np.float32,
+    "comp_rr": np.float32,
+    "is_drafting": np.bool_,
+    "is_side_drafting": np.bool_,
+    "rank": np.int16,
+}
+
+class TelemetryRecorder:
+    """Per-tick traces of every car, written to disk off the game loop.
+
+    Attach with world.telemetry = recorder; the world calls sample() after
+    each tick. A sample copies the selected fields of all cars into a
+    block of a preallocated ring (one float32 column per field, samples x
+    cars). Full blocks go to a writer thread, which converts them to the
+    field's dtype, turns the running order into ranks and writes them out:
+    path.NNNN.npz (compressed) per block, or a single path.parquet when
+    pyarrow is installed. If the writer falls behind far enough to fill
+    the ring, samples are dropped (and counted) rather than waiting.
+    """
+    def __init__(self, world, path, fields=None, every=TELEMETRY_SAMPLE_TICKS, parquet=None):
+        fields = list(fields or TELEMETRY_FIELDS)
+        for name in fields:
+            if name not in TELEMETRY_FIELDS:
+                raise ValueError(f"unknown telemetry field {name!r}")
+        self.path = path
+        self.fields = fields
+        self.every = every
+        self.parquet = (pyarrow is not None) if parquet is None else parquet
+        if self.parquet and pyarrow is None:
+            raise RuntimeError("Parquet telemetry needs pyarrow")
+
+        self.cars = list(world.all_cars)
+        num_cars = len(self.cars)
+        self.car_fields = [name for name in fields if name != "rank"]
+        self.values = attrgetter(*self.car_fields) if self.car_fields else None
+        self.index = {car: i for i, car in enumerate(self.cars)}
+        self.with_rank = "rank" in fields
+
+        # Ring of blocks; big fields get shorter blocks
+        width = max(1, len(self.car_fields)) * num_cars * 4
+        self.block_samples = max(1, min(TELEMETRY_BLOCK_SAMPLES, TELEMETRY_BLOCK_BYTES // width))
+        self.columns = np.zeros((TELEMETRY_RING_BLOCKS, len(self.car_fields), self.block_samples, num_cars), np.float32)
+        self.ticks = np.zeros((TELEMETRY_RING_BLOCKS, self.block_samples), np.int32)
+        self.orders = np.zeros((TELEMETRY_RING_BLOCKS, self.block_samples, num_cars), np.int32) if self.with_rank else None
+        self.free = queue.Queue()
+        for b in range(TELEMETRY_RING_BLOCKS):
+            self.free.put(b)
+        self.block = self.free.get()
+        self.slot = 0
+        self.next_tick = world.race_time
+        self.last_tick = world.race_time
+
+        # Stats
+        self.samples = 0
+        self.dropped = 0
+        self.sample_seconds = 0.0 # Time spent in sample() (game loop cost)
+        self.parts = 0
+        self.error = None         # Exception that stopped the writer
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        for old in glob.glob(glob.escape(path) + ".*.npz") + glob.glob(glob.escape(path) + ".parquet"):
+            os.remove(old)
+        self.pending = queue.Queue()
+        self.writer = threading.Thread(target=self._write_blocks, name="telemetry-writer", daemon=True)
+        self.writer.start()
+
+    def sample(self, world):
+        race_time = world.race_time
+        if race_time < self.last_tick:
+            self.next_tick = race_time # Race was rewound (retry, rollback): record the new run
+        self.last_tick = race_time
+        if race_time < self.next_tick:
+            return
+        self.next_tick = race_time + self.every
+        start = time.perf_counter()
+
+        if self.block is None:
+            try:
+                self.block = self.free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return
+        b = self.block
+        slot = self.slot
+        cars = self.cars
+        if self.values is not None:
+            count = len(cars) * len(self.car_fields)
+            values = np.fromiter(chain.from_iterable(map(self.values, cars)), np.float32, count)
+            if len(self.car_fields) == 1:
+                self.columns[b, 0, slot] = values
+            else:
+                self.columns[b, :, slot] = values.reshape(len(cars), len(self.car_fields)).T
+        if self.with_rank:
+            self.orders[b, slot] = list(map(self.index.__getitem__, world.standings.order))
+        self.ticks[b, slot] = race_time
+        self.slot = slot + 1
+        self.samples += 1
+        if self.slot == self.block_samples:
+            self.pending.put((b, self.slot))
+            self.block = None
+            self.slot = 0
+        self.sample_seconds += time.perf_counter() - start
+
+    def close(self):
+        """Write out what is left and wait for the writer."""
+        if self.writer is None:
+            return
+        if self.block is not None and self.slot:
+            self.pending.put((self.block, self.slot))
+        self.block = None
+        self.pending.put(None)
+        self.writer.join()
+        self.writer = None
+
+    def _write_blocks(self):
+        writer = None
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            b, count = item
+            try:
+                if self.error is None:
+                    data = self._block_arrays(b, count)
+                    if self.parquet:
+                        writer = self._write_parquet(writer, data, count)
+                    else:
+                        np.savez_compressed(f"{self.path}.{self.parts:04d}.npz", **data)
+                    self.parts += 1
+            except Exception as e:
+                self.error = e # Recording stops; the race goes on
+            self.free.put(b)
+        if writer is not None:
+            writer.close()
+
+    def _block_arrays(self, b, count):
+        data = {"tick": self.ticks[b, :count].copy()}
+        for j, name in enumerate(self.car_fields):
+            data[name] = self.columns[b, j, :count].astype(TELEMETRY_FIELDS[name])
+        if self.with_rank:
+            num_cars = len(self.cars)
+            rank = np.empty((count, num_cars), np.int16)
+            rows = np.arange(count)[:, None]
+            rank[rows, self.orders[b, :count]] = np.arange(1, num_cars + 1, dtype=np.int16)
+            data["rank"] = rank
+        return data
+
+    def _write_parquet(self, writer, data, count):
+        # Long format: one row per (sample, car)
+        num_cars = len(self.cars)
+        table = {"tick": np.repeat(data["tick"], num_cars),
+                 "car": np.tile(np.arange(num_cars, dtype=np.int16), count)}
+        for name in self.fields:
+            table[name] = data[name].reshape(-1)
+        table = pyarrow.table(table)
+        if writer is None:
+            writer = pyarrow.parquet.ParquetWriter(self.path + ".parquet", table.schema, compression="zstd")
+        writer.write_table(table)
+        return writer
+
+def load_telemetry(path):
+    """Recorded columns as {"tick": (samples,), field: (samples, cars)}."""
+    if os.path.exists(path + ".parquet"):
+        table = pyarrow.parquet.read_table(path + ".parquet")
+        num_cars = int(table.column("car").to_numpy().max()) + 1
+        data = {"tick": table.column("tick").to_numpy()[::num_cars]}
+        for name in table.column_names:
+            if name not in ("tick", "car"):
+                data[name] = table.column(name).to_numpy().reshape(-1, num_cars)
+        return data
+    parts = sorted(glob.glob(glob.escape(path) + ".*.npz"))
+    if not parts:
+        raise FileNotFoundError(f"no telemetry at {path}")
+    blocks = [np.load(part) for part in parts]
+    return {name: np.concatenate([block[name] for block in blocks]) for name in blocks[0].files}
+
+if __name__ == "__main__":
+    # python -m src.utils.telemetry [race] [ticks] [every]
+    # Game-loop cost of recording every car, against the tick itself and a
+    # 60Hz frame, then the recording read back.
+    import random
+    import sys
+    import tempfile
+    from src.models import race_config
+    from src.models.player_profile import PlayerProfile
+    from src.models.race_world import RaceWorld
+    config = getattr(race_config, sys.argv[1] if len(sys.argv) > 1 else "RACE_BEGINNER")
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    every = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    def run(record):
+        world = RaceWorld(config, PlayerProfile(), random.Random(1))
+        recorder = TelemetryRecorder(world, path, every=every) if record else None
+        world.telemetry = recorder
+        start = time.perf_counter()
+        for _ in range(ticks):
+            world.tick()
+        seconds = time.perf_counter() - start
+        if recorder:
+            recorder.close()
+        return seconds, recorder
+
+    path = os.path.join(tempfile.mkdtemp(), "telemetry")
+    plain, _ = run(False)
+    recorded, recorder = run(True)
+    per_sample = recorder.sample_seconds / max(1, recorder.samples) * 1000
+    print(f"{config.name}: {len(recorder.cars)} cars, {recorder.samples} samples, {recorder.dropped} dropped, "
+          f"{recorder.block_samples} samples per block")
+    print(f"  sample: {per_sample:.3f}ms = {per_sample * FPS / 10:.2f}% of a 60Hz frame at 1 sample per frame")
+    print(f"  tick: {plain / ticks * 1000:.3f}ms plain, {recorded / ticks * 1000:.3f}ms recording "
+          f"(writer thread shares the core here)")
+    data = load_telemetry(path)
+    size = sum(os.path.getsize(p) for p in glob.glob(path + ".*"))
+    print(f"  read back {', '.join(f'{k}{v.shape}' for k, v in data.items() if k in ('tick', 'speed', 'rank'))}, "
+          f"{recorder.parts} files, {size / 1024:.0f} KB")
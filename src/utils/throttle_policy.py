@@ -0,0 +1,445 @@
+import hashlib
+import math
+import os
+import random
+import struct
+import tempfile
+import threading
+from bisect import bisect_right
+from src.settings import *
+from src.models.car import AIDriver, Car
+
+POLICY_MAGIC = b"DRGP"
+POLICY_FORMAT_VERSION = 3 # 3: speed bins
+_HEADER = struct.Struct("<4sHHHHH")  # magic, version, layers, dist bins, speed bins, res bins
+
+# Terminal costs (in ticks) for strategies that end the race early
+COST_OVERHEAT = 1e7
+COST_NO_FUEL = 1e6
+
+THROTTLE_ACTIONS = list(range(10, 101, 10))
+
+# Solved policies shared between every car of the same stats. Worlds are
+# built on a worker thread too: a solve holds its key's lock, so a second
+# caller waits for it instead of solving again.
+_policies = {}
+_solve_locks = {}
+_solve_locks_lock = threading.Lock()
+
+def consumption(throttle, stats):
+    """Per-tick (fuel_burn, heat_delta) for an undamaged car at a fixed throttle."""
+    fuel_burn, heat_delta = EFFICIENCY_CURVE[throttle]
+    if heat_delta < 0:
+        heat_delta *= stats.cooling_factor
+    return fuel_burn, heat_delta
+
+def race_legs(checkpoints, race_length):
+    """Leg lengths of a race, first to last.
+
+    A checkpoint at or past the finish doesn't start a leg. Endless races
+    solve POLICY_MAX_LEGS standard legs and always use the last layer.
+    """
+    if race_length is None or race_length == float('inf'):
+        return (LEG_DISTANCE,) * POLICY_MAX_LEGS
+    legs = []
+    start = 0
+    for cp_y in checkpoints:
+        if cp_y >= race_length:
+            break
+        legs.append(cp_y - start)
+        start = cp_y
+    legs.append(race_length - start)
+    return tuple(legs)
+
+def settings_hash(stats, legs):
+    """Hash of everything the solved table depends on."""
+    key = (
+        POLICY_FORMAT_VERSION,
+        sorted(EFFICIENCY_CURVE.items()),
+        tuple(legs),
+        CHECKPOINT_FUEL_REFILL,
+        CHECKPOINT_HEAT_DROP,
+        POLICY_DIST_STEP,
+        POLICY_RES_BINS,
+        POLICY_SPEED_BINS,
+        POLICY_CRUISE_THROTTLE,
+        POLICY_MAX_LEGS,
+        stats.max_speed,
+        stats.acceleration,
+        stats.fuel_capacity,
+        stats.heat_capacity,
+        stats.cooling_factor,
+    )
+    return hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+
+def _bilerp(values, f, h, n):
+    # Bilinear sample of an n*n grid (fuel-major) at fractional bin coords
+    fi = int(f)
+    hi = int(h)
+    if fi >= n - 1:
+        fi = n - 2
+    if hi >= n - 1:
+        hi = n - 2
+    ft = f - fi
+    ht = h - hi
+    base = fi * n + hi
+    v00 = values[base]
+    v01 = values[base + 1]
+    v10 = values[base + n]
+    v11 = values[base + n + 1]
+    return (v00 * (1 - ft) + v10 * ft) * (1 - ht) + (v01 * (1 - ft) + v11 * ft) * ht
+
+def _sample(values, f_coord, h_coord, n):
+    # Bilinear sample of an n*n grid at split (bin, fraction) coords
+    fi, ft = f_coord
+    hi, ht = h_coord
+    base = fi * n + hi
+    v00 = values[base]
+    v01 = values[base + 1]
+    v10 = values[base + n]
+    v11 = values[base + n + 1]
+    return (v00 * (1 - ft) + v10 * ft) * (1 - ht) + (v01 * (1 - ft) + v11 * ft) * ht
+
+def _split(x, n):
+    # (bin, fraction) of a grid coordinate, the last cell taking the top edge
+    xi = int(x)
+    if xi >= n - 1:
+        xi = n - 2
+    return xi, x - xi
+
+def _fuel_coords(burn, n):
+    # Where each fuel bin lands after burning this much; None: ran dry
+    return [_split(f - burn, n) if f - burn > 0 else None for f in range(n)]
+
+def _heat_coords(gain, n):
+    # Where each heat bin lands after gaining this much; None: overheated
+    top = n - 1
+    return [_split(max(0.0, h + gain), n) if h + gain < top else None for h in range(n)]
+
+class _FixedThrottle:
+    # Stands in for the table while one action is integrated
+    def __init__(self, throttle):
+        self.throttle = throttle
+
+    def target_throttle(self, car, checkpoints):
+        return self.throttle
+
+def transition(stats, speed, throttle):
+    """(ticks, fuel burnt, heat gained, end speed) over one POLICY_DIST_STEP.
+
+    Drives a lone AI car tick by tick the way RaceWorld does, from this
+    speed at the throttle that holds it, with the table asking for
+    throttle: acceleration, the pedal ramp, its jitter and the fuel and
+    heat of the throttle the car really has. The last tick counts for the
+    part of it inside the step.
+    """
+    center = TRACK_X + TRACK_WIDTH / 2
+    car = Car(center, 0.0, None, stats, float('inf'), rng=random.Random(0))
+    car.speed = speed
+    car.throttle = min(100, int(speed / stats.max_speed * 100 + 0.5))
+    car.heat = stats.heat_capacity / 2 # Well clear of both clamps over one step
+    driver = AIDriver(car, _FixedThrottle(throttle))
+    cars = [car]
+    ticks = 0
+    while True:
+        y = car.y
+        fuel = car.fuel
+        heat = car.heat
+        driver.update(center, (), cars)
+        car.update(1, driver.drive)
+        ticks += 1
+        if car.y >= POLICY_DIST_STEP:
+            break
+    part = (POLICY_DIST_STEP - y) / (car.y - y)
+    return (ticks - 1 + part,
+            stats.fuel_capacity - fuel + (fuel - car.fuel) * part,
+            heat - stats.heat_capacity / 2 + (car.heat - heat) * part,
+            car.speed)
+
+def _solve_leg(stats, actions, continuation, table, layer, layers, leg_bins):
+    """Backward pass over one leg.
+
+    actions[v] is (cruise, cooling) moves from speed bin v.
+    continuation[v][f*n + h] is the cost-to-go right after the checkpoint
+    refill. Fills this layer of the table (every distance bin, so any leg
+    fits) and returns the cost-to-go leg_bins from the checkpoint: the
+    leg's start.
+    """
+    n = POLICY_RES_BINS
+    speeds = POLICY_SPEED_BINS
+    cells = n * n
+    dist_bins = len(table) // (layers * speeds * cells)
+    fuel_step = stats.fuel_capacity / (n - 1)
+    heat_step = stats.heat_capacity / (n - 1)
+    refill_f = CHECKPOINT_FUEL_REFILL / fuel_step
+    drop_h = CHECKPOINT_HEAT_DROP / heat_step
+    top = n - 1
+
+    # Crossing the checkpoint applies the refill; speed carries over
+    prev = []
+    for grid in continuation:
+        values = [0.0] * cells
+        for f in range(n):
+            f2 = min(top, f + refill_f)
+            for h in range(n):
+                values[f * n + h] = _bilerp(grid, f2, h - drop_h if h > drop_h else 0.0, n)
+        prev.append(values)
+
+    leg_start = prev
+    for d in range(1, dist_bins + 1):
+        grids = []
+        for v in range(speeds):
+            best = None
+            cruise, cooling = actions[v]
+            for throttle, ticks, f_coords, h_coords, vi, vt in cruise:
+                # The end speed falls between two speed grids
+                if vt:
+                    low = prev[vi]
+                    high = prev[vi + 1]
+                    grid = [a + (b - a) * vt for a, b in zip(low, high)]
+                else:
+                    grid = prev[vi]
+                # Fuel and heat move by the same amount from every cell, so
+                # the interpolation splits into whole rows, then columns
+                costs = []
+                for coord in f_coords:
+                    if coord is None:
+                        row = None
+                    else:
+                        fi, ft = coord
+                        base = fi * n
+                        row = [a + (b - a) * ft for a, b in zip(grid[base:base + n], grid[base + n:base + 2 * n])]
+                    for hcoord in h_coords:
+                        if hcoord is None:
+                            costs.append(COST_OVERHEAT)
+                        elif row is None:
+                            costs.append(COST_NO_FUEL)
+                        else:
+                            hi, ht = hcoord
+                            costs.append(ticks + row[hi] + (row[hi + 1] - row[hi]) * ht)
+                if best is None:
+                    best = costs
+                    choice = [throttle] * cells
+                else:
+                    for c, cost in enumerate(costs):
+                        if cost < best[c]:
+                            best[c] = cost
+                            choice[c] = throttle
+
+            # Lifting to cool: only where every cruise throttle runs dry or overheats
+            stuck = [c for c in range(cells) if best[c] >= COST_NO_FUEL]
+            for throttle, ticks, f_coords, h_coords, vi, vt in cooling:
+                for c in stuck:
+                    h_coord = h_coords[c % n]
+                    f_coord = f_coords[c // n]
+                    if h_coord is None:
+                        cost = COST_OVERHEAT
+                    elif f_coord is None:
+                        cost = COST_NO_FUEL
+                    else:
+                        cost = _sample(prev[vi], f_coord, h_coord, n)
+                        if vt:
+                            cost += (_sample(prev[vi + 1], f_coord, h_coord, n) - cost) * vt
+                        cost += ticks
+                    if cost < best[c]:
+                        best[c] = cost
+                        choice[c] = throttle
+            offset = ((layer * dist_bins + d - 1) * speeds + v) * cells
+            table[offset:offset + cells] = bytes(choice)
+            grids.append(best)
+        prev = grids
+        if d == leg_bins:
+            leg_start = grids
+    return leg_start
+
+def solve_policy(stats, legs):
+    """Dynamic programming over (legs left, distance to checkpoint, speed, fuel, heat).
+
+    Each throttle is priced by transition(): ticks over the next distance
+    bin as the car really accelerates toward it, plus the cost-to-go from
+    the speed, fuel and heat it ends the bin with, and after a checkpoint
+    the refill. Running dry or overheating ends the race and is priced
+    accordingly. Below POLICY_CRUISE_THROTTLE a lone car would coast
+    between bursts, which in a pack only gets it rear-ended, so those
+    throttles are kept for where cruising can't reach the checkpoint.
+    Layer k is the leg with k more legs after it, solved out to the
+    longest leg and continued from the real length of the leg after it;
+    longer races use the last layer for their early legs.
+    """
+    n = POLICY_RES_BINS
+    speeds = POLICY_SPEED_BINS
+    legs = legs[-POLICY_MAX_LEGS:]
+    layers = len(legs)
+    dist_bins = int(math.ceil(max(legs) / POLICY_DIST_STEP))
+    fuel_step = stats.fuel_capacity / (n - 1)
+    heat_step = stats.heat_capacity / (n - 1)
+    speed_step = stats.max_speed / (speeds - 1)
+
+    # actions[v]: cruise and cooling moves, each
+    # (throttle, ticks, fuel coords, heat coords, end speed bin, fraction)
+    actions = []
+    for v in range(speeds):
+        cruise = []
+        cooling = []
+        for throttle in THROTTLE_ACTIONS:
+            ticks, fuel, heat, end_speed = transition(stats, v * speed_step, throttle)
+            vi = min(speeds - 1.0, end_speed / speed_step)
+            vt = vi - int(vi)
+            vi = int(vi)
+            if vi == speeds - 1:
+                vt = 0.0
+            moves = cruise if throttle >= POLICY_CRUISE_THROTTLE else cooling
+            moves.append((throttle, ticks, _fuel_coords(fuel / fuel_step, n),
+                          _heat_coords(heat / heat_step, n), vi, vt))
+        actions.append((cruise, cooling))
+
+    table = bytearray(layers * dist_bins * speeds * n * n)
+    leg_start = [[0.0] * (n * n) for _ in range(speeds)]
+    for layer in range(layers):
+        leg_bins = int(math.ceil(legs[-1 - layer] / POLICY_DIST_STEP))
+        leg_start = _solve_leg(stats, actions, leg_start, table, layer, layers, leg_bins)
+    return table
+
+class ThrottlePolicy:
+    """Solved best throttle per (legs left, distance to checkpoint, speed, fuel, heat) for one race layout.
+
+    The car's real speed picks the row, so drafting and front damage count
+    through it; the solve itself assumes a lone, undamaged car.
+    """
+    def __init__(self, stats, table, legs):
+        self.stats = stats
+        self.table = table
+        self.res = POLICY_RES_BINS
+        self.speeds = POLICY_SPEED_BINS
+        self.num_legs = len(legs)
+        self.layers = min(self.num_legs, POLICY_MAX_LEGS)
+        self.dist_bins = len(table) // (self.layers * self.speeds * self.res * self.res)
+        self.speed_scale = (self.speeds - 1) / stats.max_speed
+        self.fuel_scale = (self.res - 1) / stats.fuel_capacity
+        self.heat_scale = (self.res - 1) / stats.heat_capacity
+
+    @classmethod
+    def for_stats(cls, stats, legs):
+        """Shared policy for a stats block on a race with these legs (race_legs),
+        from memory, disk cache or a fresh solve."""
+        key = settings_hash(stats, legs)
+        policy = _policies.get(key)
+        if policy is not None:
+            return policy
+        with _solve_locks_lock:
+            lock = _solve_locks.setdefault(key, threading.Lock())
+        with lock:
+            policy = _policies.get(key)
+            if policy is None:
+                path = cls.cache_path(stats, key)
+                table = cls.load_table(path, min(len(legs), POLICY_MAX_LEGS))
+                if table is None:
+                    table = solve_policy(stats, legs)
+                    cls.save_table(path, table, min(len(legs), POLICY_MAX_LEGS))
+                policy = cls(stats, table, legs)
+                _policies[key] = policy
+        return policy
+
+    @staticmethod
+    def cache_path(stats, key):
+        slug = "".join(c if c.isalnum() else "_" for c in stats.name.lower())
+        return os.path.join(CACHE_DIR, "policy", f"{slug}_{key}.pol")
+
+    @staticmethod
+    def load_table(path, expected):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < _HEADER.size:
+            return None
+        magic, version, layers, dist_bins, speeds, res = _HEADER.unpack_from(data)
+        if (magic != POLICY_MAGIC or version != POLICY_FORMAT_VERSION
+                or (layers, speeds, res) != (expected, POLICY_SPEED_BINS, POLICY_RES_BINS)):
+            return None
+        table = data[_HEADER.size:]
+        if len(table) != layers * dist_bins * speeds * res * res:
+            return None
+        return table
+
+    @staticmethod
+    def save_table(path, table, layers):
+        n = POLICY_RES_BINS
+        dist_bins = len(table) // (layers * POLICY_SPEED_BINS * n * n)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A temp file of its own: other processes may be writing the same table
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(POLICY_MAGIC, POLICY_FORMAT_VERSION, layers, dist_bins, POLICY_SPEED_BINS, n))
+                f.write(table)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+    def target_throttle(self, car, checkpoints):
+        """Best throttle for the car's current state."""
+        idx = bisect_right(checkpoints, car.y) # Legs done
+        if idx < len(checkpoints) and checkpoints[idx] < car.race_length:
+            next_y = checkpoints[idx]
+        else:
+            next_y = car.race_length
+        layer = self.num_legs - 1 - idx
+        if layer < 0:
+            layer = 0
+        elif layer >= self.layers or car.race_length == float('inf'):
+            layer = self.layers - 1
+
+        d = int((next_y - car.y) // POLICY_DIST_STEP)
+        if d < 0:
+            d = 0
+        elif d >= self.dist_bins:
+            d = self.dist_bins - 1
+
+        v = int(car.speed * self.speed_scale + 0.5)
+        if v >= self.speeds:
+            v = self.speeds - 1
+
+        res = self.res
+        f = int(car.fuel * self.fuel_scale + 0.5)
+        h = int(car.heat * self.heat_scale + 0.5)
+        if f >= res:
+            f = res - 1
+        if h >= res:
+            h = res - 1
+        return self.table[(((layer * self.dist_bins + d) * self.speeds + v) * res + f) * res + h]
+
+if __name__ == "__main__":
+    # python -m src.utils.throttle_policy [race] [seeds]
+    # Headless A/B of the AI throttle: the solved table against the heat
+    # hysteresis, on the same seeds. Counts AI cars that reach the first
+    # checkpoint (and their mean time to it) and that finish. Most cars are
+    # wrecked before the end, so a few dozen seeds can swing either way.
+    import sys
+    from src.models import race_config
+    from src.models.player_profile import PlayerProfile, TIER_1_STARTER
+    from src.models.race_world import RaceWorld
+    config = getattr(race_config, sys.argv[1] if len(sys.argv) > 1 else "RACE_BEGINNER")
+    seeds = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    for name in ("policy", "hysteresis"):
+        reached = finished = dry = total = 0
+        split_ticks = 0
+        for seed in range(seeds):
+            world = RaceWorld(config, PlayerProfile(), random.Random(seed))
+            policy = ThrottlePolicy.for_stats(TIER_1_STARTER, race_legs(world.checkpoints, world.race_length))
+            cars = [ai.car for ai in world.ai_cars]
+            for ai in world.ai_cars:
+                ai.policy = policy if name == "policy" else None
+            while not all(car.finished or car.dead or (car.fuel <= 0 and car.speed < 0.1) for car in cars):
+                world.tick()
+            for car in cars:
+                total += 1
+                reached += bool(car.splits) or car.finished
+                finished += car.finished
+                dry += car.fuel <= 0 and not car.finished
+                split_ticks += car.splits[0] if car.splits else 0
+        print(f"{config.name} {name}: {reached}/{total} reached the first checkpoint "
+              f"(mean {split_ticks / max(1, reached):.0f} ticks), {finished} finished, {dry} ran dry")
@@ -0,0 +1,137 @@
+import mmap
+import os
+import struct
+import tempfile
+from bisect import bisect_left
+from src.settings import *
+from src.models.obstacle import Obstacle
+from src.models.race_config import RaceConfig
+from src.models.track import Track, OBSTACLE_TYPES
+
+TRACK_MAGIC = b"DRGT"
+TRACK_FORMAT_VERSION = 2 # 2: race name
+
+# magic, version, flags, length, num_ai, prize money, seed, checkpoints, obstacles,
+# race name (ASCII, NUL-padded; the race type in the results history)
+_HEADER = struct.Struct("<4sHHIIIIII16s")
+_CHECKPOINT = struct.Struct("<I")
+# Fixed-width obstacle record, sorted by y: y, x, type index
+_RECORD = struct.Struct("<iHB")
+
+FLAG_FIELD_MODE = 1
+
+class TrackFile:
+    """A saved track, memory-mapped.
+
+    Only the header and checkpoints are decoded on open. Obstacle records
+    stay in the mapping and are turned into Obstacle objects one chunk at
+    a time, as the Track streams them in.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < _HEADER.size:
+            raise ValueError(f"{path}: not a track file")
+
+        magic, version, flags, length, num_ai, prize, seed, num_cps, num_obs, name = _HEADER.unpack_from(self.mm)
+        if magic != TRACK_MAGIC or version != TRACK_FORMAT_VERSION:
+            raise ValueError(f"{path}: not a version {TRACK_FORMAT_VERSION} track file")
+
+        self.length = length
+        self.num_ai = num_ai
+        self.prize_money = prize
+        self.seed = seed
+        self.name = name.rstrip(b"\0").decode("ascii") or None
+        self.field_mode = bool(flags & FLAG_FIELD_MODE)
+        self.checkpoints = [_CHECKPOINT.unpack_from(self.mm, _HEADER.size + i * _CHECKPOINT.size)[0] for i in range(num_cps)]
+        self.num_obstacles = num_obs
+        self.records_offset = _HEADER.size + num_cps * _CHECKPOINT.size
+        if len(self.mm) < self.records_offset + num_obs * _RECORD.size:
+            raise ValueError(f"{path}: truncated track file")
+
+        # Zero-copy view of the record area, for bisecting on y
+        self.records = memoryview(self.mm)[self.records_offset:self.records_offset + num_obs * _RECORD.size]
+        self.ys = _RecordYs(self.records, num_obs)
+
+    def close(self):
+        self.records.release()
+        self.mm.close()
+
+    def race_config(self):
+        """RaceConfig that races on this layout."""
+        config = RaceConfig(self.length, self.num_ai, self.prize_money, list(self.checkpoints),
+                            num_obstacles=self.num_obstacles, field_mode=self.field_mode, seed=self.seed,
+                            name=self.name)
+        config.track_file = self.path
+        return config
+
+    def obstacles_between(self, y0, y1):
+        """Obstacle objects with y0 <= y < y1."""
+        lo = bisect_left(self.ys, y0)
+        hi = bisect_left(self.ys, y1)
+        obstacles = []
+        unpack = _RECORD.unpack_from
+        for i in range(lo, hi):
+            y, x, kind = unpack(self.records, i * _RECORD.size)
+            obstacles.append(Obstacle(x, y, OBSTACLE_TYPES[kind]))
+        return obstacles
+
+class _RecordYs:
+    """Sequence of record y values read straight from the mapping (for bisect)."""
+    def __init__(self, records, count):
+        self.records = records
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return _RECORD.unpack_from(self.records, i * _RECORD.size)[0]
+
+def save_track(path, config, obstacles, seed=0):
+    """Write a track file. Obstacles are sorted by y on the way out."""
+    if config.length is None:
+        raise ValueError("endless tracks can't be saved")
+    name = (config.name or "").encode("ascii")
+    if len(name) > 16:
+        raise ValueError(f"race name {config.name!r} is longer than 16 characters")
+    flags = FLAG_FIELD_MODE if config.field_mode else 0
+    obstacles = sorted(obstacles, key=lambda o: o.y)
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # A temp file of its own: another export may be writing the same path
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(TRACK_MAGIC, TRACK_FORMAT_VERSION, flags, config.length, config.num_ai,
+                                 config.prize_money, seed, len(config.checkpoints), len(obstacles), name))
+            for cp in config.checkpoints:
+                f.write(_CHECKPOINT.pack(cp))
+            records = bytearray(len(obstacles) * _RECORD.size)
+            for i, obs in enumerate(obstacles):
+                _RECORD.pack_into(records, i * _RECORD.size, obs.y, obs.x, OBSTACLE_TYPES.index(obs.type))
+            f.write(records)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def export_seeded(path, config, seed):
+    """Save the layout a seeded race of this config would stream."""
+    # Imported here: race_world imports this module
+    from src.models.race_world import obstacle_start
+    track = Track(config, seed, obstacle_start(config))
+    obstacles = []
+    for index in range(track.num_chunks):
+        obstacles.extend(track.generate_chunk(index))
+    save_track(path, config, obstacles, seed)
+
+if __name__ == "__main__":
+    # python -m src.utils.track_file RACE_PRO 1234 data/tracks/pro.trk
+    import sys
+    from src.models import race_config
+    name, seed, out = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+    export_seeded(out, getattr(race_config, name), seed)
+    print(f"Wrote {out}")
@@ -2,27 +2,104 @@ import pygame
 import math
 from src.settings import *
 
+# Fonts by size. Font() reads and parses the font file, so the HUD must not
+# build them per frame.
+_fonts = {}
+
+def get_font(size):
+    font = _fonts.get(size)
+    if font is None:
+        font = _fonts[size] = pygame.font.Font(None, size)
+    return font
+
+# Pre-rendered surfaces: labels that never change and the static parts of
+# the track and dashboard. The asset loader builds them while the garage
+# is up; anything it hasn't got to yet is built on first use.
+_surfaces = {}
+
+def get_label(text, size, color):
+    """Rendered text for a fixed label or hint."""
+    key = (text, size, color)
+    label = _surfaces.get(key)
+    if label is None:
+        label = _surfaces[key] = get_font(size).render(text, True, color)
+    return label
+
+def _display_format(surface):
+    # Match the screen format for fast blits (needs the display mode set)
+    return surface.convert() if pygame.display.get_surface() else surface
+
+def track_background():
+    """Sidebars, track and edge lines: everything draw_track doesn't scroll."""
+    background = _surfaces.get("track")
+    if background is None:
+        background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        background.fill(COLOR_BG)
+        pygame.draw.rect(background, COLOR_SIDEBAR_BG, (0, 0, SIDEBAR_WIDTH, SCREEN_HEIGHT))
+        pygame.draw.rect(background, COLOR_SIDEBAR_BG, (SCREEN_WIDTH - SIDEBAR_WIDTH, 0, SIDEBAR_WIDTH, SCREEN_HEIGHT))
+        pygame.draw.rect(background, COLOR_TRACK, (TRACK_X, 0, TRACK_WIDTH, SCREEN_HEIGHT))
+        pygame.draw.rect(background, COLOR_TRACK_EDGE, (TRACK_X, 0, 3, SCREEN_HEIGHT))
+        pygame.draw.rect(background, COLOR_TRACK_EDGE, (TRACK_X + TRACK_WIDTH - 3, 0, 3, SCREEN_HEIGHT))
+        background = _surfaces["track"] = _display_format(background)
+    return background
+
+FINISH_CHECK = 20 # Finish line square size
+FINISH_ROWS = 3
+
+def finish_line():
+    """Chequered finish strip, top row first."""
+    strip = _surfaces.get("finish")
+    if strip is None:
+        cols = TRACK_WIDTH // FINISH_CHECK
+        strip = pygame.Surface((cols * FINISH_CHECK, FINISH_ROWS * FINISH_CHECK))
+        for row in range(FINISH_ROWS):
+            r = FINISH_ROWS - 1 - row
+            for c in range(cols):
+                color = (255, 255, 255) if (r + c) % 2 == 0 else (0, 0, 0)
+                pygame.draw.rect(strip, color, (c * FINISH_CHECK, row * FINISH_CHECK, FINISH_CHECK, FINISH_CHECK))
+        strip = _surfaces["finish"] = _display_format(strip)
+    return strip
+
+TACHO_RADIUS = 60
+
+def tacho_dial():
+    """Tachometer face and markings on the sidebar background (no needle)."""
+    dial = _surfaces.get("tacho")
+    if dial is None:
+        radius = TACHO_RADIUS
+        size = 2 * radius + 4
+        c = radius + 2
+        dial = pygame.Surface((size, size))
+        dial.fill(COLOR_SIDEBAR_BG)
+        pygame.draw.circle(dial, (20, 20, 20), (c, c), radius)
+        pygame.draw.circle(dial, (100, 100, 100), (c, c), radius, 2)
+        for i in range(11):
+            angle = 225 - (i * 27) # 225 to -45 degrees
+            rad = math.radians(angle)
+            sx = c + math.cos(rad) * (radius - 10)
+            sy = c - math.sin(rad) * (radius - 10)
+            ex = c + math.cos(rad) * radius
+            ey = c - math.sin(rad) * radius
+            col = (255, 0, 0) if i >= 8 else (200, 200, 200)
+            pygame.draw.line(dial, col, (sx, sy), (ex, ey), 2)
+        dial = _surfaces["tacho"] = _display_format(dial)
+    return dial
+
+def format_time(ticks):
+    mins = ticks // 3600
+    secs = (ticks % 3600) / 60.0
+    return f"{mins:02d}:{secs:05.2f}"
+
 def draw_track(surface, camera_y, race_length, checkpoints):
-    # Fill background
-    surface.fill(COLOR_BG)
-    
-    # Draw Sidebars Background
-    pygame.draw.rect(surface, COLOR_SIDEBAR_BG, (0, 0, SIDEBAR_WIDTH, SCREEN_HEIGHT))
-    pygame.draw.rect(surface, COLOR_SIDEBAR_BG, (SCREEN_WIDTH - SIDEBAR_WIDTH, 0, SIDEBAR_WIDTH, SCREEN_HEIGHT))
+    # Background, sidebars, track and edge lines in one blit
+    surface.blit(track_background(), (0, 0))
     
     # Track Area
     track_left = TRACK_X
     track_right = TRACK_X + TRACK_WIDTH
     
-    # Main track surface
-    pygame.draw.rect(surface, COLOR_TRACK, (track_left, 0, TRACK_WIDTH, SCREEN_HEIGHT))
-    
-    # Edge lines
-    pygame.draw.rect(surface, COLOR_TRACK_EDGE, (track_left, 0, 3, SCREEN_HEIGHT))
-    pygame.draw.rect(surface, COLOR_TRACK_EDGE, (track_right - 3, 0, 3, SCREEN_HEIGHT))
-    
     # Distance markers
-    font = pygame.font.Font(None, 20)
+    font = get_font(20)
     marker_spacing = 1000
     start_marker = (int(camera_y) // marker_spacing) * marker_spacing
     
@@ -40,20 +117,12 @@ def draw_track(surface, camera_y, race_length, checkpoints):
         if -50 < screen_y < SCREEN_HEIGHT + 50:
             pygame.draw.line(surface, (0, 100, 255), 
                            (track_left, screen_y), (track_right, screen_y), 5)
-            text = font.render("CHECKPOINT", True, (0, 200, 255))
-            surface.blit(text, (track_left + 10, screen_y - 20))
+            surface.blit(get_label("CHECKPOINT", 20, (0, 200, 255)), (track_left + 10, screen_y - 20))
             
     # Finish Line
     finish_screen_y = SCREEN_HEIGHT - (race_length - camera_y)
     if -50 < finish_screen_y < SCREEN_HEIGHT + 50:
-        check_size = 20
-        rows = 3
-        cols = TRACK_WIDTH // check_size
-        for r in range(rows):
-            for c in range(cols):
-                color = (255, 255, 255) if (r + c) % 2 == 0 else (0, 0, 0)
-                pygame.draw.rect(surface, color, 
-                               (track_left + c * check_size, finish_screen_y - r * check_size, check_size, check_size))
+        surface.blit(finish_line(), (track_left, int(finish_screen_y) - (FINISH_ROWS - 1) * FINISH_CHECK))
 
 def draw_dashboard(surface, player):
     """Draw Left Sidebar Dashboard."""
@@ -61,8 +130,8 @@ def draw_dashboard(surface, player):
     y_offset = 20
     width = SIDEBAR_WIDTH - 40
     
-    font_header = pygame.font.Font(None, 36)
-    font_val = pygame.font.Font(None, 28)
+    font_header = get_font(36)
+    font_val = get_font(28)
     
     # Car Name
     surface.blit(font_header.render(player.stats.name, True, COLOR_HIGHLIGHT), (x_offset, y_offset))
@@ -92,22 +161,10 @@ def draw_dashboard(surface, player):
     # Analog Gauges (Speedometer / Tachometer)
     center_x = x_offset + width // 2
     center_y = y_offset + 80
-    radius = 60
-    
-    # Tachometer (Throttle)
-    pygame.draw.circle(surface, (20, 20, 20), (center_x, center_y), radius)
-    pygame.draw.circle(surface, (100, 100, 100), (center_x, center_y), radius, 2)
-    
-    # Tacho markings
-    for i in range(11):
-        angle = 225 - (i * 27) # 225 to -45 degrees
-        rad = math.radians(angle)
-        sx = center_x + math.cos(rad) * (radius - 10)
-        sy = center_y - math.sin(rad) * (radius - 10)
-        ex = center_x + math.cos(rad) * radius
-        ey = center_y - math.sin(rad) * radius
-        col = (255, 0, 0) if i >= 8 else (200, 200, 200)
-        pygame.draw.line(surface, col, (sx, sy), (ex, ey), 2)
+    radius = TACHO_RADIUS
+    
+    # Tachometer (Throttle): pre-rendered face and markings
+    surface.blit(tacho_dial(), (center_x - radius - 2, center_y - radius - 2))
         
     # Needle
     throttle_angle = 225 - (player.throttle / 100.0 * 270)
@@ -116,7 +173,7 @@ def draw_dashboard(surface, player):
     ny = center_y - math.sin(rad) * (radius - 5)
     pygame.draw.line(surface, (255, 50, 0), (center_x, center_y), (nx, ny), 3)
     
-    surface.blit(font_val.render("RPM", True, (100, 100, 100)), (center_x - 20, center_y + 20))
+    surface.blit(get_label("RPM", 28, (100, 100, 100)), (center_x - 20, center_y + 20))
     
     y_offset += 180
     
@@ -128,38 +185,26 @@ def draw_dashboard(surface, player):
     for i in range(NITRO_CHARGES):
         col = (255, 200, 0) if i < player.nitro_charges else (50, 50, 50)
         pygame.draw.circle(surface, col, (x_offset + 20 + i*40, y_offset), 15)
-    surface.blit(font_val.render("NITRO", True, COLOR_TEXT), (x_offset + 140, y_offset - 10))
+    surface.blit(get_label("NITRO", 28, COLOR_TEXT), (x_offset + 140, y_offset - 10))
 
-def draw_stats_panel(surface, player, all_cars, race_time, total_cars):
+def draw_stats_panel(surface, player, standings, race_time, total_cars):
     """Draw Right Sidebar Stats."""
     x_offset = SCREEN_WIDTH - SIDEBAR_WIDTH + 20
     y_offset = 20
     
-    font_header = pygame.font.Font(None, 36)
-    font_row = pygame.font.Font(None, 24)
+    font_header = get_font(36)
+    font_row = get_font(24)
     
     # Time
-    mins = race_time // 3600
-    secs = (race_time % 3600) / 60.0
-    surface.blit(font_header.render(f"TIME: {mins:02d}:{secs:05.2f}", True, COLOR_HIGHLIGHT), (x_offset, y_offset))
+    surface.blit(font_header.render(f"TIME: {format_time(race_time)}", True, COLOR_HIGHLIGHT), (x_offset, y_offset))
     y_offset += 50
     
     # Leaderboard
-    surface.blit(font_header.render("STANDINGS", True, COLOR_TEXT), (x_offset, y_offset))
+    surface.blit(get_label("STANDINGS", 36, COLOR_TEXT), (x_offset, y_offset))
     y_offset += 30
     
-    # Sort cars by position
-    # Helper to get the underlying car object
-    def get_car(obj):
-        return obj.car if hasattr(obj, 'car') else obj
-
-    sorted_cars = sorted(all_cars, key=lambda c: (0, get_car(c).finish_time) if get_car(c).finished else (1, -get_car(c).y))
-    
-    for i, car_obj in enumerate(sorted_cars):
-        if i > 9: break # Show top 10
-        
-        car = get_car(car_obj)
-        
+    # Top 10, straight from the maintained running order
+    for i, car in enumerate(standings.top(10)):
         col = COLOR_HIGHLIGHT if car.is_player else COLOR_TEXT
         if car.dead: col = (100, 100, 100)
         elif car.finished: col = (0, 255, 0)
@@ -168,10 +213,8 @@ def draw_stats_panel(surface, player, all_cars, race_time, total_cars):
         
         status_text = car.get_status_text()
         if status_text == "RACING":
-            # Show distance or checkpoint
-            # Calculate checkpoint index (approximate)
-            cp_idx = int(car.y / LEG_DISTANCE)
-            status = f"{int(car.y)}m (CP:{cp_idx})"
+            # Show distance and checkpoints passed
+            status = f"{int(car.y)}m (CP:{car.next_checkpoint_idx})"
         else:
             status = status_text
         
@@ -187,10 +230,80 @@ def draw_stats_panel(surface, player, all_cars, race_time, total_cars):
     pygame.draw.rect(surface, (100, 100, 100), (x_offset, y_offset, map_width, map_height), 1)
     
     race_len = player.race_length
-    for car_obj in all_cars:
-        car = get_car(car_obj)
+    if race_len == float('inf'):
+        # Endless: scale to the leader instead (nobody finishes)
+        race_len = max(1.0, standings.order[0].y)
+    for car in standings.order:
         if car.dead: continue
         p_y = min(1.0, max(0.0, car.y / race_len))
         screen_y = y_offset + map_height - (p_y * map_height)
         col = (0, 255, 0) if car.is_player else (255, 0, 0)
         pygame.draw.rect(surface, col, (x_offset, screen_y - 2, map_width, 4))
+
+def draw_classification(surface, sorted_cars):
+    """Draw the final classification over the track."""
+    font_header = get_font(48)
+    font_row = get_font(26)
+    
+    rows = sorted_cars[:20]
+    panel = pygame.Rect(TRACK_X + 50, 120, TRACK_WIDTH - 100, 110 + len(rows) * 24)
+    pygame.draw.rect(surface, (0, 0, 0), panel)
+    pygame.draw.rect(surface, COLOR_TRACK_EDGE, panel, 2)
+    
+    surface.blit(font_header.render("CLASSIFICATION", True, COLOR_HIGHLIGHT), (panel.x + 20, panel.y + 15))
+    surface.blit(font_row.render("BEST LEG", True, COLOR_TEXT), (panel.x + 400, panel.y + 25))
+    y_offset = panel.y + 60
+    
+    player = None
+    for i, car in enumerate(rows):
+        col = COLOR_HIGHLIGHT if car.is_player else COLOR_TEXT
+        name = "PLAYER" if car.is_player else f"Racer {i+1}"
+        if car.is_player:
+            player = car
+        if car.finished:
+            result = format_time(car.finish_time)
+        else:
+            col = (100, 100, 100)
+            result = f"{car.get_status_text()} ({int(car.y)}m)"
+        legs = car.leg_times()
+        best = format_time(min(legs)) if legs else "-"
+        surface.blit(font_row.render(f"{i+1}. {name}", True, col), (panel.x + 20, y_offset))
+        surface.blit(font_row.render(result, True, col), (panel.x + 220, y_offset))
+        surface.blit(font_row.render(best, True, col), (panel.x + 400, y_offset))
+        y_offset += 24
+        
+    # Player splits
+    if player is None:
+        player = next((car for car in sorted_cars if car.is_player), None)
+    if player is not None and player.splits:
+        legs = "  ".join(f"L{i+1} {format_time(t)}" for i, t in enumerate(player.leg_times()))
+        surface.blit(font_row.render(f"YOUR LEGS: {legs}", True, COLOR_HIGHLIGHT), (panel.x + 20, y_offset + 10))
+
+def draw_net_stats(surface, client):
+    """Draw the network race panel (right sidebar): place, clock and link stats."""
+    x_offset = SCREEN_WIDTH - SIDEBAR_WIDTH + 20
+    y_offset = 20
+
+    font_header = get_font(36)
+    font_row = get_font(24)
+
+    world = client.world
+    surface.blit(font_header.render(f"TIME: {format_time(world.race_time)}", True, COLOR_HIGHLIGHT), (x_offset, y_offset))
+    y_offset += 40
+    surface.blit(font_header.render(f"POS: {client.rank}/{world.total_cars}", True, COLOR_TEXT), (x_offset, y_offset))
+    y_offset += 60
+
+    surface.blit(font_header.render("NETWORK", True, COLOR_TEXT), (x_offset, y_offset))
+    y_offset += 30
+    rtt_col = (0, 255, 0) if client.rtt_ms < 50 else (255, 200, 0) if client.rtt_ms < 120 else (255, 50, 50)
+    rows = [
+        (f"RTT: {client.rtt_ms:.1f} ms", rtt_col),
+        (f"DOWN: {client.traffic_in.bytes_per_second() / 1024:.1f} KB/s", COLOR_TEXT),
+        (f"UP: {client.traffic_out.bytes_per_second() / 1024:.1f} KB/s", COLOR_TEXT),
+        (f"SNAPSHOTS: {client.traffic_in.packets_per_second():.0f}/s ({client.last_size} B)", COLOR_TEXT),
+        (f"CARS IN VIEW: {len(client.visible)}", COLOR_TEXT),
+        (f"LOST: {client.lost}  LATE: {client.late}", (255, 50, 50) if client.lost else COLOR_TEXT),
+    ]
+    for text, col in rows:
+        surface.blit(font_row.render(text, True, col), (x_offset, y_offset))
+        y_offset += 25
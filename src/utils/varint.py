@@ -0,0 +1,29 @@
+# Variable-length integers (LEB128): 7 bits per byte, low bits first, high
+# bit set on every byte but the last. Signed values go through zigzag
+# first so small negative numbers stay short too.
+
+def write_varint(out, value):
+    """Append a non-negative int to the bytearray out."""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, offset):
+    """(value, offset after it) of the varint at data[offset]."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def zigzag(value):
+    """Signed to unsigned: 0, -1, 1, -2, ... become 0, 1, 2, 3, ..."""
+    return (value << 1) ^ (value >> 63)
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
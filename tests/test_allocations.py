@@ -0,0 +1,52 @@
+import random
+import tracemalloc
+
+import pytest
+
+from src.models.particle import ParticleSystem
+from src.models.player_profile import PlayerProfile
+from src.models.race_config import RACE_BEGINNER, RACE_PRO
+from src.models.race_world import RaceWorld
+
+WARMUP_TICKS = 600
+STEADY_TICKS = 200
+# Net new blocks allowed over STEADY_TICKS (about 100 today): obstacles of
+# chunks streaming in, splits and the odd float that outlives a tick
+MAX_NET_BLOCKS = 200
+
+def run_ticks(world, particles, ticks):
+    # What run_race does per frame, minus drawing
+    for _ in range(ticks):
+        world.tick()
+        particles.update()
+        particles.spawn(world.effects)
+        world.effects.clear()
+
+@pytest.mark.parametrize("config", [RACE_BEGINNER, RACE_PRO], ids=lambda c: c.name)
+def test_steady_state_ticks_allocate_little(config):
+    world = RaceWorld(config, PlayerProfile(), random.Random(7))
+    world.emit_effects()
+    particles = ParticleSystem(random.Random(3))
+    for _ in range(WARMUP_TICKS):
+        world.player.adjust_throttle(1)
+        run_ticks(world, particles, 1)
+    assert world.racing
+
+    # Run the measured stretch once unmeasured, so the particle pool has
+    # grown to what it needs, then again from the same state
+    state = world.snapshot()
+    run_ticks(world, particles, STEADY_TICKS)
+    world.restore(state)
+    particles.clear()
+    particles.rng = random.Random(3)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        run_ticks(world, particles, STEADY_TICKS)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    net = sum(stat.count_diff for stat in after.compare_to(before, "lineno"))
+    assert net < MAX_NET_BLOCKS